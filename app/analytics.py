@@ -0,0 +1,252 @@
+"""
+Local SQLite store of match scores: one row per company x mandate/venture x analysis.
+
+Every validated GPT output is recorded here as it is persisted (and by re-scoring), so
+questions like "which companies scored >= 8 for GTF" no longer need Baserow:
+
+    python app/analytics.py query --acronym GTF --min-score 8 [--format csv|json]
+    python app/analytics.py export scores.csv [--all-history]
+    python app/analytics.py backfill --mode Ventures   # import Note3 of existing main-table rows
+
+Queries read the ``latest_matches`` view (the newest score per company and acronym) unless
+``--all-history`` is given.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Iterable, List, Optional
+
+from config import ANALYTICS_ENABLED, ANALYTICS_DB_PATH, MAIN_VENTURES_TABLE_ID, MAIN_INVESTORS_TABLE_ID
+import db
+from domain_index import normalize_domain
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    analyzed_at REAL NOT NULL,
+    source TEXT NOT NULL,
+    mode TEXT,
+    company TEXT,
+    company_key TEXT NOT NULL,
+    website TEXT,
+    acronym TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    fit INTEGER NOT NULL,
+    selected_email TEXT,
+    status TEXT,
+    prompt_version TEXT
+);
+CREATE INDEX IF NOT EXISTS matches_acronym_score ON matches (acronym, score);
+CREATE INDEX IF NOT EXISTS matches_score ON matches (score);
+CREATE INDEX IF NOT EXISTS matches_company ON matches (company_key, acronym);
+CREATE VIEW IF NOT EXISTS latest_matches AS
+    SELECT m.* FROM matches m
+    JOIN (SELECT MAX(id) AS id FROM matches GROUP BY company_key, acronym) latest ON latest.id = m.id;
+"""
+
+COLUMNS = ["analyzed_at", "source", "mode", "company", "company_key", "website", "acronym", "score", "fit",
+           "selected_email", "status", "prompt_version"]
+
+
+def match_rows(gpt_json: dict, row: dict, mode: str, status: Optional[str] = None, source: str = "analyze",
+               analyzed_at: Optional[float] = None) -> List[dict]:
+    """Flatten one company's GPT output into one record per scored acronym."""
+    if not isinstance(gpt_json, dict):
+        return []
+    website = row.get("Website") or ""
+    company_key = normalize_domain(website) or (row.get("Name") or "").strip().lower()
+    if not company_key:
+        return []
+    analyzed_at = analyzed_at or time.time()
+    records = []
+    for match in gpt_json.get("matches") or []:
+        if not isinstance(match, dict) or "acronym" not in match or "score" not in match:
+            continue
+        try:
+            score = int(match["score"])
+        except (TypeError, ValueError):
+            continue
+        records.append({
+            "analyzed_at": analyzed_at,
+            "source": source,
+            "mode": mode,
+            "company": row.get("Name"),
+            "company_key": company_key,
+            "website": website,
+            "acronym": str(match["acronym"]),
+            "score": score,
+            "fit": int(bool(match.get("fit"))),
+            "selected_email": gpt_json.get("selected_email") or None,
+            "status": status,
+            "prompt_version": gpt_json.get("prompt_version") or gpt_json.get("rescore_prompt_version"),
+        })
+    return records
+
+
+class AnalyticsStore:
+    """Thread-safe wrapper around one SQLite connection (WAL mode, so readers never block the app)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._migrate(self._conn)
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        """Add columns introduced after a store was created."""
+        existing = {r["name"] for r in conn.execute("PRAGMA table_info(matches)")}
+        with conn:
+            if "prompt_version" not in existing:
+                conn.execute("ALTER TABLE matches ADD COLUMN prompt_version TEXT")
+
+    def record(self, records: Iterable[dict]) -> int:
+        records = list(records)
+        if not records:
+            return 0
+        placeholders = ", ".join(f":{c}" for c in COLUMNS)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(f"INSERT INTO matches ({', '.join(COLUMNS)}) VALUES ({placeholders})", records)
+        return len(records)
+
+    def query(self, acronym: str = None, min_score: int = None, max_score: int = None, fit: bool = None,
+              mode: str = None, history: bool = False, limit: int = None,
+              prompt_version: str = None) -> List[dict]:
+        clauses, params = [], []
+        if acronym:
+            clauses.append("acronym = ?")
+            params.append(acronym)
+        if min_score is not None:
+            clauses.append("score >= ?")
+            params.append(min_score)
+        if max_score is not None:
+            clauses.append("score <= ?")
+            params.append(max_score)
+        if fit is not None:
+            clauses.append("fit = ?")
+            params.append(int(fit))
+        if mode:
+            clauses.append("mode = ?")
+            params.append(mode)
+        if prompt_version:
+            clauses.append("prompt_version = ?")
+            params.append(prompt_version)
+        sql = f"SELECT * FROM {'matches' if history else 'latest_matches'}"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY score DESC, analyzed_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        with self._lock:
+            return [dict(r) for r in self._connection().execute(sql, params)]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Shared by every campaign in the process; None when disabled
+ANALYTICS = AnalyticsStore(ANALYTICS_DB_PATH) if ANALYTICS_ENABLED else None
+
+
+def record_safely(records: Iterable[dict]) -> None:
+    """Best-effort recording: analytics problems are logged and never affect processing."""
+    if ANALYTICS is None:
+        return
+    try:
+        ANALYTICS.record(records)
+    except Exception:
+        logger.exception("Failed to record match scores in the analytics store")
+
+
+# --- command line ---
+
+def _write(rows: List[dict], fmt: str, out) -> None:
+    if fmt == "json":
+        json.dump(rows, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    writer = csv.DictWriter(out, fieldnames=["id"] + COLUMNS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def backfill(mode: str) -> int:
+    """Import the Note3 scores of every row already in a main table."""
+    table_id = MAIN_VENTURES_TABLE_ID if mode == "Ventures" else MAIN_INVESTORS_TABLE_ID
+    records = []
+    for row in db.iter_rows(table_id):
+        try:
+            gpt_json = json.loads(row.get("Note3") or "")
+        except ValueError:
+            continue
+        status = row.get("STATUS")
+        if isinstance(status, list):
+            status = ", ".join(s.get("value", "") if isinstance(s, dict) else str(s) for s in status)
+        records.extend(match_rows(gpt_json, row, mode, status, source="backfill"))
+    return ANALYTICS.record(records)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query and export match scores from the local analytics store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    query = sub.add_parser("query", help="Print matching scores")
+    export = sub.add_parser("export", help="Write scores to a CSV or JSON file")
+    export.add_argument("path")
+    for p in (query, export):
+        p.add_argument("--acronym")
+        p.add_argument("--min-score", type=int)
+        p.add_argument("--max-score", type=int)
+        p.add_argument("--fit", action="store_true", default=None, help="Only matches marked as a fit")
+        p.add_argument("--mode", choices=["Ventures", "Investors"])
+        p.add_argument("--all-history", action="store_true", help="Every analysis, not just the latest per company")
+        p.add_argument("--prompt-version", help="Only scores produced with this prompt version")
+        p.add_argument("--format", choices=["csv", "json"])
+    query.add_argument("--limit", type=int, default=100)
+    backfill_parser = sub.add_parser("backfill", help="Import Note3 scores of existing main-table rows")
+    backfill_parser.add_argument("--mode", choices=["Ventures", "Investors"], required=True)
+    args = parser.parse_args(argv)
+
+    if ANALYTICS is None:
+        print("The analytics store is disabled (ANALYTICS_ENABLED).")
+        sys.exit(1)
+
+    if args.command == "backfill":
+        print(f"Imported {backfill(args.mode)} score(s) from the main {args.mode} table")
+        return
+
+    rows = ANALYTICS.query(args.acronym, args.min_score, args.max_score, args.fit, args.mode, args.all_history,
+                           getattr(args, "limit", None), args.prompt_version)
+    if args.command == "query":
+        _write(rows, args.format or "csv", sys.stdout)
+        return
+    fmt = args.format or ("json" if args.path.endswith(".json") else "csv")
+    with open(args.path, "w", newline="", encoding="utf-8") as f:
+        _write(rows, fmt, f)
+    print(f"Wrote {len(rows)} row(s) to {os.path.abspath(args.path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,33 @@
 import time
 import os
 import logging
-import json
-import pytz
-from datetime import datetime
-from pydantic import BaseModel, ValidationError, EmailStr
-from typing import List
 import random
-import importlib.util
-import sys
-import re
-
-from config import OUTREACH_DATABASE_ID, TEST_MODE, SENDER_ACCOUNTS, MAIN_VENTURES_TABLE_ID, MAIN_INVESTORS_TABLE_ID
+import threading
+
+import warmup  # first, so the startup report covers the imports below
+from config import (
+    OUTREACH_DATABASE_ID, TEST_MODE, SENDER_ACCOUNTS,
+    PIPELINE_ENABLED, PIPELINE_SCRAPE_WORKERS, PIPELINE_ANALYZE_WORKERS,
+    PIPELINE_QUEUE_SIZE, PIPELINE_PERSIST_BATCH,
+    METRICS_PORT, METRICS_SUMMARY_PATH, METRICS_SUMMARY_INTERVAL,
+    PROFILES_DIR, PROFILE_ROW_THRESHOLD, PROFILE_MEMORY_INTERVAL, PROFILE_MEMORY_TOP, PROFILE_DUMP_SIGNAL
+)
 import db
-import scraper
+import metrics
+import log_setup
 import openai_api
-import email_sender
-
-# Path to one directory above this script
-log_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app.log')
-
-# Optional: Remove existing handlers (avoids duplication if re-run in same session)
-for handler in logging.root.handlers[:]:
-    logging.root.removeHandler(handler)
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_path),
-        logging.StreamHandler()
-    ]
-)
+import profiling
+import prompt_registry
+import stages
+from sender_scheduler import SenderScheduler
+from dispatcher import EmailDispatcher
+from pipeline import Pipeline, SCRAPE
+from working_hours import WorkingHours, parse_windows
 
-logger = logging.getLogger(__name__)
+# Queue-based logging to the rotating app.log (and warnings to the console)
+log_setup.setup()
 
-# --- Pydantic models for GPT output validation ---
-
-class Match(BaseModel):
-    acronym: str
-    score: int
-    fit: bool
-
-class GPTOutput(BaseModel):
-    matches: List[Match]
-    selected_email: EmailStr
-    subject: str
-    email_body: str
+logger = logging.getLogger(__name__)
 
 # --- Constants ---
 
@@ -55,22 +35,9 @@ WEEK_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday",
 
 # --- Helper functions ---
 
-def load_prompts_from_file(file_path):
-    """Dynamically import prompt variables from a given Python file."""
-    module_name = os.path.splitext(os.path.basename(file_path))[0]
-    spec = importlib.util.spec_from_file_location(module_name, file_path)
-    if spec is None:
-        raise ImportError(f"Could not load module spec from {file_path}")
-    module = importlib.util.module_from_spec(spec)
-    sys.modules[module_name] = module
-    spec.loader.exec_module(module)
-    
-    required_attrs = ['base_prompt', 'ventures_prompt', 'investors_prompt']
-    for attr in required_attrs:
-        if not hasattr(module, attr):
-            raise AttributeError(f"{file_path} is missing required attribute: {attr}")
-    
-    return module.base_prompt, module.ventures_prompt, module.investors_prompt
+def load_prompts_from_file(file_path) -> prompt_registry.PromptFile:
+    """The prompts defined in a Python file, reloaded whenever the file changes."""
+    return prompt_registry.get(file_path)
 
 def select_prompt_file():
     prompt_dir = os.path.join(os.path.dirname(__file__), "..", "prompts")
@@ -127,23 +94,37 @@ def prompt_multiselect(prompt, options, default_selected):
         else:
             print("Please enter valid numbers separated by commas.")
 
-def choose_sender_account():
+def choose_sender_accounts():
+    """Pick one sender account, or rotate across all of them."""
     if not SENDER_ACCOUNTS:
         raise ValueError("No sender accounts configured in SENDER_ACCOUNTS.")
 
     print("Choose a sender account:")
     for i, account in enumerate(SENDER_ACCOUNTS):
         print(f"{i + 1}. {account.get('name')} <{account.get('email')}>")
+    rotate_choice = len(SENDER_ACCOUNTS) + 1
+    print(f"{rotate_choice}. All accounts (rotate)")
 
     while True:
-        choice = input(f"Enter number (1-{len(SENDER_ACCOUNTS)}): ")
+        choice = input(f"Enter number (1-{rotate_choice}): ")
         if choice.isdigit():
             idx = int(choice) - 1
             if 0 <= idx < len(SENDER_ACCOUNTS):
-                return SENDER_ACCOUNTS[idx]
+                return [SENDER_ACCOUNTS[idx]]
+            if idx == len(SENDER_ACCOUNTS):
+                return list(SENDER_ACCOUNTS)
         print("Invalid choice. Try again.")
 
 
+def prompt_windows(prompt, default):
+    """Ask for one or more hour windows such as ``9-12,14-18``."""
+    while True:
+        user_input = input(f"{prompt} [{default}]: ").strip() or default
+        try:
+            return parse_windows(user_input)
+        except ValueError as e:
+            print(f"Invalid input ({e}). Use start-end hours, e.g. 9-12,14-18.")
+
 def prompt_int(prompt, min_val, max_val, default):
     while True:
         user_input = input(f"{prompt} [{default}]: ").strip()
@@ -155,24 +136,15 @@ def prompt_int(prompt, min_val, max_val, default):
                 return val
         print(f"Invalid input. Enter an integer between {min_val} and {max_val}.")
 
-def is_within_active_hours(start_hour, end_hour, working_days):
-    tz = pytz.timezone("Europe/Paris")  # CET timezone with DST awareness
-    now = datetime.now(tz)
-    current_hour = now.hour
-    current_day = now.strftime("%A")  # Full weekday name, e.g. "Monday"
-
-    if current_day not in working_days:
-        return False
-
-    if end_hour > start_hour:
-        return start_hour <= current_hour < end_hour
-    else:
-        # Overnight span (e.g. start=22, end=6)
-        return current_hour >= start_hour or current_hour < end_hour
-
-def process_next_row(selected_mode, websites_table, info_table, sender_account, base_prompt, ventures_prompt, investors_prompt):
+def process_next_row(ctx, dispatcher):
+    """Process one row serially with the same stage functions the pipeline uses. Returns False when no rows are left."""
+    # Wait out Baserow/OpenAI outages here rather than scrape rows that cannot be finished
+    never = threading.Event()
+    db.BREAKER.wait_until_available(never)
+    openai_api.BREAKER.wait_until_available(never)
     try:
-        row = db.get_next_row(websites_table)
+        row = db.get_next_row(ctx.websites_table, exclude_ids=dispatcher.in_flight_ids() | ctx.held_ids(),
+                              include=stages.ROW_FIELDS)
     except Exception as e:
         logger.exception("Error fetching next row")
         print(f"Error fetching next row: {e}")
@@ -183,234 +155,32 @@ def process_next_row(selected_mode, websites_table, info_table, sender_account,
         print("No more unprocessed rows.")
         return False
 
-    row_id = row.get("id")
-    url = row.get("Website")
-
-    if not url:
-        logger.warning(f"Row {row_id}: No website provided.")
-        print(f"Row {row_id}: No website provided.")
-        return True
-
-    logger.info(f"Row {row_id}: Scraping {url}")
-    print(f"Row {row_id}: Scraping {url}")
-    try:
-        scraped_text, emails = scraper.scrape_website(url)
-    except Exception as e:
-        logger.exception(f"Row {row_id}: Scraping failed for {url}")
-        print(f"Scraping failed: {e}")
-        return True
-
-    if not scraped_text or (isinstance(scraped_text, str) and scraped_text.startswith("ERROR")):
-        logger.warning(f"Row {row_id}: Scraping failed. Using Description field.")
-        scraped_text = row.get("Description", "")
-
-    word_count = len(scraped_text.split())
-
-    if word_count < 10:
-        logger.warning(f"Row {row_id}: Scraped content too short ({word_count} words), using Description.")
-        scraped_text = row.get("Description", "")
-        word_count = len(scraped_text.split())
-        if word_count < 10:
-            logger.warning(f"Row {row_id}: Description also too short ({word_count} words).")
-            print("No sufficient text available for analysis.")
-            try:
-                status = "Skipped"
-                db.update_cell(websites_table, row_id, "STATUS", status)
-                db.update_cell(websites_table, row_id, "Skipped", True)
-                
-                # Create in main table
-                target_table = MAIN_VENTURES_TABLE_ID if selected_mode == "Ventures" else MAIN_INVESTORS_TABLE_ID
-                keys = ['Name', 'Note3', 'Description', 'Website', 'Email', 'Location', 
-                        'Total Funding Amount', 'LinkedIn', 'Phone', 'CB Rank', 'STATUS', 'Note1']
-                complete_row = {key: row.get(key) for key in keys}
-                
-                if selected_mode == "Investors":
-                    complete_row.pop("Total Funding Amount", None)
-                
-                if isinstance(status, str):
-                    complete_row["STATUS"] = [status]
-                
-                if complete_row:
-                    new_row = db.create_main_table_row(
-                        table_id=target_table,
-                        row_data=complete_row
-                    )
-                    logger.info(f"Row {row_id}: Successfully created in main {selected_mode} table with ID {new_row.get('id')}")
-                
-                # Delete from original table
-                db.delete_row(websites_table, row_id)
-                logger.info(f"Row {row_id}: Deleted from outreach table")
-            except Exception as e:
-                logger.error(f"Row {row_id}: Failed to mark row as Skipped: {e}")
-            return True
-    elif word_count > 3000:
-        logger.info(f"Row {row_id}: Trimming scraped content from {word_count} to 3000 words.")
-        scraped_text = " ".join(scraped_text.split()[:3000])
-
-    try:
-        relevant_data = db._get_table_data(info_table)
-    except Exception as e:
-        logger.exception("Failed to load info table data")
-        print(f"Error loading info table: {e}")
-        return True
-
-    logger.info(f"Row {row_id}: Analyzing with GPT...")
-    print(f"Row {row_id}: Analyzing with GPT...")
-    try:
-        gpt_result = openai_api.ask_gpt_about_company(
-            scraped_text,
-            emails,
-            row.get("Email", ""),
-            selected_mode,
-            relevant_data,
-            row.get("Location", ""),
-            row.get("Total Funding Amount", ""),
-            base_prompt,
-            ventures_prompt,
-            investors_prompt
-        )
-    except Exception as e:
-        logger.exception(f"Row {row_id}: GPT analysis failed.")
-        print(f"GPT analysis failed: {e}")
-        return True
-
-    # Validate GPT output with Pydantic
-    try:
-        # gpt_result expected to be JSON string or dict
-        gpt_json = gpt_result if isinstance(gpt_result, dict) else json.loads(gpt_result)
-        validated_output = GPTOutput(**gpt_json)
-    except (ValidationError, json.JSONDecodeError) as e:
-        logger.error(f"Row {row_id}: GPT output validation failed: {e}")
-        try:
-            status = "Skipped"
-            db.update_cell(websites_table, row_id, "STATUS", status)
-            json_string = json.dumps(gpt_json, ensure_ascii=False)
-
-            # Fallback for gpt_json
-            fallback_json = gpt_result if isinstance(gpt_result, dict) else {"raw_output": gpt_result}
-            json_string = json.dumps(fallback_json, ensure_ascii=False)
-
-            row['Note3'] = json_string
-            db.update_cell(websites_table, row_id, "Note3", json_string)
-            
-            # Create in main table
-            target_table = MAIN_VENTURES_TABLE_ID if selected_mode == "Ventures" else MAIN_INVESTORS_TABLE_ID
-            keys = ['Name', 'Note3', 'Description', 'Website', 'Email', 'Location', 
-                    'Total Funding Amount', 'LinkedIn', 'Phone', 'CB Rank', 'STATUS', 'Note1']
-            complete_row = {key: row.get(key) for key in keys}
-            
-            # Overwrite Email with validated_output.selected_email if available
-            if hasattr(validated_output, 'selected_email') and validated_output.selected_email:
-                complete_row['Email'] = validated_output.selected_email
-            
-            if selected_mode == "Investors":
-                complete_row.pop("Total Funding Amount", None)
-            
-            if isinstance(status, str):
-                complete_row["STATUS"] = [status]
-            
-            if complete_row:
-                new_row = db.create_main_table_row(
-                    table_id=target_table,
-                    row_data=complete_row
-                )
-                logger.info(f"Row {row_id}: Successfully created in main {selected_mode} table with ID {new_row.get('id')}")
-            
-            # Delete from original table
-            db.delete_row(websites_table, row_id)
-            logger.info(f"Row {row_id}: Deleted from outreach table")
-        except Exception as ex:
-            logger.error(f"Row {row_id}: Failed to mark row as Skipped after validation error or Note3: {ex}")
-        print(f"GPT output validation failed: {e}")
-        return True
-
-    matches = validated_output.matches
-    score = max((match.score for match in matches), default=0)
-    logger.info(f"Row {row_id}: Highest score from matches: {score}")
-    print(f"Row {row_id}: Highest score from matches: {score}")
-
-    should_send_email = (
-        score >= 7 and 
-        validated_output.selected_email.strip() and 
-        validated_output.subject.strip() and 
-        validated_output.email_body.strip()
-    )
+    work = stages.RowWork(row)
+    with log_setup.context(work.row_id, SCRAPE), profiling.row(SCRAPE, work.row_id):
+        next_stage = stages.scrape_row(work, ctx)
+    if next_stage == stages.ANALYZE:
+        with log_setup.context(work.row_id, stages.ANALYZE), profiling.row(stages.ANALYZE, work.row_id):
+            next_stage = stages.analyze_row(work, ctx)
+
+    if next_stage is None:
+        ctx.drop(work.row_id)
+    elif next_stage in (stages.RETRY, stages.DEADLINE):
+        pass
+    elif next_stage == stages.SEND:
+        def on_sent(success, msg):
+            stages.record_send_result(work, success, msg)
+            stages.persist_row(work, ctx)
+
+        def on_unsent():
+            if work.deadline.expired():
+                if stages.out_of_time(work, ctx, stages.SEND) is None:
+                    ctx.drop(work.row_id)
+            else:
+                stages.retry_later(work, ctx)
 
-    if should_send_email:
-        logger.info(f"Row {row_id}: Score >=7 and valid email fields present, sending email...")
-        print(f"Row {row_id}: Score >=7 and valid email fields present, sending email...")
-        try:
-            success, msg = email_sender.send_email({
-                "selected_email": validated_output.selected_email,
-                "subject": validated_output.subject,
-                "email_body": validated_output.email_body
-            }, row, sender_account)
-        except Exception as e:
-            logger.exception(f"Row {row_id}: Email sending raised an exception.")
-            print(f"Email sending raised exception: {e}")
-            return True
-
-        if success:
-            status = "Contacted"
-            logger.info(f"Row {row_id}: Email sent, marking as {status}.")
-            print(f"Row {row_id}: Email sent, marking as {status}.")
-        else:
-            status = "not contacted yet"
-            logger.error(f"Row {row_id}: Email failed to send: {msg}")
-            print(f"Email sending failed: {msg}")
+        dispatcher.submit(work.row_id, work.email_data, row, on_sent, on_unsent, work.deadline)
     else:
-        status = "not contacted yet"
-        logger.info(f"Row {row_id}: Score below 7 or missing email fields, marking as {status}.")
-        print(f"Row {row_id}: Score below 7 or missing email fields, marking as {status}.")
-
-    try:
-        # Update status and Note3 in original table
-        db.update_cell(websites_table, row_id, "STATUS", status)
-        if gpt_json:
-            json_string = json.dumps(gpt_json, ensure_ascii=False)
-            row['Note3'] = json_string
-            db.update_cell(websites_table, row_id, "Note3", json_string)
-        
-        # Create in main table regardless of status
-        target_table = MAIN_VENTURES_TABLE_ID if selected_mode == "Ventures" else MAIN_INVESTORS_TABLE_ID
-        keys = ['Name', 'Note3', 'Description', 'Website', 'Email', 'Location', 
-                'Total Funding Amount', 'LinkedIn', 'Phone', 'CB Rank', 'STATUS', 'Note1']
-        complete_row = {key: row.get(key) for key in keys}
-        
-        # Overwrite Email with validated_output.selected_email if available
-        if validated_output.selected_email:
-            complete_row['Email'] = validated_output.selected_email
-        
-        if selected_mode == "Investors":
-            complete_row.pop("Total Funding Amount", None)
-        
-        if isinstance(status, str):
-            complete_row["STATUS"] = [status]
-        
-        if complete_row:
-            new_row = db.create_main_table_row(
-                table_id=target_table,
-                row_data=complete_row
-            )
-            logger.info(f"Row {row_id}: Successfully created in main {selected_mode} table with ID {new_row.get('id')}")
-        
-        # Delete from original table after successful creation
-        db.delete_row(websites_table, row_id)
-        logger.info(f"Row {row_id}: Deleted from outreach table")
-        
-        # Mark as processed
-        try:
-            db.get_row(websites_table, row_id)  # Just to check if it exists
-            db.update_cell(websites_table, row_id, "x", True)
-        except Exception as e:
-            print(f"Row {row_id} not found or another error occurred: {e}")
-
-        print(f"Row {row_id} processed successfully.")
-    except Exception as e:
-        logger.exception(f"Row {row_id}: Failed during final processing steps")
-        print(f"Failed during final processing: {e}")
-        return True
-
+        stages.persist_row(work, ctx)
     return True
 
 
@@ -421,6 +191,9 @@ def main():
         exit(1)
 
     print("=== Autonomous Web Analyzer ===")
+    # Libraries, OpenAI and SMTP logins load in the background while the prompts below are answered;
+    # the table list fetched next opens the Baserow connection
+    warm = warmup.start(SENDER_ACCOUNTS, baserow=False)
 
     # Load tables
     try:
@@ -437,24 +210,33 @@ def main():
 
     table_options = {f"{t['name']} (ID: {t['id']})": t['id'] for t in tables}
 
-    # Select sender account at the beginning
-    sender_account = choose_sender_account()
+    # Select sender account(s) at the beginning
+    sender_accounts = choose_sender_accounts()
     
     prompt_file_path = select_prompt_file()
-    base_prompt, ventures_prompt, investors_prompt = load_prompts_from_file(prompt_file_path)
+    prompts = load_prompts_from_file(prompt_file_path)
     mode = prompt_select("Select mode:", ["Ventures", "Investors"])
     websites_table_key = prompt_select("Select Websites table:", list(table_options.keys()))
     info_table_key = prompt_select("Select Info table:", list(table_options.keys()))
 
-    delay_minutes = prompt_int("Delay between runs (minutes)", 1, 1440, 10)
-    work_start_hour = prompt_int("Work Start Hour (CET)", 0, 23, 9)
-    work_end_hour = prompt_int("Work End Hour (CET)", 0, 23, 21)
+    delay_minutes = prompt_int("Delay between emails (minutes)", 1, 1440, 10)
+    work_windows = prompt_windows("Working hours (CET), one or more start-end windows", "9-21")
     work_days = prompt_multiselect("Select Working Days", WEEK_DAYS, ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"])
-
-    randomized_delay = get_randomized_delay(delay_minutes)
+    working_hours = WorkingHours(work_windows, work_days)
+
+    # The human-like delay is applied per sender account between actual sends only;
+    # rows that send nothing are processed back-to-back.
+    sender_scheduler = SenderScheduler(
+        sender_accounts,
+        send_interval=lambda: get_randomized_delay(delay_minutes) * 60,
+        working_hours=working_hours
+    )
 
     websites_table = table_options[websites_table_key]
     info_table = table_options[info_table_key]
+    ctx = stages.RunContext(mode, websites_table, info_table, prompts)
+    warmup.REPORT.mark("prompts answered after")
+    warm.add_context(ctx)
 
     if TEST_MODE:
         print("⚠️ TEST MODE IS ENABLED ⚠️")
@@ -463,30 +245,78 @@ def main():
     print(f"Mode: {mode}")
     print(f"Websites Table: {websites_table_key}")
     print(f"Info Table: {info_table_key}")
-    print(f"Sender Account: {sender_account['name']} <{sender_account['email']}>")
-    print(f"Delay between runs: {delay_minutes} minutes")
-    print(f"Working hours: {work_start_hour}:00 to {work_end_hour}:00 CET")
-    print(f"Working days: {', '.join(work_days)}")
-    print("Starting processing loop...")
+    print("Sender Accounts:")
+    for line in sender_scheduler.summary():
+        print(f"  {line}")
+    print(f"Delay between emails: {delay_minutes} minutes (per sender account)")
+    print(f"Working hours: {working_hours.describe()}")
+
+    metrics.start(METRICS_PORT, METRICS_SUMMARY_PATH, METRICS_SUMMARY_INTERVAL)
+    profiling.start(PROFILES_DIR, PROFILE_ROW_THRESHOLD, PROFILE_MEMORY_INTERVAL, PROFILE_MEMORY_TOP,
+                    PROFILE_DUMP_SIGNAL)
+    warm.finish()
+    if PIPELINE_ENABLED:
+        run_pipeline(ctx, sender_scheduler, working_hours, delay_minutes)
+    else:
+        run_serial(ctx, sender_scheduler, working_hours, delay_minutes)
+
 
+def run_serial(ctx, sender_scheduler, working_hours, delay_minutes):
+    """One row at a time; only sending happens in the background."""
+    randomized_delay = get_randomized_delay(delay_minutes)
+    dispatcher = EmailDispatcher(sender_scheduler, is_active=working_hours.is_active)
+
+    print("Starting processing loop...")
+    dispatcher.start()
     try:
         while True:
-            if is_within_active_hours(work_start_hour, work_end_hour, work_days):
-                has_more = process_next_row(mode, websites_table, info_table, sender_account, base_prompt, ventures_prompt, investors_prompt)
+            if working_hours.is_active():
+                has_more = process_next_row(ctx, dispatcher)
                 if not has_more:
                     print(f"No more rows to process. Sleeping for {randomized_delay:.1f} minutes...")
                     time.sleep(randomized_delay * 60)
-                else:
-                    print(f"Waiting {randomized_delay:.1f} minutes until next processing cycle...")
-                    time.sleep(randomized_delay * 60)
             else:
-                print("Outside working hours. Sleeping for 5 minutes...")
-                time.sleep(5 * 60)
+                next_start = working_hours.next_active_start()
+                if next_start is None:
+                    print("No working hours configured. Exiting...")
+                    break
+                print(f"Outside working hours. Sleeping until {next_start:%A %Y-%m-%d %H:%M %Z}...")
+                working_hours.sleep_until_active()
     except KeyboardInterrupt:
         print("\nProcess interrupted by user. Exiting...")
     except Exception as e:
         logger.exception("Fatal error in main loop")
         print(f"Fatal error: {e}")
+    finally:
+        if dispatcher.pending():
+            print(f"{dispatcher.pending()} queued email(s) were not sent; their rows stay unprocessed.")
+        dispatcher.stop(timeout=5)
+
+
+def run_pipeline(ctx, sender_scheduler, working_hours, delay_minutes):
+    """All stages concurrently, connected by bounded queues."""
+    pipeline = Pipeline(
+        ctx, sender_scheduler, working_hours,
+        idle_delay=lambda: get_randomized_delay(delay_minutes) * 60,
+        scrape_workers=PIPELINE_SCRAPE_WORKERS,
+        analyze_workers=PIPELINE_ANALYZE_WORKERS,
+        queue_size=PIPELINE_QUEUE_SIZE,
+        persist_batch=PIPELINE_PERSIST_BATCH
+    )
+
+    print(f"Starting pipeline ({PIPELINE_SCRAPE_WORKERS} scrape / {PIPELINE_ANALYZE_WORKERS} analyze workers)...")
+    pipeline.start()
+    try:
+        pipeline.wait()
+    except KeyboardInterrupt:
+        print("\nProcess interrupted by user. Finishing in-flight writes...")
+    except Exception as e:
+        logger.exception("Fatal error in pipeline")
+        print(f"Fatal error: {e}")
+    finally:
+        pipeline.stop()
+        if pipeline.in_flight():
+            print(f"{pipeline.in_flight()} row(s) were still in progress; they stay unprocessed.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,189 @@
+import time
+import socket
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+import metrics
+from limiter import Slot, OVERLOAD, OVERLOAD_SMTP_CODES, is_overload
+from config import BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, BREAKER_MAX_RESET_SECONDS
+
+logger = logging.getLogger(__name__)
+
+STATE = "atlantis_breaker_state"
+TRANSITIONS = "atlantis_breaker_transitions_total"
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+# Gauge values, so dashboards can plot the state
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class ServiceUnavailable(Exception):
+    """Raised instead of calling a service whose breaker is open."""
+
+    def __init__(self, service: str, retry_in: float = 0.0):
+        super().__init__(f"{service} is unavailable (circuit open, next probe in {retry_in:.0f}s)")
+        self.service = service
+        self.retry_in = retry_in
+
+
+def is_outage(exc: BaseException) -> bool:
+    """
+    Errors that say the service is down or drowning rather than that this one call was
+    wrong: open breakers, timeouts, HTTP 429/5xx, refused or dropped connections, DNS
+    failures and SMTP try-later replies.
+    """
+    if isinstance(exc, ServiceUnavailable):
+        return True
+    smtp_code = getattr(exc, "smtp_code", None)
+    if smtp_code is not None:
+        return smtp_code in OVERLOAD_SMTP_CODES
+    if is_overload(exc):
+        return True
+    # requests.ConnectionError, openai.APIConnectionError, SMTPConnectError, SMTPServerDisconnected
+    return isinstance(exc, (ConnectionError, socket.gaierror)) or "connect" in type(exc).__name__.lower()
+
+
+class CircuitBreaker:
+    """
+    Stops calls to a service after ``failure_threshold`` outage errors in a row.
+
+    While open, ``guard`` raises ``ServiceUnavailable`` immediately and ``wait_until_available``
+    blocks. Once ``reset_timeout`` has passed, one trial call is let through (half-open): the
+    ``probe`` when there is one, otherwise the next real call. Success closes the breaker,
+    failure opens it again for twice as long, up to ``max_reset_timeout``.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30,
+                 max_reset_timeout: float = 600, probe: Optional[Callable[[], Optional[int]]] = None):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        # Unguarded call that raises on failure or returns an HTTP status code (or None)
+        self.probe = probe
+        self.state = CLOSED
+        self._failures = 0
+        self._open_for = reset_timeout
+        self._opened_at = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+        metrics.REGISTRY.gauge_fn(STATE, lambda: STATE_VALUES[self.state],
+                                  "Circuit breaker state (0 closed, 1 half-open, 2 open)", service=name)
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self._open_for - time.monotonic())
+
+    def _transition(self, state: str) -> None:
+        """Caller holds the lock."""
+        if state == self.state:
+            return
+        previous, self.state = self.state, state
+        metrics.REGISTRY.inc(TRANSITIONS, 1, "Circuit breaker state changes", service=self.name, to=state)
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            logger.warning(f"{self.name}: circuit open, pausing calls for {self._open_for:.0f}s")
+            print(f"{self.name} is failing, pausing for {self._open_for:.0f}s")
+        elif state == CLOSED:
+            logger.info(f"{self.name}: circuit closed, resuming")
+            if previous != CLOSED:
+                print(f"{self.name} is back, resuming")
+
+    def _admit(self) -> Optional[bool]:
+        """``None`` when the call must not go through, otherwise whether it is the half-open trial."""
+        with self._lock:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN and time.monotonic() >= self._opened_at + self._open_for and not self._trial:
+                self._transition(HALF_OPEN)
+            if self.state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return None
+
+    def _record(self, ok: bool, trial: bool) -> None:
+        with self._lock:
+            if trial:
+                self._trial = False
+            if ok:
+                self._failures = 0
+                self._open_for = self.reset_timeout
+                self._transition(CLOSED)
+                return
+            self._failures += 1
+            if trial:
+                self._open_for = min(self.max_reset_timeout, self._open_for * 2)
+                self._transition(OPEN)
+            elif self.state == CLOSED and self._failures >= self.failure_threshold:
+                self._transition(OPEN)
+
+    @contextmanager
+    def guard(self):
+        """
+        Wrap one call. Raises ``ServiceUnavailable`` when the breaker is open; outage errors
+        (see ``is_outage``) and statuses reported on the yielded ``Slot`` count as failures.
+        """
+        trial = self._admit()
+        if trial is None:
+            raise ServiceUnavailable(self.name, self.retry_in())
+        handle = Slot()
+        try:
+            yield handle
+        except BaseException as e:
+            self._record(not is_outage(e), trial)
+            raise
+        self._record(handle.outcome != OVERLOAD, trial)
+
+    def wait_until_available(self, stop: threading.Event, poll: float = 1.0) -> bool:
+        """
+        Block while the breaker is open, running the probe when one is due. Returns True once
+        calls may go through, False when ``stop`` is set first.
+        """
+        while not stop.is_set():
+            with self._lock:
+                if self.state == CLOSED:
+                    return True
+                due = self.state == OPEN and time.monotonic() >= self._opened_at + self._open_for
+                if due and self.probe is None:
+                    # The next real call is the trial
+                    return True
+            if due:
+                try:
+                    with self.guard() as handle:
+                        status = self.probe()
+                        if status:
+                            handle.status(status)
+                except ServiceUnavailable:
+                    pass
+                except Exception as e:
+                    logger.info(f"{self.name}: probe failed: {e}")
+                continue
+            stop.wait(min(poll, self.retry_in()) or poll)
+        return False
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def get(name: str, probe: Optional[Callable[[], Optional[int]]] = None) -> CircuitBreaker:
+    """The process-wide breaker for ``name``, created on first use."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(name)
+        if breaker is None:
+            breaker = _BREAKERS[name] = CircuitBreaker(
+                name, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_SECONDS, BREAKER_MAX_RESET_SECONDS, probe)
+        elif probe is not None and breaker.probe is None:
+            breaker.probe = probe
+        return breaker
+
+
+def states() -> Dict[str, str]:
+    with _BREAKERS_LOCK:
+        return {name: breaker.state for name, breaker in _BREAKERS.items()}
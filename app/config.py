@@ -1,13 +1,22 @@
 import json
 import os
 
-CONFIG_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
+# ATLANTIS_CONFIG points at an alternative config file (used by the offline benchmarks)
+CONFIG_PATH = os.environ.get(
+    "ATLANTIS_CONFIG",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'config.json')
+)
 
 with open(CONFIG_PATH, "r") as f:
     config = json.load(f)
 
 APP_PASSWORD = config.get("APP_PASSWORD", "letmein")
 OPENAI_API_KEY = config.get("OPENAI_API_KEY")
+# Optional OpenAI-compatible endpoint (e.g. a local replay server); None uses api.openai.com
+OPENAI_BASE_URL = config.get("OPENAI_BASE_URL")
+# Stream GPT responses; once the match scores are in and none reaches the send threshold the
+# rest of the generation (subject, email body) is cancelled
+GPT_STREAMING = bool(config.get("GPT_STREAMING", True))
 OUTREACH_DATABASE_ID = config.get("OUTREACH_DATABASE_ID")
 MAIN_VENTURES_TABLE_ID = config.get("MAIN_VENTURES_TABLE_ID")
 MAIN_INVESTORS_TABLE_ID = config.get("MAIN_INVESTORS_TABLE_ID")
@@ -20,3 +29,123 @@ SENDER_ACCOUNTS = config.get("SENDER_ACCOUNTS", [])
 
 TEST_EMAIL_ADDRESS = config.get("TEST_EMAIL_ADDRESS")
 TEST_MODE = bool(config.get("TEST_MODE", True))
+
+# Default per-account send quotas (overridable per entry in SENDER_ACCOUNTS)
+SENDER_DEFAULT_HOURLY_LIMIT = int(config.get("SENDER_DEFAULT_HOURLY_LIMIT", 20))
+SENDER_DEFAULT_DAILY_LIMIT = int(config.get("SENDER_DEFAULT_DAILY_LIMIT", 100))
+
+# Staged pipeline (scrape -> analyze -> send -> persist); set false for the serial loop
+PIPELINE_ENABLED = bool(config.get("PIPELINE_ENABLED", True))
+PIPELINE_SCRAPE_WORKERS = int(config.get("PIPELINE_SCRAPE_WORKERS", 8))
+PIPELINE_ANALYZE_WORKERS = int(config.get("PIPELINE_ANALYZE_WORKERS", 4))
+PIPELINE_QUEUE_SIZE = int(config.get("PIPELINE_QUEUE_SIZE", 16))
+PIPELINE_PERSIST_BATCH = int(config.get("PIPELINE_PERSIST_BATCH", 20))
+
+# Time budget per row for scraping, GPT, sending and its Baserow writes (0: no limit). Time spent
+# queued or waiting for a sender's pacing is not counted. A row that runs out is held back for
+# ROW_DEADLINE_RETRY_MINUTES and then retried; after a second miss it waits for the next run
+ROW_DEADLINE_SECONDS = float(config.get("ROW_DEADLINE_SECONDS", 180))
+ROW_DEADLINE_RETRY_MINUTES = float(config.get("ROW_DEADLINE_RETRY_MINUTES", 15))
+
+# Metrics: Prometheus endpoint on localhost (0 disables) and a periodic JSON summary
+METRICS_PORT = int(config.get("METRICS_PORT", 9108))
+METRICS_SUMMARY_PATH = config.get(
+    "METRICS_SUMMARY_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "metrics_summary.json")
+)
+METRICS_SUMMARY_INTERVAL = int(config.get("METRICS_SUMMARY_INTERVAL", 60))
+
+# Adaptive (AIMD) concurrency limits per external service; e.g. {"openai": {"initial": 4, "max": 16}}
+ADAPTIVE_LIMITS_ENABLED = bool(config.get("ADAPTIVE_LIMITS_ENABLED", True))
+ADAPTIVE_LIMITS = config.get("ADAPTIVE_LIMITS", {})
+
+# Logging: size-rotated log file (JSON lines or "text"); LOG_VERBOSE adds per-page/per-payload
+# DEBUG records; the console only repeats records at LOG_CONSOLE_LEVEL and above
+LOG_PATH = config.get("LOG_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "app.log"))
+LOG_VERBOSE = bool(config.get("LOG_VERBOSE", False))
+LOG_CONSOLE_LEVEL = config.get("LOG_CONSOLE_LEVEL", "WARNING")
+LOG_FORMAT = config.get("LOG_FORMAT", "json")
+LOG_MAX_MB = float(config.get("LOG_MAX_MB", 50))
+LOG_BACKUPS = int(config.get("LOG_BACKUPS", 5))
+
+# Prompt files are checked for changes at most every PROMPT_RELOAD_SECONDS and reloaded
+# in place (0 disables reloading)
+PROMPT_RELOAD_SECONDS = float(config.get("PROMPT_RELOAD_SECONDS", 5))
+
+# Circuit breakers: after this many outage errors in a row (timeouts, 429/5xx, connection
+# failures) calls to Baserow/OpenAI/an SMTP server stop and intake pauses; a probe is sent
+# after BREAKER_RESET_SECONDS, doubling up to BREAKER_MAX_RESET_SECONDS while it keeps failing
+BREAKER_FAILURE_THRESHOLD = int(config.get("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_RESET_SECONDS = float(config.get("BREAKER_RESET_SECONDS", 30))
+BREAKER_MAX_RESET_SECONDS = float(config.get("BREAKER_MAX_RESET_SECONDS", 600))
+
+# Local index of domains/emails already in the main tables, checked before scraping a row
+DOMAIN_INDEX_ENABLED = bool(config.get("DOMAIN_INDEX_ENABLED", True))
+DOMAIN_INDEX_PATH = config.get(
+    "DOMAIN_INDEX_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "domain_index.json")
+)
+DOMAIN_INDEX_MAX_AGE_HOURS = float(config.get("DOMAIN_INDEX_MAX_AGE_HOURS", 24))
+
+# Deliverability pre-check of candidate addresses before GPT and before sending: syntax,
+# no-reply/disposable lists and the domain's MX (or A) records, cached per domain.
+# DELIVERABILITY_NAMESERVERS ("host" or "host:port") replace the system resolver;
+# DISPOSABLE_DOMAINS_PATH adds domains (one per line) to the built-in disposable list
+DELIVERABILITY_ENABLED = bool(config.get("DELIVERABILITY_ENABLED", True))
+DELIVERABILITY_NAMESERVERS = config.get("DELIVERABILITY_NAMESERVERS", [])
+DELIVERABILITY_DNS_TIMEOUT = float(config.get("DELIVERABILITY_DNS_TIMEOUT", 5))
+DELIVERABILITY_CACHE_HOURS = float(config.get("DELIVERABILITY_CACHE_HOURS", 24))
+DELIVERABILITY_NEGATIVE_CACHE_HOURS = float(config.get("DELIVERABILITY_NEGATIVE_CACHE_HOURS", 6))
+DELIVERABILITY_REJECT_ROLE_ACCOUNTS = bool(config.get("DELIVERABILITY_REJECT_ROLE_ACCOUNTS", False))
+DISPOSABLE_DOMAINS_PATH = config.get("DISPOSABLE_DOMAINS_PATH", "")
+
+# Crawling: page fetches for all rows share CRAWL_FETCH_WORKERS threads; each host gets at most
+# CRAWL_HOST_CONNECTIONS at once, started CRAWL_HOST_DELAY seconds apart (or the robots.txt
+# Crawl-delay, up to CRAWL_MAX_DELAY). robots.txt rules are cached on disk for ROBOTS_CACHE_HOURS
+CRAWL_FETCH_WORKERS = int(config.get("CRAWL_FETCH_WORKERS", 32))
+# Worker processes that parse fetched HTML (-1: one per core minus one; 0: parse in the fetching thread)
+PARSE_PROCESSES = int(config.get("PARSE_PROCESSES", -1))
+CRAWL_HOST_CONNECTIONS = int(config.get("CRAWL_HOST_CONNECTIONS", 2))
+CRAWL_HOST_DELAY = float(config.get("CRAWL_HOST_DELAY", 0.5))
+CRAWL_MAX_DELAY = float(config.get("CRAWL_MAX_DELAY", 10))
+ROBOTS_ENABLED = bool(config.get("ROBOTS_ENABLED", True))
+ROBOTS_CACHE_PATH = config.get(
+    "ROBOTS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "robots_cache.json")
+)
+ROBOTS_CACHE_HOURS = float(config.get("ROBOTS_CACHE_HOURS", 24))
+
+# Compressed archive of scraped text per domain; content younger than the reuse window is not re-scraped
+CONTENT_STORE_ENABLED = bool(config.get("CONTENT_STORE_ENABLED", True))
+CONTENT_STORE_DIR = config.get(
+    "CONTENT_STORE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "content_store")
+)
+CONTENT_STORE_MAX_MB = float(config.get("CONTENT_STORE_MAX_MB", 512))
+CONTENT_STORE_MAX_AGE_DAYS = float(config.get("CONTENT_STORE_MAX_AGE_DAYS", 180))
+CONTENT_STORE_REUSE_HOURS = float(config.get("CONTENT_STORE_REUSE_HOURS", 7 * 24))
+
+# Re-scoring (app/rescore.py): Info-table snapshots, and the keyword overlap a company needs to be re-scored
+RESCORE_STATE_PATH = config.get(
+    "RESCORE_STATE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "rescore_state.json")
+)
+RESCORE_MIN_OVERLAP = float(config.get("RESCORE_MIN_OVERLAP", 0.15))
+
+# Local SQLite copy of every match score (app/analytics.py)
+ANALYTICS_ENABLED = bool(config.get("ANALYTICS_ENABLED", True))
+ANALYTICS_DB_PATH = config.get(
+    "ANALYTICS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "analytics.sqlite3")
+)
+
+# Profiling (all off by default): cProfile stage calls slower than PROFILE_ROW_THRESHOLD seconds,
+# tracemalloc diffs every PROFILE_MEMORY_INTERVAL seconds, all-thread stack dump on PROFILE_DUMP_SIGNAL
+PROFILES_DIR = config.get(
+    "PROFILES_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles")
+)
+PROFILE_ROW_THRESHOLD = float(config.get("PROFILE_ROW_THRESHOLD", 0))
+PROFILE_MEMORY_INTERVAL = float(config.get("PROFILE_MEMORY_INTERVAL", 0))
+PROFILE_MEMORY_TOP = int(config.get("PROFILE_MEMORY_TOP", 15))
+PROFILE_DUMP_SIGNAL = config.get("PROFILE_DUMP_SIGNAL", "")
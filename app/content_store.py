@@ -0,0 +1,305 @@
+import os
+import json
+import time
+import zlib
+import struct
+import atexit
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock between processes; a replaced file is still detected
+    fcntl = None
+
+import metrics
+from domain_index import normalize_domain
+from config import (
+    CONTENT_STORE_ENABLED, CONTENT_STORE_DIR, CONTENT_STORE_MAX_MB, CONTENT_STORE_MAX_AGE_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+DATA_FILE = "content.dat"
+INDEX_FILE = "index.json"
+LOCK_FILE = "content.lock"
+
+# Record layout in the data file: header length, payload length, JSON header, zlib payload
+_RECORD = struct.Struct(">II")
+
+# Compact once superseded records make up more than this share of the data file
+GARBAGE_RATIO = 0.5
+# How often puts check for records past max_age
+EXPIRY_CHECK_INTERVAL = 60 * 60
+# Unsaved index changes are written out at most this often (and always at exit)
+SAVE_INTERVAL = 30
+
+
+class ContentStore:
+    """
+    Scraped text and emails per company domain, zlib-compressed in one append-only data
+    file. ``index.json`` maps each domain to the offset of its latest record, so a lookup is
+    one dict access plus one seek. The data file is self-describing: a missing or stale
+    index is rebuilt (or completed) by scanning it.
+
+    ``compact()`` rewrites the file with only the latest record per domain, dropping
+    records older than ``max_age`` seconds and then the oldest ones until the file is under
+    ``max_bytes``. It runs automatically when either limit is hit or the file is mostly
+    superseded records.
+
+    Several processes can share a store (``runner.py --processes``). Every access takes a
+    lock on ``content.lock`` and first catches up with the file: records appended by another
+    process are indexed, and a data file replaced by another process's compaction is
+    re-indexed from scratch. A record whose header does not match the domain asked for is
+    treated as a miss, never returned.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024, max_age: float = 180 * 24 * 60 * 60):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.data_path = os.path.join(directory, DATA_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self._index = {}  # domain -> {"offset", "length", "scraped_at"}
+        self._size = 0    # bytes of the data file covered by the index
+        self._live = 0    # bytes of the records the index points at
+        self._loaded = False
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._next_expiry_check = 0.0
+        self._file_id = None  # (st_dev, st_ino) of the data file the index describes
+        self._exit_registered = False
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+
+    # --- loading ---
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """This thread's exclusive access to the store, also against other processes (re-entrant)."""
+        with self._lock:
+            if self._lock_depth or fcntl is None:
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, LOCK_FILE), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._lock_depth += 1
+                try:
+                    yield
+                finally:
+                    self._lock_depth -= 1
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.data_path)
+        except FileNotFoundError:
+            return None, 0
+        return (st.st_dev, st.st_ino), st.st_size
+
+    def _sync(self) -> None:
+        """Catch up with changes other processes made to the data file. Called with ``_locked``."""
+        if not self._loaded:
+            self._ensure_loaded()
+            return
+        file_id, size = self._stat()
+        if file_id is None and self._size == 0:
+            return
+        if file_id != self._file_id or size < self._size:
+            logger.info("Content store data file was replaced by another process; reloading its index")
+            self._loaded = False
+            self._ensure_loaded()
+        elif size > self._size:
+            self._scan_from(self._size, size)
+            self._live = sum(e["length"] for e in self._index.values())
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            self._index, self._size = data["domains"], data["size"]
+        except (OSError, ValueError, KeyError):
+            self._index, self._size = {}, 0
+        actual = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        if actual < self._size:
+            # Data file replaced or truncated behind our back: start the index over
+            self._index, self._size = {}, 0
+        if actual > self._size:
+            self._scan_from(self._size, actual)
+        self._live = sum(e["length"] for e in self._index.values())
+        self._file_id = self._stat()[0]
+        self._loaded = True
+        if not self._exit_registered:
+            atexit.register(self.save)
+            self._exit_registered = True
+        logger.info(f"Content store: {len(self._index)} domains, {actual / 1e6:.1f} MB in {self.directory}")
+        if self._needs_compaction():
+            self.compact()
+
+    def _scan_from(self, offset: int, end: int) -> None:
+        """Index records appended after ``offset`` (e.g. by a run that exited before saving the index)."""
+        with open(self.data_path, "rb") as f:
+            f.seek(offset)
+            while offset + _RECORD.size <= end:
+                header_len, payload_len = _RECORD.unpack(f.read(_RECORD.size))
+                length = _RECORD.size + header_len + payload_len
+                if offset + length > end:
+                    break  # torn write at the end of the file
+                header = json.loads(f.read(header_len))
+                f.seek(payload_len, os.SEEK_CUR)
+                self._index[header["domain"]] = {"offset": offset, "length": length,
+                                                 "scraped_at": header["scraped_at"]}
+                offset += length
+        if offset < end:
+            logger.warning(f"Content store: ignoring {end - offset} bytes of incomplete record at the end")
+            with open(self.data_path, "r+b") as f:
+                f.truncate(offset)
+        self._size = offset
+        self._dirty = True
+
+    # --- reads and writes ---
+
+    def get(self, url: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """The latest record for ``url``'s domain (``url``, ``text``, ``emails``, ``scraped_at``), or ``None``."""
+        domain = normalize_domain(url)
+        if not domain:
+            return None
+        with self._locked():
+            self._sync()
+            entry = self._index.get(domain)
+            if entry is None or (max_age is not None and time.time() - entry["scraped_at"] > max_age):
+                metrics.cache_lookup("content_store", False)
+                return None
+            with open(self.data_path, "rb") as f:
+                f.seek(entry["offset"])
+                blob = f.read(entry["length"])
+        try:
+            header_len, _ = _RECORD.unpack_from(blob)
+            header = json.loads(blob[_RECORD.size:_RECORD.size + header_len])
+            if header.get("domain") != domain:
+                raise ValueError(f"record at offset {entry['offset']} is for {header.get('domain')!r}")
+            payload = json.loads(zlib.decompress(blob[_RECORD.size + header_len:]))
+        except (struct.error, zlib.error, ValueError, AttributeError) as e:
+            # Another company's text in this company's prompt would be worse than re-scraping
+            logger.warning(f"Content store record for {domain} is unreadable ({e}); treating it as missing")
+            metrics.cache_lookup("content_store", False)
+            return None
+        metrics.cache_lookup("content_store", True)
+        return {**header, **payload}
+
+    def put(self, url: str, text: str, emails) -> None:
+        domain = normalize_domain(url)
+        if not domain or not text:
+            return
+        scraped_at = time.time()
+        header = json.dumps({"domain": domain, "url": url, "scraped_at": scraped_at}).encode("utf-8")
+        payload = zlib.compress(json.dumps({"text": text, "emails": list(emails)}, ensure_ascii=False).encode("utf-8"))
+        record = _RECORD.pack(len(header), len(payload)) + header + payload
+        with self._locked():
+            self._sync()
+            with open(self.data_path, "ab") as f:
+                offset = f.tell()
+                f.write(record)
+            if self._file_id is None:
+                self._file_id = self._stat()[0]
+            old = self._index.get(domain)
+            self._live += len(record) - (old["length"] if old else 0)
+            self._index[domain] = {"offset": offset, "length": len(record), "scraped_at": scraped_at}
+            self._size = offset + len(record)
+            self._dirty = True
+            if self._needs_compaction():
+                self.compact()
+            elif time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                self.save()
+
+    def __contains__(self, url: str) -> bool:
+        domain = normalize_domain(url)
+        with self._locked():
+            self._sync()
+            return domain in self._index
+
+    def domains(self) -> list:
+        with self._locked():
+            self._sync()
+            return list(self._index)
+
+    def stats(self) -> dict:
+        with self._locked():
+            self._sync()
+            return {"domains": len(self._index), "bytes": self._size, "live_bytes": self._live}
+
+    # --- maintenance ---
+
+    def _needs_compaction(self) -> bool:
+        if self._size > self.max_bytes:
+            return True
+        if self._size > 1024 * 1024 and self._live < self._size * (1 - GARBAGE_RATIO):
+            return True
+        if time.monotonic() >= self._next_expiry_check:
+            self._next_expiry_check = time.monotonic() + EXPIRY_CHECK_INTERVAL
+            cutoff = time.time() - self.max_age
+            return any(e["scraped_at"] < cutoff for e in self._index.values())
+        return False
+
+    def compact(self) -> None:
+        """Rewrite the data file with the latest, unexpired records that fit in ``max_bytes``."""
+        with self._locked():
+            self._sync()
+            cutoff = time.time() - self.max_age
+            newest_first = sorted(self._index.items(), key=lambda item: item[1]["scraped_at"], reverse=True)
+            keep, total = [], 0
+            for domain, entry in newest_first:
+                # Leave headroom so the next few puts don't trigger another compaction right away
+                if entry["scraped_at"] < cutoff or total + entry["length"] > self.max_bytes * 0.9:
+                    continue
+                keep.append((domain, entry))
+                total += entry["length"]
+
+            tmp_path = f"{self.data_path}.tmp"
+            new_index, offset = {}, 0
+            with open(self.data_path, "rb") as src, open(tmp_path, "wb") as dst:
+                for domain, entry in sorted(keep, key=lambda item: item[1]["offset"]):
+                    src.seek(entry["offset"])
+                    dst.write(src.read(entry["length"]))
+                    new_index[domain] = {**entry, "offset": offset}
+                    offset += entry["length"]
+            os.replace(tmp_path, self.data_path)
+            self._file_id = self._stat()[0]
+            logger.info(f"Compacted content store: {len(self._index)} -> {len(new_index)} domains, "
+                        f"{self._size / 1e6:.1f} -> {offset / 1e6:.1f} MB")
+            self._index, self._size, self._live = new_index, offset, offset
+            self._dirty = True
+            self.save()
+
+    def save(self) -> None:
+        with self._locked():
+            if not self._dirty:
+                return
+            # Never overwrite the index of a file another process has since replaced
+            self._sync()
+            tmp_path = f"{self.index_path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump({"size": self._size, "domains": self._index}, f)
+                os.replace(tmp_path, self.index_path)
+            except OSError:
+                logger.exception(f"Failed to save content store index to {self.index_path}")
+                return
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+
+# Shared by every campaign in the process; None when disabled
+CONTENT_STORE = ContentStore(
+    CONTENT_STORE_DIR, int(CONTENT_STORE_MAX_MB * 1024 * 1024), CONTENT_STORE_MAX_AGE_DAYS * 24 * 60 * 60
+) if CONTENT_STORE_ENABLED else None
@@ -0,0 +1,328 @@
+"""
+Polite page fetching shared by every row being scraped.
+
+``SCHEDULER`` runs page fetches for all sites on one pool of threads. It interleaves hosts so
+no single company's server gets more than ``CRAWL_HOST_CONNECTIONS`` requests at once, or two
+requests started less than ``CRAWL_HOST_DELAY`` seconds apart (longer when its robots.txt asks
+for a Crawl-delay). Waiting for one host never blocks fetches from the others, so total
+throughput grows with the number of sites in flight rather than with how hard each one is hit.
+
+``ROBOTS`` answers whether a URL may be fetched, from robots.txt files cached on disk for
+``ROBOTS_CACHE_HOURS``.
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+import metrics
+from limiter import LIMITERS
+from config import (
+    CRAWL_FETCH_WORKERS, CRAWL_HOST_CONNECTIONS, CRAWL_HOST_DELAY, CRAWL_MAX_DELAY,
+    ROBOTS_ENABLED, ROBOTS_CACHE_PATH, ROBOTS_CACHE_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+FETCH_RATE = "atlantis_crawl_fetch_rate"
+HOSTS_ACTIVE = "atlantis_crawl_hosts"
+HOST_WAIT = "atlantis_crawl_wait_seconds"
+ROBOTS_BLOCKED = "atlantis_robots_blocked_total"
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/120.0.0.0 Safari/537.36"
+)
+HEADERS = {
+    "User-Agent": USER_AGENT,
+    "Accept-Language": "en-US,en;q=0.9",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Connection": "keep-alive",
+}
+
+# The fetch rate is averaged over this many seconds
+RATE_WINDOW = 60
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class _Host:
+    __slots__ = ("pending", "active", "next_at", "delay")
+
+    def __init__(self, delay: float):
+        self.pending = deque()
+        self.active = 0
+        self.next_at = 0.0
+        self.delay = delay
+
+
+class CrawlScheduler:
+    """
+    Runs ``fn(url)`` for submitted URLs on ``workers`` threads, at most ``connections`` at a time
+    per host (0: no cap) and starting them at least ``delay`` seconds apart per host. Among hosts
+    that may go, the one that has waited longest goes first, so sites are interleaved.
+    """
+
+    def __init__(self, workers: int = 32, connections: int = 2, delay: float = 0.5, max_delay: float = 10):
+        self.workers = max(1, workers)
+        self.connections = connections
+        self.delay = delay
+        self.max_delay = max_delay
+        self._hosts: Dict[str, _Host] = {}
+        self._crawl_delays: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._threads = []
+        self._completed = deque()
+        self.fetches = 0
+        metrics.REGISTRY.gauge_fn(FETCH_RATE, self.fetch_rate, f"Page fetches per second (last {RATE_WINDOW}s)")
+        metrics.REGISTRY.gauge_fn(HOSTS_ACTIVE, lambda: len(self._hosts), "Hosts with fetches queued or running")
+
+    def submit(self, url: str, fn: Callable[[str], object]) -> Future:
+        future = Future()
+        host = host_of(url)
+        with self._cond:
+            self._start_workers()
+            state = self._hosts.get(host)
+            if state is None:
+                state = self._hosts[host] = _Host(self._host_delay(host))
+            state.pending.append((url, fn, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def set_crawl_delay(self, host: str, seconds: float) -> None:
+        """Space requests to ``host`` at least ``seconds`` apart (capped at ``max_delay``), as its robots.txt asks."""
+        with self._cond:
+            self._crawl_delays[host] = min(self.max_delay, seconds)
+            if host in self._hosts:
+                self._hosts[host].delay = self._host_delay(host)
+
+    def _host_delay(self, host: str) -> float:
+        return max(self.delay, self._crawl_delays.get(host, 0.0))
+
+    def _start_workers(self) -> None:
+        """Caller holds the lock."""
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._worker, name=f"crawl-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _take(self):
+        """Block until some host may be fetched from; return its next task."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready, ready_host, soonest, idle = None, None, None, []
+                for host, state in self._hosts.items():
+                    if not state.pending and not state.active:
+                        # Forget idle hosts once their spacing has passed (waking up to do so)
+                        if state.next_at <= now:
+                            idle.append(host)
+                        elif soonest is None or state.next_at < soonest:
+                            soonest = state.next_at
+                        continue
+                    if not state.pending or (self.connections > 0 and state.active >= self.connections):
+                        continue
+                    if state.next_at <= now:
+                        if ready is None or state.next_at < ready.next_at:
+                            ready, ready_host = state, host
+                    elif soonest is None or state.next_at < soonest:
+                        soonest = state.next_at
+                for host in idle:
+                    del self._hosts[host]
+                if ready is not None:
+                    ready.active += 1
+                    ready.next_at = now + ready.delay
+                    return ready_host, ready.pending.popleft()
+                self._cond.wait(None if soonest is None else soonest - now)
+
+    def _worker(self) -> None:
+        while True:
+            host, (url, fn, future, submitted) = self._take()
+            metrics.REGISTRY.observe(HOST_WAIT, time.monotonic() - submitted,
+                                     "Time page fetches waited for their host's turn")
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(fn(url))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    state = self._hosts[host]
+                    state.active -= 1
+                    self.fetches += 1
+                    self._completed.append(time.monotonic())
+                    self._prune_completed()
+                    # Forget idle hosts once their spacing has passed
+                    if not state.pending and not state.active and state.next_at <= time.monotonic():
+                        del self._hosts[host]
+                    self._cond.notify_all()
+
+    def fetch_rate(self) -> float:
+        """Completed fetches per second over the last ``RATE_WINDOW`` seconds (all hosts)."""
+        with self._cond:
+            self._prune_completed()
+            return len(self._completed) / RATE_WINDOW
+
+    def _prune_completed(self) -> None:
+        """Caller holds the lock."""
+        cutoff = time.monotonic() - RATE_WINDOW
+        while self._completed and self._completed[0] < cutoff:
+            self._completed.popleft()
+
+    def stats(self) -> dict:
+        with self._cond:
+            hosts = len(self._hosts)
+        return {"fetches": self.fetches, "fetch_rate": round(self.fetch_rate(), 2), "hosts": hosts}
+
+
+SCHEDULER = CrawlScheduler(CRAWL_FETCH_WORKERS, CRAWL_HOST_CONNECTIONS, CRAWL_HOST_DELAY, CRAWL_MAX_DELAY)
+
+
+class RobotsCache:
+    """
+    robots.txt rules per origin, fetched through the scheduler on first use and kept in a JSON
+    file shared by every run (and process) for ``max_age`` seconds.
+
+    As RFC 9309 asks: a missing robots.txt (4xx) allows everything. An unreachable one (5xx,
+    network error) disallows everything, and is only cached for ``ERROR_TTL`` seconds.
+    """
+
+    ERROR_TTL = 10 * 60
+    SAVE_INTERVAL = 30
+    # Parsers only have to read this much (RFC 9309 asks for at least 500 KiB)
+    MAX_BYTES = 512 * 1024
+
+    def __init__(self, path: str, max_age: float = 24 * 60 * 60, scheduler: CrawlScheduler = SCHEDULER):
+        self.path = path
+        self.max_age = max_age
+        self.scheduler = scheduler
+        self._entries: Dict[str, dict] = {}
+        self._parsers: Dict[str, RobotFileParser] = {}
+        self._fetching: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._dirty = False
+        self._last_save = time.monotonic()
+        atexit.register(self.save)
+
+    def allowed(self, url: str) -> bool:
+        parser = self._parser(url)
+        if parser.can_fetch(USER_AGENT, url):
+            return True
+        metrics.REGISTRY.inc(ROBOTS_BLOCKED, 1, "Pages not fetched because robots.txt disallows them")
+        return False
+
+    def _parser(self, url: str) -> RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc.lower()}"
+        with self._lock:
+            self._ensure_loaded()
+            parser = self._fresh_parser(origin)
+            if parser is not None:
+                metrics.cache_lookup("robots", True)
+                return parser
+            fetch_lock = self._fetching.setdefault(origin, threading.Lock())
+        # One fetch per origin; other rows of the same site wait for it
+        with fetch_lock:
+            with self._lock:
+                parser = self._fresh_parser(origin)
+                if parser is not None:
+                    return parser
+            metrics.cache_lookup("robots", False)
+            entry = self.scheduler.submit(f"{origin}/robots.txt", self._fetch).result()
+            with self._lock:
+                self._entries[origin] = entry
+                self._parsers.pop(origin, None)
+                self._dirty = True
+                parser = self._fresh_parser(origin)
+                if time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+                    self._save_locked()
+            return parser
+
+    def _fresh_parser(self, origin: str) -> Optional[RobotFileParser]:
+        """Caller holds the lock."""
+        entry = self._entries.get(origin)
+        if entry is None or entry["expires_at"] <= time.time():
+            return None
+        parser = self._parsers.get(origin)
+        if parser is None:
+            parser = self._parsers[origin] = RobotFileParser()
+            parser.parse(entry["rules"].splitlines())
+            delay = parser.crawl_delay(USER_AGENT)
+            if delay:
+                self.scheduler.set_crawl_delay(urlsplit(origin).netloc, float(delay))
+        return parser
+
+    def _fetch(self, robots_url: str) -> dict:
+        now = time.time()
+        try:
+            with LIMITERS["scrape"].slot() as slot:
+                response = requests.get(robots_url, headers=HEADERS, timeout=10)
+                slot.status(response.status_code)
+        except Exception as e:
+            logger.info(f"robots.txt unreachable at {robots_url} ({e}), not crawling the site for now")
+            return {"rules": "User-agent: *\nDisallow: /", "fetched_at": now, "expires_at": now + self.ERROR_TTL}
+        if response.status_code >= 500:
+            logger.info(f"robots.txt at {robots_url} answered {response.status_code}, not crawling the site for now")
+            return {"rules": "User-agent: *\nDisallow: /", "fetched_at": now, "expires_at": now + self.ERROR_TTL}
+        rules = response.text[:self.MAX_BYTES] if response.status_code < 400 else ""
+        return {"rules": rules, "fetched_at": now, "expires_at": now + self.max_age}
+
+    def _ensure_loaded(self) -> None:
+        """Caller holds the lock."""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path) as f:
+                self._entries.update(json.load(f).get("origins", {}))
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError):
+            logger.warning(f"Ignoring unreadable robots.txt cache {self.path}")
+
+    def save(self) -> None:
+        with self._lock:
+            self._save_locked()
+
+    def _save_locked(self) -> None:
+        if not self._dirty:
+            return
+        now = time.time()
+        # Merge what other processes saved meanwhile (newest entry wins), drop expired ones, swap atomically
+        try:
+            with open(self.path) as f:
+                for origin, entry in json.load(f).get("origins", {}).items():
+                    if entry.get("fetched_at", 0) > self._entries.get(origin, {}).get("fetched_at", 0):
+                        self._entries[origin] = entry
+                        self._parsers.pop(origin, None)
+        except (OSError, ValueError):
+            pass
+        self._entries = {o: e for o, e in self._entries.items() if e["expires_at"] > now}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump({"origins": self._entries}, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            logger.exception(f"Failed to save robots.txt cache to {self.path}")
+            return
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+
+# Shared by every campaign in the process; None when disabled
+ROBOTS = RobotsCache(ROBOTS_CACHE_PATH, ROBOTS_CACHE_HOURS * 60 * 60) if ROBOTS_ENABLED else None
@@ -1,74 +1,157 @@
-import requests
 import json
+import logging
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+import breaker
+from limiter import LIMITERS
+from schema import SchemaCache
+from deadline import Deadline, NO_DEADLINE
 from config import (
     BASEROW_API_TOKEN, BASEROW_API_URL,
     OUTREACH_DATABASE_ID
 )
 
+logger = logging.getLogger(__name__)
+
+# Seconds before a Baserow call counts as a timeout (previously calls could hang forever)
+BASEROW_TIMEOUT = 60
+
 HEADERS = {"Authorization": f"Token {BASEROW_API_TOKEN}"}
 
+# One pooled session for every Baserow call, shared by all threads and campaigns
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+
+
+def _probe() -> int:
+    return SESSION.get(f"{BASEROW_API_URL}/api/database/tables/all-tables/", headers=HEADERS, timeout=10).status_code
 
-def get_row(table_id, row_id):
-    url = f"{BASEROW_API_URL}api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
 
-    response = requests.get(url, headers=HEADERS)
+BREAKER = breaker.get("baserow", probe=_probe)
+
+
+def warm_up() -> None:
+    """Open a pooled connection, check the token and cache the table list before the first row needs Baserow."""
+    SCHEMAS.tables(refresh=True)
+
+
+def _request(method: str, url: str, deadline: Deadline = NO_DEADLINE, **kwargs) -> requests.Response:
+    """
+    One Baserow call under the adaptive concurrency limit (429/5xx and timeouts shrink it)
+    and the circuit breaker (raises ``breaker.ServiceUnavailable`` while Baserow is down).
+    A row's ``deadline`` shortens the timeout to the time it has left.
+    """
+    timeout = kwargs.pop("timeout", BASEROW_TIMEOUT)
+    with BREAKER.guard() as call, LIMITERS["baserow"].slot() as slot, deadline.bound(timeout) as timeout:
+        response = SESSION.request(method, url, timeout=timeout, **kwargs)
+        slot.status(response.status_code)
+        call.status(response.status_code)
+    return response
+
+
+def _rows_url(table_id, include=None, unprocessed: bool = False, page: int = None, size: int = None) -> str:
+    """
+    The rows endpoint addressed by field id: only the ``include`` fields (names) and, with
+    ``unprocessed``, only rows whose STATUS is empty (filtered by Baserow, not here).
+    """
+    params = []
+    if size:
+        params.append(f"size={size}")
+    if page:
+        params.append(f"page={page}")
+    if include:
+        keys = SCHEMAS.keys(table_id, include)
+        if keys:
+            params.append("include=" + ",".join(keys))
+    if unprocessed:
+        status_key = SCHEMAS.key(table_id, "STATUS")
+        if status_key:
+            params.append(f"filter__{status_key}__empty=")
+    url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/"
+    return f"{url}?{'&'.join(params)}" if params else url
+
+
+def _raise_for_status(table_id, response: requests.Response) -> None:
+    """``raise_for_status``, first dropping the cached schema when Baserow rejected the request body."""
+    if response.status_code == 400:
+        SCHEMAS.invalidate(table_id)
+    response.raise_for_status()
+
+
+def _is_unprocessed(row: dict) -> bool:
+    status = row.get("STATUS")
+    return status is None or (isinstance(status, str) and status.strip() == "")
+
+
+@metrics.instrumented("baserow", op="get_row")
+def get_row(table_id, row_id, deadline: Deadline = NO_DEADLINE):
+    url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/{row_id}/"
+
+    response = _request("GET", url, deadline, headers=HEADERS)
 
     if response.status_code == 200:
-        return response.json()
+        return SCHEMAS.table(table_id).to_names(response.json())
     else:
         raise Exception(f"Failed to fetch row: {response.status_code} - {response.text}")
 
 
+@metrics.instrumented("baserow", op="get_tables_in_outreach_database")
 def get_tables_in_outreach_database():
-    """Get all tables in the Outreach database (filtered from all-tables)."""
-    url = f"{BASEROW_API_URL}/api/database/tables/all-tables/"
-    response = requests.get(url, headers=HEADERS)
-    response.raise_for_status()
-    all_tables = response.json()
+    """Get all tables in the Outreach database (filtered from the cached list of all tables)."""
     outreach_tables = [
         {"id": t["id"], "name": t["name"]}
-        for t in all_tables
+        for t in SCHEMAS.tables()
         if t["database_id"] == int(OUTREACH_DATABASE_ID)
     ]
     return outreach_tables
 
+@metrics.instrumented("baserow", op="_get_table_data")
 def _get_table_data(table_id):
     if not table_id:
         return []
-    url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/?user_field_names=true"
-    response = requests.get(url, headers=HEADERS)
+    response = _request("GET", _rows_url(table_id), headers=HEADERS)
     response.raise_for_status()
-    return response.json().get("results", [])
+    schema = SCHEMAS.table(table_id)
+    return [schema.to_names(row) for row in response.json().get("results", [])]
 
-def get_next_row(table_id):
-    url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/?user_field_names=true"
-    response = requests.get(url, headers=HEADERS)
-    response.raise_for_status()
-    rows = response.json().get("results", [])
-    for row in rows:
-        status = row.get("STATUS")
-        if status is None or status.strip() == "":
-            return row
-    return None
-
-def delete_row(table_id, row_id):
+@metrics.instrumented("baserow", op="get_next_row")
+def get_next_row(table_id, exclude_ids=None, include=None):
+    """
+    Return the first row without a STATUS, skipping ids in ``exclude_ids`` (rows in flight, dropped
+    or held back). Pages through the table, so any number of excluded rows can come first.
+    ``include`` limits the fields fetched.
+    """
+    rows = _find_unprocessed(table_id, exclude_ids or set(), 1, include)
+    return rows[0] if rows else None
+
+@metrics.instrumented("baserow", op="delete_row")
+def delete_row(table_id, row_id, deadline: Deadline = NO_DEADLINE):
     url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/{row_id}/"
-    response = requests.delete(url, headers=HEADERS)
+    response = _request("DELETE", url, deadline, headers=HEADERS)
     if response.status_code == 204:
         return True
     else:
         raise Exception(f"Delete failed: {response.status_code} - {response.text}")
 
-def update_cell(table_id, row_id, field_name, value):
-    data = {field_name: value}
-    url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/{row_id}/?user_field_names=true"
-    response = requests.patch(url, headers={**HEADERS, "Content-Type": "application/json"}, json=data)
-    response.raise_for_status()
+@metrics.instrumented("baserow", op="update_cell")
+def update_cell(table_id, row_id, field_name, value, deadline: Deadline = NO_DEADLINE):
+    data = SCHEMAS.payload(table_id, {field_name: value})
+    if not data:
+        return
+    url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/{row_id}/"
+    response = _request("PATCH", url, deadline, headers={**HEADERS, "Content-Type": "application/json"}, json=data)
+    _raise_for_status(table_id, response)
 
+@metrics.instrumented("baserow", op="create_main_table_row")
 def create_main_table_row(
     table_id: int,
     row_data: dict,
-    api_url: str = BASEROW_API_URL
+    api_url: str = BASEROW_API_URL,
+    deadline: Deadline = NO_DEADLINE
 ) -> dict:
     """
     Creates a new row in the specified Baserow table.
@@ -77,11 +160,129 @@ def create_main_table_row(
     :param table_id: The ID of the Baserow table
     :param row_data: A dictionary representing the row fields and their values
     :param api_url: The base URL of your Baserow instance
+    :param deadline: The row's time budget; the request times out when it runs out
     :return: The JSON response from Baserow
     """
-    url = f"{api_url}/api/database/rows/table/{table_id}/?user_field_names=true"
+    url = f"{api_url}/api/database/rows/table/{table_id}/"
+
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Sending row_data: {json.dumps(row_data, ensure_ascii=False)}")
+    response = _request("POST", url, deadline, headers=HEADERS, json=SCHEMAS.payload(table_id, row_data))
+    _raise_for_status(table_id, response)  # Will raise an error if the request fails
+    return SCHEMAS.table(table_id).to_names(response.json())
 
-    print("Sending row_data:", json.dumps(row_data, indent=2))  # Pretty-print JSON
-    response = requests.post(url, headers=HEADERS, json=row_data)
-    response.raise_for_status()  # Will raise an error if the request fails
+def resolve_table(value, tables_by_name: dict):
+    """A table id given as an id or as a name in ``tables_by_name`` (name -> id). Raises ValueError for an unknown name."""
+    if isinstance(value, int) or str(value).isdigit():
+        return int(value)
+    if value not in tables_by_name:
+        raise ValueError(f"Unknown table '{value}' in Outreach DB")
+    return tables_by_name[value]
+
+@metrics.instrumented("baserow", op="get_table_fields")
+def get_table_fields(table_id):
+    """The field definitions of a table (``id``, ``name``, ``type``, ``primary``, ...)."""
+    url = f"{BASEROW_API_URL}/api/database/fields/table/{table_id}/"
+    response = _request("GET", url, headers=HEADERS)
+    response.raise_for_status()
     return response.json()
+
+@metrics.instrumented("baserow", op="list_tables")
+def list_tables():
+    """Every table the token has access to, in all workspaces (``id``, ``name``, ``database_id``)."""
+    response = _request("GET", f"{BASEROW_API_URL}/api/database/tables/all-tables/", headers=HEADERS)
+    response.raise_for_status()
+    return response.json()
+
+# Field names/ids/types per table and the table list, fetched once per process
+SCHEMAS = SchemaCache(get_table_fields, list_tables)
+
+# Baserow accepts at most this many items per batch request
+BATCH_SIZE = 200
+
+
+def _chunks(items, size=BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+@metrics.instrumented("baserow", op="get_unprocessed_rows")
+def get_unprocessed_rows(table_id, exclude_ids=None, limit=BATCH_SIZE, include=None):
+    """
+    Return up to ``limit`` rows without a STATUS, paging through the table and skipping ``exclude_ids``.
+    ``include`` limits the fields fetched.
+    """
+    return _find_unprocessed(table_id, exclude_ids or set(), limit, include)
+
+
+def _find_unprocessed(table_id, exclude_ids: set, limit: int, include=None) -> list:
+    schema = SCHEMAS.table(table_id)
+    found = []
+    page = 1
+    while len(found) < limit:
+        url = _rows_url(table_id, include, unprocessed=True, page=page, size=BATCH_SIZE)
+        response = _request("GET", url, headers=HEADERS)
+        response.raise_for_status()
+        data = response.json()
+        for row in data.get("results", []):
+            if row.get("id") in exclude_ids:
+                continue
+            row = schema.to_names(row)
+            if _is_unprocessed(row):
+                found.append(row)
+                if len(found) >= limit:
+                    break
+        if not data.get("next"):
+            break
+        page += 1
+    return found
+
+
+def iter_rows(table_id, include=None):
+    """Yield every row of a table, ``BATCH_SIZE`` per request. ``include`` limits the fields fetched."""
+    schema = SCHEMAS.table(table_id)
+    page = 1
+    while True:
+        url = _rows_url(table_id, include, page=page, size=BATCH_SIZE)
+        with metrics.timed("baserow", op="iter_rows"):
+            response = _request("GET", url, headers=HEADERS)
+        response.raise_for_status()
+        data = response.json()
+        for row in data.get("results", []):
+            yield schema.to_names(row)
+        if not data.get("next"):
+            return
+        page += 1
+
+
+@metrics.instrumented("baserow", op="update_rows")
+def update_rows(table_id, items):
+    """Batch-update rows; each item is a dict with ``id`` plus the fields to change."""
+    items = [SCHEMAS.payload(table_id, item) for item in items]
+    for chunk in _chunks(items):
+        url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/batch/"
+        response = _request("PATCH", url, headers={**HEADERS, "Content-Type": "application/json"}, json={"items": chunk})
+        _raise_for_status(table_id, response)
+
+
+@metrics.instrumented("baserow", op="create_main_table_rows")
+def create_main_table_rows(table_id, rows) -> list:
+    """Batch-create rows in the specified table. Returns the created rows in order."""
+    rows = [SCHEMAS.payload(table_id, row) for row in rows]
+    schema = SCHEMAS.table(table_id)
+    created = []
+    for chunk in _chunks(rows):
+        url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/batch/"
+        response = _request("POST", url, headers=HEADERS, json={"items": chunk})
+        _raise_for_status(table_id, response)
+        created.extend(schema.to_names(row) for row in response.json().get("items", []))
+    return created
+
+
+@metrics.instrumented("baserow", op="delete_rows")
+def delete_rows(table_id, row_ids):
+    for chunk in _chunks(list(row_ids)):
+        url = f"{BASEROW_API_URL}/api/database/rows/table/{table_id}/batch-delete/"
+        response = _request("POST", url, headers=HEADERS, json={"items": chunk})
+        if response.status_code != 204:
+            raise Exception(f"Batch delete failed: {response.status_code} - {response.text}")
@@ -0,0 +1,98 @@
+"""
+A time budget for one row, shared by every call made on its behalf.
+
+Each call takes its timeout from the row's ``Deadline``: ``timeout(cap)`` is the smaller of the
+call's usual timeout and what is left of the budget, so a slow site or a hung connection can
+only hold a row for ``ROW_DEADLINE_SECONDS`` in total. A call cut short this way raises
+``DeadlineExceeded`` rather than a timeout: the service is not to blame, so circuit breakers
+and adaptive limits do not count it, and the stages route the row to ``stages.DEADLINE``.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from config import ROW_DEADLINE_SECONDS
+
+
+class DeadlineExceeded(Exception):
+    """The row's time budget ran out. Deliberately not a ``TimeoutError`` (see ``limiter.is_overload``)."""
+
+
+class Deadline:
+    """
+    ``seconds`` of processing time (None or 0: unlimited). The clock can be paused while the
+    row only waits for its turn (pipeline queues, sender pacing), which is not its own cost.
+    """
+
+    def __init__(self, seconds: Optional[float] = ROW_DEADLINE_SECONDS):
+        self.seconds = seconds or None
+        self._expires_at = time.monotonic() + self.seconds if self.seconds else None
+        self._paused_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        return self.seconds is not None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left (None when unlimited), never below 0."""
+        if self._expires_at is None:
+            return None
+        now = self._paused_at if self._paused_at is not None else time.monotonic()
+        return max(0.0, self._expires_at - now)
+
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    def check(self) -> None:
+        if self.expired():
+            raise DeadlineExceeded(f"row deadline of {self.seconds:g}s exceeded")
+
+    def timeout(self, cap: Optional[float]) -> Optional[float]:
+        """The timeout for the next call: ``cap`` or the time left, whichever is shorter."""
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return cap
+        return remaining if cap is None else min(cap, remaining)
+
+    @contextmanager
+    def bound(self, cap: Optional[float]) -> Iterator[Optional[float]]:
+        """
+        Yield ``timeout(cap)`` for one call. Any error the call raises once the budget is gone
+        (the shortened timeout firing, most likely) is re-raised as ``DeadlineExceeded``.
+        """
+        timeout = self.timeout(cap)
+        try:
+            yield timeout
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if self.expired():
+                raise DeadlineExceeded(f"row deadline of {self.seconds:g}s exceeded ({e})") from e
+            raise
+
+    def pause(self) -> None:
+        with self._lock:
+            if self._paused_at is None:
+                self._paused_at = time.monotonic()
+
+    def resume(self) -> None:
+        with self._lock:
+            if self._paused_at is not None:
+                if self._expires_at is not None:
+                    self._expires_at += time.monotonic() - self._paused_at
+                self._paused_at = None
+
+    @contextmanager
+    def paused(self) -> Iterator[None]:
+        self.pause()
+        try:
+            yield
+        finally:
+            self.resume()
+
+
+# For calls made outside any row (batch writes, re-scoring, warm-up)
+NO_DEADLINE = Deadline(None)
@@ -0,0 +1,218 @@
+"""
+Deliverability pre-check for email addresses, before any GPT call or send slot is spent on them.
+
+An address is rejected when it is malformed, is a no-reply/system mailbox, is on a disposable
+domain, or its domain cannot receive mail: no MX records and no A/AAAA record to fall back to
+(RFC 5321), a null MX (RFC 7505), or no such domain. Role accounts (info@, sales@) are only
+rejected with ``DELIVERABILITY_REJECT_ROLE_ACCOUNTS``, as they are often a company's only address.
+
+DNS answers are cached per domain, ``DELIVERABILITY_CACHE_HOURS`` for domains that take mail
+and ``DELIVERABILITY_NEGATIVE_CACHE_HOURS`` for those that do not. A lookup that fails (timeout,
+SERVFAIL) lets the address through and is retried after ``ERROR_TTL``: a resolver problem must
+not cost real prospects. Lookups made for a row are bounded by the row's deadline. The resolver is
+anything with ``mail_hosts(domain, timeout)``, so tests and the benchmark can point it at a local
+DNS stand-in (``DELIVERABILITY_NAMESERVERS``).
+"""
+import time
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import metrics
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+from config import (
+    DELIVERABILITY_ENABLED, DELIVERABILITY_NAMESERVERS, DELIVERABILITY_DNS_TIMEOUT,
+    DELIVERABILITY_CACHE_HOURS, DELIVERABILITY_NEGATIVE_CACHE_HOURS,
+    DELIVERABILITY_REJECT_ROLE_ACCOUNTS, DISPOSABLE_DOMAINS_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+# Mailboxes nobody reads; mail to them is never a reply
+NO_REPLY_MAILBOXES = frozenset({
+    "noreply", "no-reply", "no_reply", "donotreply", "do-not-reply", "do_not_reply",
+    "mailer-daemon", "postmaster", "bounce", "bounces", "unsubscribe", "abuse",
+})
+ROLE_MAILBOXES = frozenset({
+    "info", "contact", "hello", "sales", "support", "admin", "office", "team", "help",
+    "enquiries", "inquiries", "marketing", "press", "media", "jobs", "careers", "hr", "billing",
+})
+DISPOSABLE_DOMAINS = frozenset({
+    "mailinator.com", "guerrillamail.com", "guerrillamail.net", "sharklasers.com", "10minutemail.com",
+    "tempmail.com", "temp-mail.org", "yopmail.com", "trashmail.com", "dispostable.com", "getnada.com",
+    "maildrop.cc", "throwawaymail.com", "fakeinbox.com", "mintemail.com", "emailondeck.com",
+    "mohmal.com", "mailnesia.com", "spamgourmet.com", "tempinbox.com",
+})
+
+# Failed lookups are retried after this many seconds
+ERROR_TTL = 10 * 60
+# Past this many cached domains, expired entries are dropped
+MAX_ENTRIES = 50000
+
+
+class DnsResolver:
+    """Mail hosts of a domain via dnspython; ``nameservers`` ("host" or "host:port") replace the system ones."""
+
+    def __init__(self, nameservers: Iterable[str] = (), timeout: float = 5.0):
+        self.nameservers = list(nameservers)
+        self.timeout = timeout
+        self._resolver = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        """dnspython is imported, and the system resolver read, on first use."""
+        with self._lock:
+            if self._resolver is None:
+                import dns.resolver
+                import dns.nameserver
+                resolver = dns.resolver.Resolver(configure=not self.nameservers)
+                if self.nameservers:
+                    resolver.nameservers = [
+                        dns.nameserver.Do53Nameserver(host, int(port or 53))
+                        for host, _, port in (entry.partition(":") for entry in self.nameservers)
+                    ]
+                resolver.lifetime = self.timeout
+                self._resolver = resolver
+            return self._resolver
+
+    def warm_up(self) -> None:
+        self._get()
+
+    def mail_hosts(self, domain: str, timeout: Optional[float] = None) -> List[str]:
+        """
+        Where mail for ``domain`` goes: its MX hosts, or the domain itself when it has only an
+        A/AAAA record. ``[]`` when it takes no mail. Raises ``dns.exception.DNSException`` when
+        that cannot be told (timeouts, failing servers). ``timeout`` can only shorten the
+        resolver's own timeout.
+        """
+        import dns.resolver
+        resolver = self._get()
+        lifetime = self.timeout if timeout is None else min(timeout, self.timeout)
+        try:
+            answer = resolver.resolve(domain, "MX", lifetime=lifetime)
+            hosts = [str(r.exchange).rstrip(".") for r in sorted(answer, key=lambda r: r.preference)]
+            # A null MX ("0 .") says the domain accepts no mail
+            return [host for host in hosts if host]
+        except dns.resolver.NXDOMAIN:
+            return []
+        except dns.resolver.NoAnswer:
+            pass
+        for rdtype in ("A", "AAAA"):
+            try:
+                resolver.resolve(domain, rdtype, lifetime=lifetime)
+                return [domain]
+            except dns.resolver.NXDOMAIN:
+                return []
+            except dns.resolver.NoAnswer:
+                continue
+        return []
+
+
+def load_disposable_domains(path: str) -> frozenset:
+    """The built-in disposable domains plus those listed in ``path`` (one per line, # comments)."""
+    if not path:
+        return DISPOSABLE_DOMAINS
+    try:
+        with open(path, encoding="utf-8") as f:
+            extra = {line.split("#", 1)[0].strip().lower() for line in f}
+    except OSError:
+        logger.exception(f"Could not read disposable domains from {path}, using the built-in list")
+        return DISPOSABLE_DOMAINS
+    extra.discard("")
+    return DISPOSABLE_DOMAINS | extra
+
+
+class DeliverabilityChecker:
+    def __init__(self, resolver, ttl: float = 24 * 60 * 60, negative_ttl: float = 6 * 60 * 60,
+                 disposable_domains: Iterable[str] = DISPOSABLE_DOMAINS, reject_roles: bool = False):
+        self.resolver = resolver
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.disposable_domains = frozenset(disposable_domains)
+        self.reject_roles = reject_roles
+        self._domains: Dict[str, Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+
+    def check(self, email: str, deadline: Deadline = NO_DEADLINE) -> Optional[str]:
+        """
+        Why ``email`` should not be mailed, or ``None`` when it looks deliverable. Raises
+        ``DeadlineExceeded`` when ``deadline`` runs out before the domain's lookup is done.
+        """
+        # pydantic/email-validator are imported on first use to keep startup fast
+        from models import normalize_email
+
+        try:
+            email = normalize_email(email or "")
+        except ValueError:
+            return self._reject("invalid address")
+        local, domain = email.rsplit("@", 1)
+        local = local.lower()
+        if local in NO_REPLY_MAILBOXES:
+            return self._reject("no-reply mailbox")
+        if self.reject_roles and local in ROLE_MAILBOXES:
+            return self._reject("role account")
+        if self._is_disposable(domain):
+            return self._reject("disposable domain")
+        if not self._takes_mail(domain, deadline):
+            return self._reject("no mail server")
+        metrics.count_outcome("deliverability", "ok")
+        return None
+
+    def warm_up(self) -> None:
+        """Import dnspython and read the resolver configuration before the first row needs them."""
+        if hasattr(self.resolver, "warm_up"):
+            self.resolver.warm_up()
+
+    def deliverable(self, emails: Iterable[str], deadline: Deadline = NO_DEADLINE) -> List[str]:
+        """The addresses in ``emails`` that pass ``check``, in order."""
+        kept = []
+        for email in emails:
+            reason = self.check(email, deadline)
+            if reason is None:
+                kept.append(email)
+            else:
+                logger.info(f"Not considering {email}: {reason}")
+        return kept
+
+    def _reject(self, reason: str) -> str:
+        metrics.count_outcome("deliverability", reason)
+        return reason
+
+    def _is_disposable(self, domain: str) -> bool:
+        # Subdomains of a disposable domain are disposable too
+        parts = domain.split(".")
+        return any(".".join(parts[i:]) in self.disposable_domains for i in range(len(parts) - 1))
+
+    def _takes_mail(self, domain: str, deadline: Deadline) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._domains.get(domain)
+        if entry is not None and entry[1] > now:
+            metrics.cache_lookup("mx", True)
+            return entry[0]
+        metrics.cache_lookup("mx", False)
+        try:
+            with deadline.bound(None) as timeout:
+                takes_mail = bool(self.resolver.mail_hosts(domain, timeout))
+            ttl = self.ttl if takes_mail else self.negative_ttl
+        except DeadlineExceeded:
+            # The row's budget ran out, not the resolver: nothing is cached
+            raise
+        except Exception as e:
+            logger.warning(f"MX lookup for {domain} failed ({e}); assuming it takes mail for now")
+            takes_mail, ttl = True, ERROR_TTL
+        with self._lock:
+            if len(self._domains) >= MAX_ENTRIES:
+                self._domains = {d: e for d, e in self._domains.items() if e[1] > now}
+            self._domains[domain] = (takes_mail, now + ttl)
+        return takes_mail
+
+
+# Shared by every campaign in the process; None when disabled
+DELIVERABILITY = DeliverabilityChecker(
+    DnsResolver(DELIVERABILITY_NAMESERVERS, DELIVERABILITY_DNS_TIMEOUT),
+    DELIVERABILITY_CACHE_HOURS * 60 * 60,
+    DELIVERABILITY_NEGATIVE_CACHE_HOURS * 60 * 60,
+    load_disposable_domains(DISPOSABLE_DOMAINS_PATH),
+    DELIVERABILITY_REJECT_ROLE_ACCOUNTS,
+) if DELIVERABILITY_ENABLED else None
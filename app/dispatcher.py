@@ -0,0 +1,146 @@
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Optional
+
+import email_sender
+import log_setup
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+from sender_scheduler import SendSlot
+
+logger = logging.getLogger(__name__)
+
+# How often an idle dispatcher re-checks quotas/working hours while a send is waiting
+IDLE_RECHECK_SECONDS = 60
+
+
+def wait_for_sender(sender_scheduler, is_active: Callable[[], bool], stop: threading.Event) -> Optional[SendSlot]:
+    """Block until a sender account can send (quota, calendar, pacing) and reserve the send, or until ``stop`` is set."""
+    while not stop.is_set():
+        if is_active():
+            slot = sender_scheduler.acquire()
+            if slot:
+                return slot
+            wait = sender_scheduler.seconds_until_capacity() or IDLE_RECHECK_SECONDS
+        else:
+            wait = IDLE_RECHECK_SECONDS
+        stop.wait(min(wait, IDLE_RECHECK_SECONDS))
+    return None
+
+
+def send_from_account(sender_scheduler, slot: SendSlot, row_id, email_data: dict, row: dict,
+                      deadline: Deadline = NO_DEADLINE) -> tuple:
+    """Send one email with a slot handed out by ``acquire`` and report the outcome back."""
+    account = slot.account
+    logger.info(f"Row {row_id}: Sending email from {account['email']}...")
+    print(f"Row {row_id}: Sending email from {account['email']}...")
+    started = time.monotonic()
+    try:
+        success, msg = email_sender.send_email(email_data, row, account, deadline)
+    except Exception:
+        sender_scheduler.report(slot, False)
+        raise
+    sender_scheduler.report(slot, success)
+    logger.info(f"Row {row_id}: Send attempt took {time.monotonic() - started:.1f}s")
+    return success, msg
+
+
+class _SendJob:
+    def __init__(self, row_id, email_data: dict, row: dict, on_sent: Callable[[bool, str], None],
+                 on_unsent: Optional[Callable[[], None]] = None, deadline: Deadline = NO_DEADLINE):
+        self.row_id = row_id
+        self.email_data = email_data
+        self.row = row
+        self.on_sent = on_sent
+        self.on_unsent = on_unsent
+        self.deadline = deadline
+
+
+class EmailDispatcher:
+    """
+    Sends emails on a background thread so row processing never waits on send pacing.
+
+    Rows that need an email are handed over with ``submit``; the dispatcher waits until
+    a sender account is free (quota, active hours and the human-like delay between sends
+    are all enforced by the SenderScheduler), sends, and then calls the job's ``on_sent``
+    callback with ``(success, message)`` to finish the row. The pending queue is bounded,
+    so ``submit`` blocks once too many emails are waiting.
+    """
+
+    def __init__(self, sender_scheduler, is_active: Callable[[], bool] = lambda: True, max_pending: int = 5):
+        self.sender_scheduler = sender_scheduler
+        self.is_active = is_active
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="email-dispatcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def submit(self, row_id, email_data: dict, row: dict, on_sent: Callable[[bool, str], None],
+               on_unsent: Optional[Callable[[], None]] = None, deadline: Deadline = NO_DEADLINE) -> None:
+        """
+        ``on_unsent`` is called when the send raised, leaving the row to be picked up again.
+        The row's ``deadline`` is paused until a sender account is free.
+        """
+        with self._lock:
+            self._in_flight.add(row_id)
+        deadline.pause()
+        self._queue.put(_SendJob(row_id, email_data, row, on_sent, on_unsent, deadline))
+
+    def in_flight_ids(self) -> set:
+        """Row ids that are queued or being sent and must not be picked up again."""
+        with self._lock:
+            return set(self._in_flight)
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                job = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                with log_setup.context(job.row_id, "send"):
+                    self._send(job)
+            finally:
+                with self._lock:
+                    self._in_flight.discard(job.row_id)
+                self._queue.task_done()
+
+    def _send(self, job: _SendJob) -> None:
+        slot = wait_for_sender(self.sender_scheduler, self.is_active, self._stop)
+        if not slot:
+            return
+        email_sender.server_breaker(slot.account).wait_until_available(self._stop)
+
+        job.deadline.resume()
+        try:
+            success, msg = send_from_account(self.sender_scheduler, slot, job.row_id, job.email_data, job.row,
+                                             job.deadline)
+        except DeadlineExceeded:
+            if job.on_unsent:
+                job.on_unsent()
+            return
+        except Exception as e:
+            logger.exception(f"Row {job.row_id}: Email sending raised an exception.")
+            print(f"Email sending raised exception: {e}")
+            if job.on_unsent:
+                job.on_unsent()
+            return
+
+        try:
+            job.on_sent(success, msg)
+        except Exception:
+            logger.exception(f"Row {job.row_id}: Failed to finish row after sending")
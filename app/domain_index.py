@@ -0,0 +1,264 @@
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import db
+import metrics
+from config import (
+    MAIN_VENTURES_TABLE_ID, MAIN_INVESTORS_TABLE_ID,
+    DOMAIN_INDEX_ENABLED, DOMAIN_INDEX_PATH, DOMAIN_INDEX_MAX_AGE_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+# Unsaved additions are written out at most this often (and always at exit)
+SAVE_INTERVAL = 30
+# Bumped whenever normalize_domain changes, so a saved index with the old keys is rebuilt
+KEY_VERSION = 2
+
+# Hosts that serve many companies' pages, and how many leading path segments name the company
+SHARED_HOSTS = {
+    "sites.google.com": 2,   # /view/<site>, /site/<site>
+    "linkedin.com": 2,       # /company/<name>
+    "angel.co": 2,           # /company/<name>
+    "wellfound.com": 2,      # /company/<name>
+    "crunchbase.com": 2,     # /organization/<name>
+    "facebook.com": 1,
+    "instagram.com": 1,
+    "twitter.com": 1,
+    "x.com": 1,
+    "medium.com": 1,
+    "linktr.ee": 1,
+    "wixsite.com": 1,        # <account>.wixsite.com/<site>
+}
+
+
+def _shared_segments(host: str) -> int:
+    for shared, segments in SHARED_HOSTS.items():
+        if host == shared or host.endswith("." + shared):
+            return segments
+    return 0
+
+
+def normalize_domain(url: str) -> Optional[str]:
+    """
+    ``https://www.Example.com:443/about`` -> ``example.com``; ``None`` when there is no host.
+    On a shared host the path segments that name the company are kept:
+    ``linkedin.com/company/acme/about`` -> ``linkedin.com/company/acme``.
+    """
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip().lower()
+    if "://" not in url:
+        url = "//" + url
+    try:
+        parts = urlsplit(url)
+        host = parts.hostname
+        port = parts.port
+    except ValueError:
+        return None
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    host = host.rstrip(".")
+    # A non-default port is a different site; the default ones are the same site
+    site = f"{host}:{port}" if port not in (None, 80, 443) else host
+    segments = _shared_segments(host)
+    if segments:
+        path = [segment for segment in parts.path.split("/") if segment][:segments]
+        if path:
+            site = "/".join([site] + path)
+    return site
+
+
+def normalize_email(email: str) -> Optional[str]:
+    if not email or not isinstance(email, str) or "@" not in email:
+        return None
+    return email.strip().lower()
+
+
+class DomainIndex:
+    """
+    Normalized website domains and email addresses of every row in the main Ventures and
+    Investors tables, kept in memory and persisted to ``path``.
+
+    The first lookup builds it by paging through the main tables (only the Website and
+    Email fields), or loads it from disk when the saved copy covers the same tables and is
+    younger than ``max_age`` seconds. Rows created by this process are added as they are
+    written, so later lookups never go back to Baserow.
+    """
+
+    def __init__(self, path: str, table_ids: Iterable, max_age: float = 24 * 60 * 60):
+        self.path = path
+        self.table_ids = sorted(str(t) for t in table_ids if t)
+        self.max_age = max_age
+        self.domains = set()
+        self.emails = set()
+        # Keys of rows this run has started on but not written yet, so concurrent rows
+        # for the same company are caught too, with the id of the row holding each. Never persisted.
+        self._claimed: Dict[tuple, object] = {}
+        self._built_at = 0.0
+        self._loaded = False
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def keys_for(row: dict) -> set:
+        keys = set()
+        domain = normalize_domain(row.get("Website"))
+        if domain:
+            keys.add(("domain", domain))
+        email = normalize_email(row.get("Email"))
+        if email:
+            keys.add(("email", email))
+        return keys
+
+    def _contains(self, key) -> bool:
+        kind, value = key
+        return value in (self.domains if kind == "domain" else self.emails)
+
+    # --- loading ---
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        if not self._load():
+            self.rebuild()
+        self._loaded = True
+        atexit.register(self.save)
+
+    def _load(self) -> bool:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable domain index {self.path}: {e}")
+            return False
+        if data.get("tables") != self.table_ids:
+            logger.info("Domain index was built for other tables, rebuilding")
+            return False
+        if data.get("version") != KEY_VERSION:
+            logger.info("Domain index uses an older key format, rebuilding")
+            return False
+        if time.time() - data.get("built_at", 0) > self.max_age:
+            logger.info("Domain index is older than the maximum age, rebuilding")
+            return False
+        self.domains = set(data.get("domains", []))
+        self.emails = set(data.get("emails", []))
+        self._built_at = data["built_at"]
+        logger.info(f"Loaded domain index: {len(self.domains)} domains, {len(self.emails)} emails")
+        return True
+
+    def load(self) -> None:
+        """Load or build the index now instead of on the first lookup."""
+        with self._lock:
+            self._ensure_loaded()
+
+    def rebuild(self) -> None:
+        """Re-read both main tables from Baserow and save."""
+        with self._lock:
+            domains, emails = set(), set()
+            started = time.perf_counter()
+            rows = 0
+            for table_id in self.table_ids:
+                for row in db.iter_rows(table_id, include=("Website", "Email")):
+                    rows += 1
+                    for kind, value in self.keys_for(row):
+                        (domains if kind == "domain" else emails).add(value)
+            self.domains, self.emails = domains, emails
+            self._built_at = time.time()
+            self._dirty = True
+            logger.info(f"Built domain index from {rows} rows in {time.perf_counter() - started:.1f}s: "
+                        f"{len(domains)} domains, {len(emails)} emails")
+            self.save()
+
+    # --- lookups and updates ---
+
+    def known_as(self, row: dict) -> Optional[str]:
+        """The domain/email under which ``row`` is already in a main table, or ``None``."""
+        keys = self.keys_for(row)
+        with self._lock:
+            self._ensure_loaded()
+            return next((key[1] for key in keys if self._contains(key)), None)
+
+    def claim(self, row: dict) -> Optional[str]:
+        """
+        Return the domain/email under which ``row`` is already known (in the main tables or
+        taken by another row of this run), or ``None`` after reserving its keys for this row.
+        A row picked up again finds its own earlier claim free.
+        """
+        keys = self.keys_for(row)
+        row_id = row.get("id")
+        with self._lock:
+            self._ensure_loaded()
+            for key in keys:
+                if self._contains(key) or (key in self._claimed and self._claimed[key] != row_id):
+                    metrics.cache_lookup("domain_index", True)
+                    return key[1]
+            for key in keys:
+                self._claimed[key] = row_id
+        metrics.cache_lookup("domain_index", False)
+        return None
+
+    def release(self, row_id) -> None:
+        """Give back the keys reserved by ``claim`` for a row that was not written."""
+        with self._lock:
+            self._claimed = {key: owner for key, owner in self._claimed.items() if owner != row_id}
+
+    def add(self, row: dict) -> None:
+        """Record a row written to a main table."""
+        keys = self.keys_for(row)
+        if not keys:
+            return
+        with self._lock:
+            for kind, value in keys:
+                (self.domains if kind == "domain" else self.emails).add(value)
+            self._dirty = True
+            if self._loaded and time.monotonic() - self._last_save >= SAVE_INTERVAL:
+                self.save()
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            # Merge what other processes saved meanwhile, then swap atomically
+            try:
+                with open(self.path) as f:
+                    on_disk = json.load(f)
+                if on_disk.get("tables") == self.table_ids and on_disk.get("version") == KEY_VERSION:
+                    self.domains.update(on_disk.get("domains", []))
+                    self.emails.update(on_disk.get("emails", []))
+            except (OSError, ValueError):
+                pass
+            data = {
+                "version": KEY_VERSION,
+                "tables": self.table_ids,
+                "built_at": self._built_at,
+                "domains": sorted(self.domains),
+                "emails": sorted(self.emails),
+            }
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w") as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                logger.exception(f"Failed to save domain index to {self.path}")
+                return
+            self._dirty = False
+            self._last_save = time.monotonic()
+
+
+# Shared by every campaign in the process; None when disabled
+DOMAIN_INDEX = DomainIndex(
+    DOMAIN_INDEX_PATH, [MAIN_VENTURES_TABLE_ID, MAIN_INVESTORS_TABLE_ID], DOMAIN_INDEX_MAX_AGE_HOURS * 60 * 60
+) if DOMAIN_INDEX_ENABLED else None
@@ -7,10 +7,35 @@ import logging
 from socket import error as socket_error
 import json
 
+import metrics
+import breaker
+from limiter import LIMITERS
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+
 logger = logging.getLogger(__name__)
 
-def send_email(gpt_result, row=None, sender_account=None) -> tuple:
-    """Send email using GPT result (JSON string or dict). Returns (success: bool, message: str)"""
+# Seconds each SMTP step (connect, login, send) may take
+SMTP_TIMEOUT = 30
+
+def send_email(gpt_result, row=None, sender_account=None, deadline: Deadline = NO_DEADLINE) -> tuple:
+    """
+    Send email using GPT result (JSON string or dict). Returns (success: bool, message: str).
+    Raises ``breaker.ServiceUnavailable`` when the SMTP server is down, so the row can be retried,
+    and ``DeadlineExceeded`` when the row's ``deadline`` runs out first.
+    """
+    with metrics.timed("smtp"):
+        try:
+            success, message = _send_email(gpt_result, sender_account, deadline)
+        except breaker.ServiceUnavailable:
+            metrics.count_outcome("smtp_send", "unavailable")
+            raise
+        except DeadlineExceeded:
+            metrics.count_outcome("smtp_send", "deadline")
+            raise
+    metrics.count_outcome("smtp_send", "sent" if success else "failed")
+    return success, message
+
+def _send_email(gpt_result, sender_account, deadline: Deadline) -> tuple:
     try:
         # Parse if string
         if isinstance(gpt_result, str):
@@ -56,42 +81,83 @@ def send_email(gpt_result, row=None, sender_account=None) -> tuple:
         msg['Subject'] = subject
         msg.attach(MIMEText(body, 'plain'))
 
-        if sender_account.get('smtp_port', 465) == 465:
-            # Implicit SSL
-            server = smtplib.SMTP_SSL(sender_account['smtp_server'], sender_account.get('smtp_port', 465), timeout=30)
-        else:
-            # Explicit SSL with STARTTLS (typically port 587)
-            server = smtplib.SMTP(sender_account['smtp_server'], sender_account.get('smtp_port', 587), timeout=30)
-            server.starttls()
-
+        smtp_breaker = server_breaker(sender_account)
         try:
-            server.login(sender_account['smtp_username'], sender_account['smtp_password'])
-            server.send_message(msg)
-            logger.info(f"Email sent successfully to {to_email}")
-            return True, "Email sent successfully"
-            
-        except smtplib.SMTPAuthenticationError:
-            error_msg = "SMTP Authentication failed - check username/password"
-            logger.error(error_msg)
-            return False, error_msg
-            
-        except smtplib.SMTPException as e:
-            error_msg = f"SMTP Error: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
-            
-        except socket_error as e:
-            error_msg = f"Connection error: {str(e)}"
-            logger.error(error_msg)
-            return False, error_msg
-            
-        finally:
-            try:
-                server.quit()
-            except:
-                pass
-                
+            with smtp_breaker.guard(), LIMITERS["smtp"].slot(), deadline.bound(SMTP_TIMEOUT):
+                _deliver(msg, sender_account, deadline)
+        except Exception as e:
+            if not breaker.is_outage(e) or isinstance(e, breaker.ServiceUnavailable):
+                raise
+            logger.error(f"SMTP server {sender_account['smtp_server']} unavailable: {e}")
+            raise breaker.ServiceUnavailable(smtp_breaker.name) from e
+        logger.info(f"Email sent successfully to {to_email}")
+        return True, "Email sent successfully"
+
+    except (breaker.ServiceUnavailable, DeadlineExceeded):
+        raise
+
+    except smtplib.SMTPAuthenticationError:
+        error_msg = "SMTP Authentication failed - check username/password"
+        logger.error(error_msg)
+        return False, error_msg
+
+    except smtplib.SMTPException as e:
+        error_msg = f"SMTP Error: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
+    except socket_error as e:
+        error_msg = f"Connection error: {str(e)}"
+        logger.error(error_msg)
+        return False, error_msg
+
     except Exception as e:
         error_msg = f"Unexpected error: {str(e)}"
         logger.error(error_msg)
-        return False, error_msg
\ No newline at end of file
+        return False, error_msg
+
+def _connect(sender_account, timeout: float = SMTP_TIMEOUT) -> smtplib.SMTP:
+    """An open connection to the account's SMTP server, TLS already negotiated."""
+    if sender_account.get('smtp_port', 465) == 465:
+        # Implicit SSL
+        return smtplib.SMTP_SSL(sender_account['smtp_server'], sender_account.get('smtp_port', 465), timeout=timeout)
+    # Explicit SSL with STARTTLS (typically port 587)
+    server = smtplib.SMTP(sender_account['smtp_server'], sender_account.get('smtp_port', 587), timeout=timeout)
+    # "smtp_starttls": false is only meant for local relays/test sinks
+    if sender_account.get('smtp_starttls', True):
+        try:
+            server.starttls()
+        except Exception:
+            server.close()
+            raise
+    return server
+
+def _deliver(msg, sender_account, deadline: Deadline = NO_DEADLINE) -> None:
+    """
+    Connect, log in and send; SMTP and socket errors propagate to the caller. Every step
+    times out after ``SMTP_TIMEOUT`` seconds or when the row's ``deadline`` runs out.
+    """
+    server = _connect(sender_account, deadline.timeout(SMTP_TIMEOUT))
+    try:
+        server.sock.settimeout(deadline.timeout(SMTP_TIMEOUT))
+        server.login(sender_account['smtp_username'], sender_account['smtp_password'])
+        server.sock.settimeout(deadline.timeout(SMTP_TIMEOUT))
+        server.send_message(msg)
+    finally:
+        try:
+            server.quit()
+        except:
+            pass
+
+def _probe(sender_account) -> None:
+    with _connect(sender_account, timeout=10) as server:
+        server.noop()
+
+def warm_up(sender_account) -> None:
+    """Resolve, connect and log in once at startup, so bad credentials show up before the first send."""
+    with _connect(sender_account, timeout=10) as server:
+        server.login(sender_account['smtp_username'], sender_account['smtp_password'])
+
+def server_breaker(sender_account) -> breaker.CircuitBreaker:
+    """One breaker per SMTP server, shared by every account that sends through it."""
+    return breaker.get(f"smtp:{sender_account['smtp_server']}", probe=lambda: _probe(sender_account))
@@ -0,0 +1,128 @@
+"""
+HTML -> text and email addresses, on a pool of worker processes.
+
+Parsing with BeautifulSoup is pure Python and holds the GIL, so with many fetches in flight it
+caps a process at one core no matter how many threads it runs. ``POOL`` sends the raw page
+bytes to ``PARSE_PROCESSES`` worker processes, and only the extracted text and addresses come
+back. Small pages, and every page when the pool is disabled or cannot be started, are parsed
+inline in the calling thread. The workers are started with "spawn" rather than forked, because
+forking while other threads hold locks can deadlock the child.
+"""
+import os
+import re
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+import metrics
+from config import PARSE_PROCESSES
+
+logger = logging.getLogger(__name__)
+
+EMAIL_REGEX = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+
+# Below this the round trip to a worker costs more than parsing in place
+INLINE_BELOW_BYTES = 4096
+# A pool whose workers keep dying (out of memory on huge pages...) is given up for inline parsing
+MAX_RESTARTS = 3
+
+
+def _beautiful_soup():
+    """bs4 is imported on first use (or by the startup warm-up) rather than at import time."""
+    from bs4 import BeautifulSoup
+    return BeautifulSoup
+
+
+def extract(content: bytes, encoding: Optional[str] = None) -> Tuple[str, List[str]]:
+    """
+    Visible text of an HTML page and the email addresses in it. ``encoding`` is the charset
+    the server declared, if any; otherwise it is detected from the page (meta tags, BOM, content).
+    """
+    soup = _beautiful_soup()(content, "html.parser", from_encoding=encoding)
+    text = soup.get_text(separator="\n", strip=True)
+    return text, EMAIL_REGEX.findall(text)
+
+
+def _noop() -> None:
+    _beautiful_soup()
+
+
+def default_processes() -> int:
+    """One per core, leaving one for the fetching and analysis threads; 0 (inline) on one or two cores."""
+    cores = os.cpu_count() or 1
+    return cores - 1 if cores > 2 else 0
+
+
+class ParsePool:
+    def __init__(self, processes: int):
+        self.processes = default_processes() if processes < 0 else processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._restarts = 0
+        self._lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    @property
+    def enabled(self) -> bool:
+        return self.processes > 0
+
+    def _pool(self) -> Optional[ProcessPoolExecutor]:
+        with self._lock:
+            if self._executor is None and self.enabled:
+                try:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.processes, mp_context=multiprocessing.get_context("spawn"))
+                    logger.info(f"HTML parsing on {self.processes} worker process(es)")
+                except (OSError, ValueError, NotImplementedError) as e:
+                    logger.warning(f"Could not start HTML parsing processes ({e}); parsing inline")
+                    self.processes = 0
+            return self._executor
+
+    def _broken(self, executor: ProcessPoolExecutor) -> None:
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._restarts += 1
+            if self._restarts > MAX_RESTARTS:
+                logger.error(f"HTML parsing processes died {self._restarts} times; parsing inline from now on")
+                self.processes = 0
+            else:
+                logger.warning("An HTML parsing process died; restarting the pool")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def parse(self, content: bytes, encoding: Optional[str] = None) -> Tuple[str, List[str]]:
+        executor = self._pool() if len(content) >= INLINE_BELOW_BYTES else None
+        if executor is not None:
+            try:
+                with metrics.timed("parse", where="process"):
+                    return executor.submit(extract, content, encoding).result()
+            except BrokenProcessPool:
+                self._broken(executor)
+        with metrics.timed("parse", where="inline"):
+            return extract(content, encoding)
+
+    def warm_up(self) -> None:
+        """Import bs4 here and start every worker process, so the first pages do not pay for it."""
+        _beautiful_soup()
+        executor = self._pool()
+        if executor is not None:
+            try:
+                for future in [executor.submit(_noop) for _ in range(self.processes)]:
+                    future.result()
+            except BrokenProcessPool:
+                self._broken(executor)
+                raise
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Shared by every campaign in the process
+POOL = ParsePool(PARSE_PROCESSES)
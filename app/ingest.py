@@ -0,0 +1,282 @@
+"""
+Bulk-loads prospects from CSV or JSONL files into a Websites table.
+
+    python app/ingest.py prospects.csv --table "Websites Q3" [--map Website=url --map Name=company]
+                         [--workers 4] [--keep-known] [--restart]
+
+The file is streamed, not loaded into memory. Each record gets its Website normalized
+(``https://`` is added when there is no scheme). Records are skipped when their domain
+already appears earlier in the file or in the target table, or (unless ``--keep-known``)
+when it is already in a main table (see domain_index). Columns that are not fields of the
+table are dropped. Rows are written through Baserow's batch create endpoint, 200 per
+request, with at most ``--workers`` requests in flight. A failed request may still have
+been written (a timeout after Baserow got it), so a chunk is retried with only the rows whose
+domain is not in the table yet.
+
+Progress is checkpointed next to the input file (``<file>.ingest.json``). After a failure,
+running the same command again continues after the last fully written chunk, and records
+that were already written are caught by the table de-duplication.
+"""
+import os
+import csv
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Iterator, List, Optional
+
+import db
+import log_setup
+from domain_index import DOMAIN_INDEX, normalize_domain
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = db.BATCH_SIZE
+MAX_ATTEMPTS = 3
+# Chunks waiting for a worker, per worker; bounds memory while streaming
+QUEUED_PER_WORKER = 2
+
+
+def read_records(path: str, fmt: Optional[str] = None) -> Iterator[dict]:
+    """Stream records from a CSV (header row required) or JSONL file."""
+    fmt = fmt or ("jsonl" if path.endswith((".jsonl", ".ndjson", ".json")) else "csv")
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+            return
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                logger.warning(f"{path}:{line_no}: skipping invalid JSON ({e})")
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def normalize_url(url) -> Optional[str]:
+    if not url or not isinstance(url, str):
+        return None
+    url = url.strip()
+    domain = normalize_domain(url)
+    host = domain.split("/", 1)[0] if domain else None
+    if not host or "." not in host or any(c.isspace() for c in host):
+        return None
+    return url if "://" in url else f"https://{url}"
+
+
+class Checkpoint:
+    """How many input records are fully written, saved atomically after every chunk."""
+
+    def __init__(self, input_path: str, table_id):
+        self.path = f"{input_path}.ingest.json"
+        self.table_id = table_id
+        self.done = 0
+
+    def load(self) -> int:
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if data.get("table_id") != self.table_id:
+            logger.warning(f"{self.path} belongs to table {data.get('table_id')}; starting from the beginning")
+            return 0
+        self.done = data.get("records_done", 0)
+        return self.done
+
+    def save(self, done: int) -> None:
+        self.done = done
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"table_id": self.table_id, "records_done": done, "updated_at": time.time()}, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def _not_yet_written(table_id, rows: List[dict]) -> List[dict]:
+    """``rows`` whose domain is not in the table yet: a create that timed out may still have been written."""
+    present = {normalize_domain(r.get("Website")) for r in db.iter_rows(table_id, include=("Website",))}
+    return [row for row in rows if normalize_domain(row["Website"]) not in present]
+
+
+def _create_chunk(table_id, rows: List[dict]) -> None:
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            if attempt > 1:
+                # Batch creates are not idempotent; only post what the failed attempt did not write
+                written = len(rows)
+                rows = _not_yet_written(table_id, rows)
+                if len(rows) < written:
+                    logger.info(f"{written - len(rows)} row(s) of the failed batch were written after all")
+                if not rows:
+                    return
+            db.create_main_table_rows(table_id, rows)
+            return
+        except Exception as e:
+            if attempt == MAX_ATTEMPTS:
+                raise
+            logger.warning(f"Batch create of {len(rows)} rows failed ({e}), retrying (attempt {attempt + 1})")
+            time.sleep(2 ** attempt)
+
+
+def ingest(path: str, table_id, column_map: Dict[str, str] = None, workers: int = 4, skip_known: bool = True,
+           restart: bool = False, fmt: Optional[str] = None) -> dict:
+    column_map = column_map or {}
+    # Read-only fields (formulas, lookups...) are dropped like unknown columns
+    table_schema = db.SCHEMAS.refresh(table_id)
+    fields = {name for name in table_schema.by_name if table_schema.writable(name)}
+    if "Website" not in fields:
+        raise ValueError(f"Table {table_id} has no Website field")
+
+    checkpoint = Checkpoint(path, table_id)
+    skip = 0 if restart else checkpoint.load()
+    if skip:
+        print(f"Resuming after {skip} record(s) already written")
+
+    seen = {normalize_domain(r.get("Website")) for r in db.iter_rows(table_id, include=("Website",))}
+    seen.discard(None)
+    print(f"Target table already has {len(seen)} domain(s)")
+
+    stats = {"read": 0, "written": 0, "invalid": 0, "duplicate": 0, "known": 0, "dropped_columns": set()}
+    known = DOMAIN_INDEX if skip_known else None
+
+    def rows_with_positions() -> Iterator[tuple]:
+        """(position in the input after this record, row to write or None)."""
+        for position, record in enumerate(read_records(path, fmt), start=1):
+            if position <= skip:
+                continue
+            stats["read"] += 1
+            row = {column_map.get(k, k): v for k, v in record.items() if k is not None}
+            row["Website"] = normalize_url(row.get("Website"))
+            domain = normalize_domain(row["Website"]) if row["Website"] else None
+            if not domain:
+                stats["invalid"] += 1
+                yield position, None
+                continue
+            if domain in seen:
+                stats["duplicate"] += 1
+                yield position, None
+                continue
+            seen.add(domain)
+            if known is not None and known.known_as({"Website": row["Website"]}):
+                stats["known"] += 1
+                yield position, None
+                continue
+            stats["dropped_columns"].update(k for k in row if k not in fields)
+            yield position, {k: v for k, v in row.items() if k in fields and v not in (None, "")}
+
+    def chunks() -> Iterator[tuple]:
+        rows, last = [], skip
+        for position, row in rows_with_positions():
+            last = position
+            if row is not None:
+                rows.append(row)
+            if len(rows) >= CHUNK_SIZE:
+                yield last, rows
+                rows = []
+        if rows or last > skip:
+            yield last, rows
+
+    started = time.perf_counter()
+    # Chunks finish out of order; the checkpoint only advances over a contiguous prefix
+    pending = {}        # future -> (end position, row count)
+    finished_ends = set()
+    submitted_ends = []
+    failed = None
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        def settle(done_futures):
+            nonlocal failed
+            for future in done_futures:
+                end, count = pending.pop(future)
+                try:
+                    future.result()
+                except Exception as e:
+                    failed = failed or e
+                    continue
+                stats["written"] += count
+                finished_ends.add(end)
+            while submitted_ends and submitted_ends[0] in finished_ends:
+                checkpoint.save(submitted_ends.pop(0))
+
+        for end, rows in chunks():
+            if failed:
+                break
+            if not rows:
+                finished_ends.add(end)
+            else:
+                pending[pool.submit(_create_chunk, table_id, rows)] = (end, len(rows))
+            submitted_ends.append(end)
+            if len(pending) >= workers * QUEUED_PER_WORKER:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                settle(done)
+                rate = stats["written"] / max(time.perf_counter() - started, 1e-9)
+                print(f"{skip + stats['read']} records read, {stats['written']} written ({rate:.0f} rows/s)", end="\r")
+        done, _ = wait(pending)
+        settle(done)
+
+    print()
+    if stats["dropped_columns"]:
+        logger.warning(f"Columns not in table {table_id} were dropped: {sorted(stats['dropped_columns'])}")
+    stats["dropped_columns"] = sorted(stats["dropped_columns"])
+    stats["seconds"] = round(time.perf_counter() - started, 1)
+    if failed:
+        logger.error(f"Ingestion stopped: {failed}")
+        print(f"Ingestion stopped: {failed}\nRun the same command again to resume after record {checkpoint.done}.")
+        stats["failed"] = str(failed)
+    else:
+        checkpoint.clear()
+    return stats
+
+
+def _parse_map(pairs: List[str]) -> Dict[str, str]:
+    """``["Website=url"]`` -> ``{"url": "Website"}`` (input column -> table field)."""
+    mapping = {}
+    for pair in pairs or []:
+        field, sep, column = pair.partition("=")
+        if not sep:
+            raise argparse.ArgumentTypeError(f"--map expects FIELD=COLUMN, got {pair!r}")
+        mapping[column.strip()] = field.strip()
+    return mapping
+
+
+def main(argv=None):
+    # Set up here rather than on import, so importing this module has no side effects
+    log_setup.setup()
+    parser = argparse.ArgumentParser(description="Bulk-load prospects from CSV/JSONL into a Websites table.")
+    parser.add_argument("path", help="CSV (with a header row) or JSONL file")
+    parser.add_argument("--table", required=True, help="Websites table id or name")
+    parser.add_argument("--map", action="append", metavar="FIELD=COLUMN",
+                        help="Read table FIELD from input COLUMN (repeatable), e.g. Website=url")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Default: from the file extension")
+    parser.add_argument("--workers", type=int, default=4, help="Batch requests in flight")
+    parser.add_argument("--keep-known", action="store_true", help="Also load companies already in a main table")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start from the top")
+    args = parser.parse_args(argv)
+
+    try:
+        tables_by_name = {t["name"]: t["id"] for t in db.get_tables_in_outreach_database()}
+        table_id = db.resolve_table(args.table, tables_by_name)
+        stats = ingest(args.path, table_id, _parse_map(args.map), args.workers, skip_known=not args.keep_known,
+                       restart=args.restart, fmt=args.format)
+    except (OSError, ValueError, argparse.ArgumentTypeError) as e:
+        logger.critical(f"Ingestion failed: {e}")
+        print(f"Ingestion failed: {e}")
+        sys.exit(1)
+
+    print(f"Read {stats['read']}, wrote {stats['written']} in {stats['seconds']}s. Skipped: {stats['duplicate']} "
+          f"duplicate, {stats['known']} already in a main table, {stats['invalid']} without a valid website.")
+    if "failed" in stats:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+import metrics
+from config import ADAPTIVE_LIMITS_ENABLED, ADAPTIVE_LIMITS
+
+logger = logging.getLogger(__name__)
+
+LIMIT = "atlantis_concurrency_limit"
+IN_FLIGHT = "atlantis_concurrency_in_flight"
+LIMIT_CHANGES = "atlantis_concurrency_limit_changes_total"
+
+# Outcomes reported back when a slot is released
+SUCCESS = "success"
+OVERLOAD = "overload"
+NEUTRAL = "neutral"   # failed, but says nothing about load (404, bad request, refused connection)
+
+# (initial, min, max) concurrent calls per service, overridable with ADAPTIVE_LIMITS in config.json
+DEFAULT_LIMITS = {
+    "baserow": (8, 1, 32),
+    "openai": (4, 1, 32),
+    "scrape": (16, 2, 64),
+    "smtp": (2, 1, 8),
+}
+
+OVERLOAD_STATUS = {429, 500, 502, 503, 504}
+# SMTP replies meaning "busy / try later" rather than "rejected"
+OVERLOAD_SMTP_CODES = {421, 450, 451, 452, 454}
+
+
+def is_overload(exc: BaseException) -> bool:
+    """Timeouts, HTTP 429/5xx (requests and openai errors) and SMTP try-later replies."""
+    if isinstance(exc, TimeoutError) or "timeout" in type(exc).__name__.lower():
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in OVERLOAD_STATUS:
+        return True
+    return getattr(exc, "smtp_code", None) in OVERLOAD_SMTP_CODES
+
+
+class Slot:
+    """Handed to the caller inside ``AdaptiveLimiter.slot()`` to report how the call went."""
+
+    def __init__(self):
+        self.outcome = SUCCESS
+
+    def status(self, status_code: int) -> None:
+        if status_code in OVERLOAD_STATUS:
+            self.outcome = OVERLOAD
+
+    def overloaded(self) -> None:
+        self.outcome = OVERLOAD
+
+    def neutral(self) -> None:
+        self.outcome = NEUTRAL
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for one external service. Each successful call raises the limit
+    by ``1 / limit`` (so by one per full window of successes), and an overload signal
+    multiplies it by ``decrease``. Overloads that arrive within ``cooldown`` seconds of a cut
+    belong to the same congestion event and do not cut it again.
+    """
+
+    def __init__(self, name: str, initial: float, min_limit: float = 1, max_limit: float = 64,
+                 decrease: float = 0.5, cooldown: float = 2.0, enabled: bool = True):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.cooldown = cooldown
+        self.enabled = enabled
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+        metrics.REGISTRY.gauge_fn(LIMIT, lambda: self.limit, "Current adaptive concurrency limit", service=name)
+        metrics.REGISTRY.gauge_fn(IN_FLIGHT, lambda: self._in_flight, "Calls currently in flight", service=name)
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        with self._cond:
+            while self.enabled and self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._in_flight += 1
+
+    def release(self, outcome: str = SUCCESS) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            before = int(self._limit)
+            if outcome == SUCCESS:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+            elif outcome == OVERLOAD and time.monotonic() - self._last_decrease >= self.cooldown:
+                self._limit = max(self.min_limit, self._limit * self.decrease)
+                self._last_decrease = time.monotonic()
+            after = int(self._limit)
+            self._cond.notify_all()
+        if after != before:
+            direction = "increase" if after > before else "decrease"
+            metrics.REGISTRY.inc(LIMIT_CHANGES, 1, "Adaptive limit changes", service=self.name, direction=direction)
+            log = logger.info if direction == "decrease" else logger.debug
+            log(f"{self.name}: concurrency limit {before} -> {after}")
+
+    @contextmanager
+    def slot(self):
+        """Hold one slot for a call. Exceptions are classified with ``is_overload``."""
+        self.acquire()
+        handle = Slot()
+        try:
+            yield handle
+        except BaseException as e:
+            self.release(OVERLOAD if is_overload(e) else NEUTRAL)
+            raise
+        self.release(handle.outcome)
+
+
+def _build(name: str) -> AdaptiveLimiter:
+    initial, min_limit, max_limit = DEFAULT_LIMITS[name]
+    overrides = ADAPTIVE_LIMITS.get(name, {})
+    return AdaptiveLimiter(
+        name,
+        overrides.get("initial", initial),
+        overrides.get("min", min_limit),
+        overrides.get("max", max_limit),
+        enabled=ADAPTIVE_LIMITS_ENABLED,
+    )
+
+
+# One limiter per service, shared by every thread and campaign in the process
+LIMITERS: Dict[str, AdaptiveLimiter] = {name: _build(name) for name in DEFAULT_LIMITS}
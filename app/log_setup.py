@@ -0,0 +1,170 @@
+"""
+One logging setup for the app, runner and CLIs.
+
+Records are put on an in-memory queue by the calling thread and written by a background
+listener, so a slow disk or terminal never holds up a row. The log file is size-rotated and
+by default holds one JSON object per line, with the row id and stage of the work that
+produced the record (see ``context``). Per-page and per-payload details are logged at
+DEBUG and only written when ``LOG_VERBOSE`` is on.
+"""
+import json
+import queue
+import atexit
+import logging
+import contextvars
+import multiprocessing
+import logging.handlers
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from config import LOG_PATH, LOG_VERBOSE, LOG_CONSOLE_LEVEL, LOG_FORMAT, LOG_MAX_MB, LOG_BACKUPS
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+# Records waiting for the writer; beyond this they are dropped rather than block the caller
+QUEUE_SIZE = 10000
+
+_row_id = contextvars.ContextVar("row_id", default=None)
+_stage = contextvars.ContextVar("stage", default=None)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handlers: List[logging.Handler] = []
+
+
+@contextmanager
+def context(row_id=None, stage: str = None):
+    """Tag every record logged inside the block (in this thread) with ``row_id`` and ``stage``."""
+    row_token = _row_id.set(row_id)
+    stage_token = _stage.set(stage)
+    try:
+        yield
+    finally:
+        _stage.reset(stage_token)
+        _row_id.reset(row_token)
+
+
+class _ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "row_id"):
+            record.row_id = _row_id.get()
+        if not hasattr(record, "stage"):
+            record.stage = _stage.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        for key in ("row_id", "stage"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Never blocks: when the writer falls behind, records are counted and dropped."""
+
+    dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback now, in the caller, so the record can cross
+        # threads/processes; the writer's formatter still decides the layout
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            type(self).dropped += 1
+
+
+def _queue_handler(q) -> logging.Handler:
+    handler = _QueueHandler(q)
+    handler.addFilter(_ContextFilter())
+    return handler
+
+
+def _output_handlers(path: str, verbose: bool, console_level: str, fmt: str, max_mb: float,
+                     backups: int) -> List[logging.Handler]:
+    handlers = []
+    if path:
+        file_handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=int(max_mb * 1024 * 1024), backupCount=backups, encoding="utf-8")
+        file_handler.setLevel(logging.DEBUG if verbose else logging.INFO)
+        file_handler.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+        handlers.append(file_handler)
+    console = logging.StreamHandler()
+    # Progress already goes to the console through print(); by default only problems are repeated there
+    console.setLevel(logging.DEBUG if verbose else getattr(logging, str(console_level).upper(), logging.WARNING))
+    console.setFormatter(logging.Formatter(TEXT_FORMAT))
+    handlers.append(console)
+    return handlers
+
+
+def setup(path: str = LOG_PATH, verbose: bool = LOG_VERBOSE, console_level: str = LOG_CONSOLE_LEVEL,
+          fmt: str = LOG_FORMAT, max_mb: float = LOG_MAX_MB, backups: int = LOG_BACKUPS) -> None:
+    """Route all logging through the queue. Calling it again replaces the previous setup."""
+    global _listener, _handlers
+    if multiprocessing.current_process().name != "MainProcess":
+        # Only the top process owns the rotating file. Child processes forward their records
+        # (``setup_child``) or, like the HTML parsing workers that re-import the entry script, never log
+        return
+    shutdown()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.DEBUG if verbose else logging.INFO)
+
+    _handlers = _output_handlers(path, verbose, console_level, fmt, max_mb, backups)
+    log_queue = queue.Queue(maxsize=QUEUE_SIZE)
+    root.addHandler(_queue_handler(log_queue))
+    _listener = logging.handlers.QueueListener(log_queue, *_handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown)
+
+
+def shutdown() -> None:
+    """Flush queued records and close the outputs."""
+    global _listener
+    if _listener is None:
+        return
+    if _QueueHandler.dropped:
+        logging.getLogger(__name__).warning(f"{_QueueHandler.dropped} log record(s) were dropped (writer too slow)")
+        _QueueHandler.dropped = 0
+    _listener.stop()
+    _listener = None
+    for handler in _handlers:
+        handler.close()
+
+
+def forward_from(process_queue) -> logging.handlers.QueueListener:
+    """Write records that worker processes put on ``process_queue`` (see ``setup_child``)."""
+    listener = logging.handlers.QueueListener(process_queue, *_handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def setup_child(process_queue, verbose: bool = LOG_VERBOSE) -> None:
+    """In a worker process: send every record to the parent, which owns the (rotating) files."""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.setLevel(logging.DEBUG if verbose else logging.INFO)
+    root.addHandler(_queue_handler(process_queue))
@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from fast Baserow calls up to slow multi-page scrapes
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# Samples kept per histogram series for the p50/p95 in the summary file
+RESERVOIR_SIZE = 2048
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: dict) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: _LabelKey, extra: dict = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _quantile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.samples = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+        self.samples.append(value)
+
+
+class Registry:
+    """Thread-safe counters, gauges and histograms with Prometheus text output."""
+
+    def __init__(self):
+        # Re-entrant so gauge callbacks may themselves touch the registry
+        self._lock = threading.RLock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._counters: Dict[str, Dict[_LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[_LabelKey, float]] = {}
+        self._gauge_fns: Dict[str, Dict[_LabelKey, Callable[[], float]]] = {}
+        self._histograms: Dict[str, Dict[_LabelKey, _Histogram]] = {}
+
+    def _declare(self, name: str, kind: str, help_text: str) -> None:
+        if name not in self._help:
+            self._help[name] = (kind, help_text or name)
+
+    def inc(self, name: str, amount: float = 1, help_text: str = "", **labels) -> None:
+        with self._lock:
+            self._declare(name, "counter", help_text)
+            series = self._counters.setdefault(name, {})
+            key = _label_key(labels)
+            series[key] = series.get(key, 0) + amount
+
+    def set(self, name: str, value: float, help_text: str = "", **labels) -> None:
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def gauge_fn(self, name: str, fn: Callable[[], float], help_text: str = "", **labels) -> None:
+        """A gauge whose value is read from ``fn`` each time metrics are collected."""
+        with self._lock:
+            self._declare(name, "gauge", help_text)
+            self._gauge_fns.setdefault(name, {})[_label_key(labels)] = fn
+
+    def observe(self, name: str, value: float, help_text: str = "", buckets=DEFAULT_BUCKETS, **labels) -> None:
+        with self._lock:
+            self._declare(name, "histogram", help_text)
+            series = self._histograms.setdefault(name, {})
+            key = _label_key(labels)
+            if key not in series:
+                series[key] = _Histogram(buckets)
+            series[key].observe(value)
+
+    def _gauge_values(self) -> Dict[str, Dict[_LabelKey, float]]:
+        values = {name: dict(series) for name, series in self._gauges.items()}
+        for name, series in self._gauge_fns.items():
+            for key, fn in series.items():
+                try:
+                    values.setdefault(name, {})[key] = float(fn())
+                except Exception:
+                    logger.debug(f"Gauge callback {name} failed", exc_info=True)
+        return values
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            lines = []
+            gauges = self._gauge_values()
+            for name in sorted(self._help):
+                kind, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind == "counter":
+                    for key, value in self._counters.get(name, {}).items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+                elif kind == "gauge":
+                    for key, value in gauges.get(name, {}).items():
+                        lines.append(f"{name}{_format_labels(key)} {value}")
+                else:
+                    for key, hist in self._histograms.get(name, {}).items():
+                        cumulative = 0
+                        for bound, count in zip(hist.buckets, hist.counts):
+                            cumulative += count
+                            lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {cumulative}")
+                        lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {hist.count}")
+                        lines.append(f"{name}_sum{_format_labels(key)} {hist.total}")
+                        lines.append(f"{name}_count{_format_labels(key)} {hist.count}")
+            return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        """Plain-dict snapshot: counter totals, gauge values and p50/p95 per histogram series."""
+        with self._lock:
+            def label_str(key):
+                return ",".join(f"{k}={v}" for k, v in key) or "all"
+
+            out = {"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "counters": {}, "gauges": {}, "latency": {}}
+            for name, series in self._counters.items():
+                out["counters"][name] = {label_str(k): v for k, v in series.items()}
+            for name, series in self._gauge_values().items():
+                out["gauges"][name] = {label_str(k): v for k, v in series.items()}
+            for name, series in self._histograms.items():
+                out["latency"][name] = {}
+                for key, hist in series.items():
+                    samples = sorted(hist.samples)
+                    out["latency"][name][label_str(key)] = {
+                        "count": hist.count,
+                        "mean": hist.total / hist.count if hist.count else 0.0,
+                        "p50": _quantile(samples, 0.5),
+                        "p95": _quantile(samples, 0.95),
+                    }
+            return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._help.clear()
+            self._counters.clear()
+            self._gauges.clear()
+            self._gauge_fns.clear()
+            self._histograms.clear()
+
+
+REGISTRY = Registry()
+
+# Metric names used across the app
+STAGE_SECONDS = "atlantis_stage_seconds"
+STAGE_TOTAL = "atlantis_stage_total"
+GPT_TOKENS = "atlantis_gpt_tokens_total"
+CACHE_REQUESTS = "atlantis_cache_requests_total"
+QUEUE_DEPTH = "atlantis_queue_depth"
+ROWS_TOTAL = "atlantis_rows_total"
+ROWS_IN_FLIGHT = "atlantis_rows_in_flight"
+
+
+@contextmanager
+def timed(stage: str, **labels):
+    """Record the latency of a block under ``stage`` and count it as ok/error."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        raise
+    finally:
+        REGISTRY.observe(STAGE_SECONDS, time.perf_counter() - started,
+                         "Latency of each processing stage and external call", stage=stage, **labels)
+        REGISTRY.inc(STAGE_TOTAL, 1, "Stage calls by outcome", stage=stage, outcome=outcome, **labels)
+
+
+def instrumented(stage: str, **labels):
+    """Decorator form of ``timed``."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(stage, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_outcome(stage: str, outcome: str) -> None:
+    """Count a domain-level outcome (e.g. an SMTP failure that did not raise)."""
+    REGISTRY.inc(STAGE_TOTAL, 1, "Stage calls by outcome", stage=stage, outcome=outcome)
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    REGISTRY.inc(CACHE_REQUESTS, 1, "Cache lookups by result", cache=cache, result="hit" if hit else "miss")
+
+
+def count_row(outcome: str) -> None:
+    """Count a row leaving processing: its STATUS, or ``dropped``/``deadline`` when it is left unprocessed."""
+    REGISTRY.inc(ROWS_TOTAL, 1, "Finished rows by outcome", outcome=outcome)
+
+
+def count_gpt_tokens(kind: str, tokens: int) -> None:
+    REGISTRY.inc(GPT_TOKENS, tokens, "GPT tokens used", kind=kind)
+
+
+# --- exposition ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = REGISTRY.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """Serve ``/metrics`` in Prometheus text format on a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info(f"Metrics endpoint listening on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def write_summary(path: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(REGISTRY.summary(), f, indent=2)
+    # Atomic swap so readers never see a half-written file
+    os.replace(tmp_path, path)
+
+
+def start_summary_writer(path: str, interval: float) -> threading.Thread:
+    def loop():
+        while True:
+            time.sleep(interval)
+            try:
+                write_summary(path)
+            except Exception:
+                logger.exception("Failed to write metrics summary")
+
+    thread = threading.Thread(target=loop, name="metrics-summary", daemon=True)
+    thread.start()
+    return thread
+
+
+def start(port: int, summary_path: str, summary_interval: float) -> None:
+    """Start the HTTP endpoint (if ``port``) and the periodic summary file (if ``summary_path``)."""
+    if port:
+        try:
+            start_http_server(port)
+        except OSError as e:
+            logger.error(f"Could not start metrics endpoint on port {port}: {e}")
+    if summary_path:
+        start_summary_writer(summary_path, summary_interval)
@@ -0,0 +1,78 @@
+import re
+from typing import List, Union
+
+from email_validator import SPECIAL_USE_DOMAIN_NAMES
+from email_validator.rfc_constants import CASE_INSENSITIVE_MAILBOX_NAMES
+from pydantic import BaseModel, ConfigDict, field_validator, model_validator
+from pydantic.networks import validate_email
+
+# --- Pydantic models for GPT output validation ---
+
+# A match scoring at least this is worth an email (``stages.MIN_SEND_SCORE`` is the same
+# threshold, repeated there so the stages load without pydantic)
+MIN_SEND_SCORE = 7
+
+# Plain ASCII addresses (nearly all of them) are checked with this instead of a full
+# email-validator pass, which costs ~60µs per row. Anything it does not accept still goes
+# through email-validator, so the set of accepted addresses is unchanged (as are IDNA
+# domains: "xn--" labels and hyphens in the third and fourth positions).
+_SIMPLE_EMAIL = re.compile(
+    r"(?P<local>[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*)"
+    r"@(?P<domain>(?:[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?\.)+(?P<tld>[A-Za-z]{2,63}))"
+)
+_SPECIAL_USE_TLDS = set(SPECIAL_USE_DOMAIN_NAMES)
+_CASE_INSENSITIVE_MAILBOXES = set(CASE_INSENSITIVE_MAILBOX_NAMES)
+
+
+def normalize_email(value: str) -> str:
+    """Same result as pydantic's ``EmailStr``, on a fast path for simple addresses."""
+    email = value.strip()
+    m = _SIMPLE_EMAIL.fullmatch(email)
+    if (m and len(email) <= 254 and len(m.group("local")) <= 64
+            and m.group("tld").lower() not in _SPECIAL_USE_TLDS and "--" not in m.group("domain")):
+        local = m.group("local")
+        # Normalized like email-validator: lower-case domain, and role mailboxes (info@, sales@)
+        if local.lower() in _CASE_INSENSITIVE_MAILBOXES:
+            local = local.lower()
+        return f"{local}@{m.group('domain').lower()}"
+    return validate_email(value)[1]
+
+
+class Match(BaseModel):
+    acronym: str
+    score: int
+    fit: bool
+
+class GPTOutput(BaseModel):
+    # Extra keys GPT adds are kept, so Note3 (serialized from this model) loses nothing
+    model_config = ConfigDict(extra="allow")
+
+    matches: List[Match]
+    selected_email: str
+    subject: str
+    email_body: str
+
+    @field_validator("selected_email")
+    @classmethod
+    def _check_email(cls, value: str) -> str:
+        # Empty when no company fits, as in an answer stopped right after the matches
+        if not value.strip():
+            return ""
+        return normalize_email(value)
+
+    @model_validator(mode="after")
+    def _check_email_needed(self) -> "GPTOutput":
+        if not self.selected_email and any(match.score >= MIN_SEND_SCORE for match in self.matches):
+            raise ValueError(f"selected_email is empty although a match scores {MIN_SEND_SCORE} or more")
+        return self
+
+
+def parse_gpt_output(raw: Union[str, bytes, dict]) -> GPTOutput:
+    """
+    Parse and validate GPT output in one pass (pydantic-core's JSON parser feeds the
+    validator directly, without an intermediate dict). Raises ``pydantic.ValidationError``
+    for invalid JSON as well as for a wrong shape.
+    """
+    if isinstance(raw, dict):
+        return GPTOutput.model_validate(raw)
+    return GPTOutput.model_validate_json(raw)
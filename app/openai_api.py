@@ -1,62 +1,205 @@
-import openai
-import logging
 import re
+import json
+import logging
+import threading
+from typing import Callable, List, Optional
 
-from config import OPENAI_API_KEY
+from config import OPENAI_API_KEY, OPENAI_BASE_URL, GPT_STREAMING
+import metrics
+import breaker
+from limiter import LIMITERS
+from prompt_registry import GPT_CALLS, PromptSet
+from deadline import Deadline, NO_DEADLINE
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-openai.api_key = OPENAI_API_KEY
+_client = None
+_client_lock = threading.Lock()
+
+def client():
+    """The shared OpenAI client. ``openai`` takes ~0.5s to import, so it is loaded on first use (or by warm_up)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                import openai
+                _client = openai.OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None)
+    return _client
+
+def _probe() -> None:
+    client().models.list()
+
+def warm_up() -> None:
+    """Import the client and open a pooled, authenticated connection before the first row needs it."""
+    _probe()
+
+BREAKER = breaker.get("openai", probe=_probe)
+
+_MATCHES_START = re.compile(r'"matches"\s*:\s*\[')
+
+class MatchesScanner:
+    """Picks the ``matches`` array out of a JSON response as it streams in, as soon as it is complete."""
+
+    def __init__(self):
+        self.text = ""
+        self.matches: Optional[list] = None
+        self.done = False
+        self._pos = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, piece: str) -> Optional[list]:
+        """Add the next piece of the response; returns the parsed array once its closing bracket arrives."""
+        if self.done:
+            return None
+        self.text += piece
+        if self._start is None:
+            m = _MATCHES_START.search(self.text)
+            if m is None:
+                return None
+            self._start, self._pos, self._depth = m.end() - 1, m.end(), 1
+        text = self.text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif c == "\\":
+                    self._escaped = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in "[{":
+                self._depth += 1
+            elif c in "]}":
+                self._depth -= 1
+                if self._depth == 0:
+                    self.done = True
+                    try:
+                        self.matches = json.loads(text[self._start:i + 1])
+                    except ValueError:
+                        return None
+                    return self.matches
+        self._pos = len(text)
+        return None
 
 def clean_json_output(json_str: str) -> str:
     """Remove Markdown code block syntax from JSON string if present."""
-    json_str = re.sub(r'^\s*```json\s*', '', json_str, flags=re.IGNORECASE)
-    json_str = re.sub(r'^\s*```\s*', '', json_str, flags=re.IGNORECASE)
-    json_str = re.sub(r'\s*```\s*$', '', json_str, flags=re.IGNORECASE)
+    # Plain string checks: this runs on every response and the regexes cost more than the parse
+    json_str = json_str.strip()
+    if json_str.startswith("```"):
+        json_str = json_str[3:]
+        if json_str[:4].lower() == "json":
+            json_str = json_str[4:]
+    if json_str.endswith("```"):
+        json_str = json_str[:-3]
     return json_str.strip()
 
 def ask_gpt_about_company(scraped_text: str, emails: list, row_email: str,
                           mode: str, relevant_data: list, location: str, funding: str,
-                          base_prompt, ventures_prompt, investors_prompt) -> str:
+                          prompts: PromptSet, deadline: Deadline = NO_DEADLINE,
+                          stop_when: Optional[Callable[[List[dict]], bool]] = None) -> str:
+    """
+    GPT's JSON answer for one company. With ``GPT_STREAMING``, ``stop_when(matches)`` is asked as
+    soon as the ``matches`` array has arrived; if it returns True the rest of the generation is
+    cancelled, and the answer has those matches with empty email fields.
+    """
     try:
         if not scraped_text:
             return "ERROR: No scraped text available for analysis"
         
-        prompt_intro = base_prompt(scraped_text, emails, row_email, location, funding)
+        prompt_intro = prompts.intro(scraped_text, emails, row_email, location, funding)
         
         if mode == "Ventures":
-            formatted_mandates = _format_mandates(relevant_data)
-            task = ventures_prompt(formatted_mandates)
+            task = prompts.task(mode, _format_mandates(relevant_data))
         else:
-            formatted_ventures = _format_ventures(relevant_data)
-            task = investors_prompt(formatted_ventures)
+            task = prompts.task(mode, _format_ventures(relevant_data))
 
-        logger.info("Sending request to OpenAI GPT...")
+        logger.info(f"Sending request to OpenAI GPT (prompts {prompts.name} version {prompts.version})...")
+        metrics.REGISTRY.inc(GPT_CALLS, 1, "GPT calls by prompt version", prompts=prompts.name,
+                             version=prompts.version)
 
-        response = openai.chat.completions.create(
-            model="gpt-4.1",
-            messages=[
+        with metrics.timed("gpt"), BREAKER.guard(), LIMITERS["openai"].slot(), deadline.bound(None) as timeout:
+            # Within a row's budget the client does not retry on its own: a retry would get the
+            # full timeout again, and the row is retried as a whole instead
+            api = client().with_options(timeout=timeout, max_retries=0) if timeout is not None else client()
+            messages = [
                 {"role": "system", "content": prompt_intro},
                 {"role": "user", "content": task}
-            ],
-            max_tokens=1500,
-            temperature=0.7,
-        )
+            ]
+            if GPT_STREAMING:
+                raw_output = _streamed_output(api, messages, stop_when, deadline)
+            else:
+                response = api.chat.completions.create(
+                    model="gpt-4.1",
+                    messages=messages,
+                    max_tokens=1500,
+                    temperature=0.7,
+                )
+                _record_usage(response)
+                raw_output = response.choices[0].message.content
 
-        raw_output = response.choices[0].message.content.strip()
+        raw_output = raw_output.strip()
         cleaned_output = clean_json_output(raw_output)
         
         logger.info("Received and cleaned response from GPT.")
         return cleaned_output
 
     except Exception as e:
+        # Raised rather than returned: an error string would be parsed as GPT output and
+        # the row recorded as analyzed
         logger.error(f"GPT Error: {str(e)}")
-        return f"GPT Error: {str(e)}"
+        raise
+
+def _streamed_output(api, messages: list, stop_when: Optional[Callable[[List[dict]], bool]],
+                     deadline: Deadline) -> str:
+    stream = api.chat.completions.create(
+        model="gpt-4.1",
+        messages=messages,
+        max_tokens=1500,
+        temperature=0.7,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    scanner = MatchesScanner() if stop_when is not None else None
+    parts, chunks = [], 0
+    try:
+        for chunk in stream:
+            # The last chunk carries the usage and no choices
+            _record_usage(chunk)
+            piece = chunk.choices[0].delta.content if chunk.choices else None
+            if not piece:
+                continue
+            parts.append(piece)
+            chunks += 1
+            deadline.check()
+            if scanner is None:
+                continue
+            matches = scanner.feed(piece)
+            if scanner.done:
+                scanner = None
+                if matches is not None and stop_when(matches):
+                    # Closing the stream cancels the generation; its usage never arrives, so the
+                    # chunks received (about one token each) stand in for the completion tokens
+                    metrics.count_gpt_tokens("completion", chunks)
+                    metrics.count_outcome("gpt_stream", "stopped")
+                    logger.info(f"Stopped GPT generation after the matches ({chunks} chunks).")
+                    return json.dumps({"matches": matches, "selected_email": "", "subject": "",
+                                       "email_body": "", "stopped_after_matches": True}, ensure_ascii=False)
+    finally:
+        stream.close()
+    metrics.count_outcome("gpt_stream", "completed")
+    return "".join(parts)
+
+def _record_usage(response) -> None:
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return
+    metrics.count_gpt_tokens("prompt", usage.prompt_tokens or 0)
+    metrics.count_gpt_tokens("completion", usage.completion_tokens or 0)
 
 def _safe_strip(value):
     if isinstance(value, list):
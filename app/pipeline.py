@@ -0,0 +1,273 @@
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+import db
+import stages
+import metrics
+import profiling
+import log_setup
+import openai_api
+import email_sender
+from breaker import is_outage
+from deadline import DeadlineExceeded
+from stages import RowWork, RunContext, ANALYZE, SEND, PERSIST, RETRY, DEADLINE
+from dispatcher import wait_for_sender, send_from_account
+
+logger = logging.getLogger(__name__)
+
+SCRAPE = "scrape"
+
+
+class Pipeline:
+    """
+    Staged row processing: feed -> scrape -> analyze -> send -> persist.
+
+    Every stage has its own worker pool and a bounded input queue, so scraping, GPT
+    calls, SMTP sends and Baserow writes all run at the same time. A full queue blocks
+    the stage feeding it (backpressure), which in turn stops the feeder from pulling
+    more rows. The per-row rules are the ones in ``stages`` and are shared with the
+    serial ``process_next_row`` path; persist writes are batched. A row's deadline only
+    runs while a stage works on it, not while it sits in a queue.
+
+    Rows headed for persist are never given up, even while stopping: a row that was
+    emailed but not recorded would be emailed again on the next run. ``stop`` therefore
+    stops intake first, lets the send workers finish, and only then drains persist.
+    """
+
+    def __init__(self, ctx: RunContext, sender_scheduler, working_hours,
+                 idle_delay: Callable[[], float],
+                 scrape_workers: int = 8, analyze_workers: int = 4, send_workers: Optional[int] = None,
+                 queue_size: int = 16, persist_batch: int = 20, persist_interval: float = 5.0):
+        self.ctx = ctx
+        self.sender_scheduler = sender_scheduler
+        self.working_hours = working_hours
+        self.idle_delay = idle_delay
+        self.persist_batch = persist_batch
+        self.persist_interval = persist_interval
+        self.queue_size = queue_size
+
+        # One send worker per sender account lets each mailbox wait on its own pacing
+        send_workers = send_workers or len(sender_scheduler.accounts)
+        self._workers = {
+            SCRAPE: (scrape_workers, lambda work: stages.scrape_row(work, self.ctx)),
+            ANALYZE: (analyze_workers, self._analyze),
+            SEND: (send_workers, self._send),
+        }
+        self.queues = {name: queue.Queue(maxsize=queue_size) for name in (SCRAPE, ANALYZE, SEND, PERSIST)}
+
+        self._stop = threading.Event()
+        # Persist keeps running after _stop until every row handed to it is written
+        self._stop_persist = threading.Event()
+        self._threads: Dict[str, List[threading.Thread]] = {}
+        self._lock = threading.Lock()
+        self._in_flight = set()
+
+        for name, q in self.queues.items():
+            metrics.REGISTRY.gauge_fn(metrics.QUEUE_DEPTH, q.qsize, "Items waiting in each pipeline queue",
+                                      campaign=ctx.name, stage=name)
+        metrics.REGISTRY.gauge_fn(metrics.ROWS_IN_FLIGHT, self.in_flight, "Rows currently inside the pipeline",
+                                  campaign=ctx.name)
+
+    # --- lifecycle ---
+
+    def start(self) -> None:
+        self._spawn("feeder", self._feed)
+        for name, (count, fn) in self._workers.items():
+            for i in range(count):
+                self._spawn(f"{name}-{i + 1}", self._work, name, fn)
+        self._spawn("persist", self._persist)
+
+    def stop(self, timeout: float = 10, persist_timeout: float = 120) -> None:
+        """
+        Stop taking rows, wait for the rows being sent, then for persist to write everything
+        queued for it (at most ``persist_timeout`` seconds: Baserow may be down). Persist
+        keeps going until the last send worker has exited, however long its send takes.
+        """
+        self._stop.set()
+        for group in ("feeder", SCRAPE, ANALYZE, SEND):
+            for thread in self._threads.get(group, []):
+                thread.join(timeout)
+        self._stop_persist.set()
+        for thread in self._threads.get(PERSIST, []):
+            thread.join(persist_timeout)
+            if thread.is_alive():
+                logger.error(f"Persist did not finish within {persist_timeout:.0f}s; "
+                             f"{self.queues[PERSIST].qsize()} row(s) may not be recorded")
+
+    def wait(self) -> None:
+        """Block until stopped (e.g. by KeyboardInterrupt in the caller)."""
+        while not self._stop.wait(1):
+            pass
+
+    def queue_depths(self) -> dict:
+        return {name: q.qsize() for name, q in self.queues.items()}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
+
+    def _spawn(self, name, target, *args) -> None:
+        thread = threading.Thread(target=target, args=args, name=f"pipeline-{name}", daemon=True)
+        thread.start()
+        self._threads.setdefault(name.rsplit("-", 1)[0], []).append(thread)
+
+    # --- plumbing ---
+
+    def _put(self, stage: str, work: RowWork) -> bool:
+        """Blocking put that gives up only when the pipeline is stopping (never for PERSIST)."""
+        if stage == PERSIST:
+            # The persist worker drains its queue before it exits (see ``stop``)
+            self.queues[stage].put(work)
+            return True
+        while not self._stop.is_set():
+            try:
+                self.queues[stage].put(work, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, stage: str, timeout: float = 0.5) -> Optional[RowWork]:
+        try:
+            return self.queues[stage].get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _pass_on(self, stage: str, work: RowWork) -> bool:
+        """``_put`` with the row's deadline paused until the next stage takes it."""
+        work.deadline.pause()
+        return self._put(stage, work)
+
+    def _done(self, work: RowWork) -> None:
+        with self._lock:
+            self._in_flight.discard(work.row_id)
+
+    def _route(self, work: RowWork, next_stage: Optional[str]) -> None:
+        if next_stage is None:
+            self.ctx.drop(work.row_id)
+            self._done(work)
+        elif next_stage in (RETRY, DEADLINE):
+            # Left unprocessed, so the feeder picks it up again once the service is back
+            # (or, for DEADLINE, once the row's hold has passed)
+            self._done(work)
+        elif not self._pass_on(next_stage, work):
+            self._done(work)
+
+    # --- stages ---
+
+    def _feed(self) -> None:
+        while not self._stop.is_set():
+            wait = self.working_hours.seconds_until_active()
+            if wait > 0:
+                logger.info(f"Outside working hours, feeder sleeping {wait / 60:.1f} minutes")
+                self._stop.wait(min(wait, 60 * 60))
+                continue
+
+            # Pause intake while Baserow or OpenAI is down instead of burning rows on it
+            if not (db.BREAKER.wait_until_available(self._stop) and
+                    openai_api.BREAKER.wait_until_available(self._stop)):
+                return
+
+            with self._lock:
+                exclude = self._in_flight | self.ctx.held_ids()
+            try:
+                rows = db.get_unprocessed_rows(self.ctx.websites_table, exclude_ids=exclude, limit=self.queue_size,
+                                               include=stages.ROW_FIELDS)
+            except Exception as e:
+                logger.exception("Error fetching next rows")
+                print(f"Error fetching next rows: {e}")
+                rows = []
+
+            if not rows:
+                if not exclude - self.ctx.held_ids():
+                    delay = self.idle_delay()
+                    print(f"No more rows to process. Sleeping for {delay / 60:.1f} minutes...")
+                    self._stop.wait(delay)
+                else:
+                    # Rows are still moving through the stages; check back soon
+                    self._stop.wait(self.persist_interval)
+                continue
+
+            for row in rows:
+                work = RowWork(row)
+                with self._lock:
+                    self._in_flight.add(work.row_id)
+                if not self._pass_on(SCRAPE, work):
+                    self._done(work)
+                    return
+
+    def _work(self, stage: str, fn) -> None:
+        while not self._stop.is_set():
+            work = self._get(stage)
+            if work is None:
+                continue
+            work.deadline.resume()
+            try:
+                with log_setup.context(work.row_id, stage), profiling.row(stage, work.row_id):
+                    next_stage = fn(work)
+            except Exception:
+                logger.exception(f"Row {work.row_id}: Unexpected error in {stage} stage")
+                next_stage = None
+            self._route(work, next_stage)
+
+    def _analyze(self, work: RowWork) -> Optional[str]:
+        with work.deadline.paused():
+            available = openai_api.BREAKER.wait_until_available(self._stop)
+        if not available:
+            return stages.retry_later(work, self.ctx)
+        return stages.analyze_row(work, self.ctx)
+
+    def _send(self, work: RowWork) -> Optional[str]:
+        # Waiting for a mailbox's pacing is not the row's own time
+        with work.deadline.paused():
+            slot = wait_for_sender(self.sender_scheduler, self.working_hours.is_active, self._stop)
+            if not slot:
+                return None
+            available = email_sender.server_breaker(slot.account).wait_until_available(self._stop)
+        if not available:
+            self.sender_scheduler.release(slot)
+            return stages.retry_later(work, self.ctx)
+        try:
+            success, msg = send_from_account(self.sender_scheduler, slot, work.row_id, work.email_data, work.row,
+                                             work.deadline)
+        except DeadlineExceeded:
+            return stages.out_of_time(work, self.ctx, SEND)
+        except Exception as e:
+            if is_outage(e):
+                logger.warning(f"Row {work.row_id}: SMTP unavailable ({e}), will retry.")
+                return stages.retry_later(work, self.ctx)
+            logger.exception(f"Row {work.row_id}: Email sending raised an exception.")
+            print(f"Email sending raised exception: {e}")
+            return None
+        stages.record_send_result(work, success, msg)
+        return PERSIST
+
+    def _persist(self) -> None:
+        batch: List[RowWork] = []
+        while True:
+            stopping = self._stop_persist.is_set()
+            work = self._get(PERSIST, timeout=0.1 if stopping else self.persist_interval)
+            if work is not None:
+                batch.append(work)
+            if batch and (work is None or len(batch) >= self.persist_batch):
+                self._flush(batch)
+                batch = []
+            if stopping and work is None and not self._sending():
+                return
+
+    def _sending(self) -> bool:
+        """Whether a send worker is still running (and may yet hand a row to persist)."""
+        return any(thread.is_alive() for thread in self._threads.get(SEND, []))
+
+    def _flush(self, batch: List[RowWork]) -> None:
+        # Hold finished rows while Baserow is down rather than fail every write in the batch
+        db.BREAKER.wait_until_available(self._stop)
+        try:
+            with log_setup.context(stage=PERSIST), metrics.timed("persist_batch"):
+                stages.persist_rows(batch, self.ctx)
+        except Exception:
+            logger.exception(f"Failed to persist a batch of {len(batch)} rows")
+        for work in batch:
+            self._done(work)
@@ -0,0 +1,160 @@
+import io
+import os
+import time
+import pstats
+import signal
+import logging
+import cProfile
+import threading
+import tracemalloc
+import faulthandler
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Lines of pstats / tracemalloc output written next to each capture
+REPORT_LINES = 30
+
+
+class Profiler:
+    """Diagnostics that can stay on in production and write everything to ``profiles_dir``:
+
+    * ``row_threshold`` > 0: every stage call is run under cProfile, and calls slower than
+      the threshold are kept as ``row-<id>-<stage>-<time>.prof`` (plus a ``.txt`` summary).
+    * ``memory_interval`` > 0: tracemalloc snapshots every that many seconds, with the top
+      allocation growth since the previous snapshot in ``memory-<time>.txt``.
+    * ``dump_signal`` (e.g. ``"SIGUSR1"``): ``kill -USR1 <pid>`` appends the stacks of all
+      threads to ``stacks.log``.
+    """
+
+    def __init__(self, profiles_dir: str, row_threshold: float = 0.0, memory_interval: float = 0.0,
+                 memory_top: int = 15, dump_signal: str = None):
+        self.profiles_dir = profiles_dir
+        self.row_threshold = row_threshold
+        self.memory_interval = memory_interval
+        self.memory_top = memory_top
+        self.dump_signal = dump_signal
+        self._stacks_file = None
+        self._stop = threading.Event()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.row_threshold or self.memory_interval or self.dump_signal)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.profiles_dir, name)
+
+    def start(self) -> None:
+        if not self.enabled:
+            return
+        os.makedirs(self.profiles_dir, exist_ok=True)
+        if self.dump_signal:
+            self._register_stack_dump()
+        if self.memory_interval:
+            threading.Thread(target=self._memory_loop, name="profiling-memory", daemon=True).start()
+        if self.row_threshold:
+            logger.info(f"Profiling stage calls slower than {self.row_threshold}s into {self.profiles_dir}")
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    # --- per-row cProfile ---
+
+    @contextmanager
+    def row(self, stage: str, row_id):
+        """Profile one stage call for one row; keep the profile only if it was slow."""
+        if not self.row_threshold:
+            yield
+            return
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active on this interpreter; run unprofiled
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            if elapsed >= self.row_threshold:
+                self._save_row_profile(profile, stage, row_id, elapsed)
+
+    def _save_row_profile(self, profile: cProfile.Profile, stage: str, row_id, elapsed: float) -> None:
+        name = f"row-{row_id}-{stage}-{time.strftime('%Y%m%d-%H%M%S')}"
+        try:
+            profile.dump_stats(self._path(f"{name}.prof"))
+            out = io.StringIO()
+            out.write(f"Row {row_id}, stage {stage}: {elapsed:.2f}s\n\n")
+            pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(REPORT_LINES)
+            with open(self._path(f"{name}.txt"), "w") as f:
+                f.write(out.getvalue())
+            logger.info(f"Row {row_id}: {stage} took {elapsed:.2f}s, profile saved to {name}.prof")
+        except OSError:
+            logger.exception(f"Row {row_id}: Could not save profile")
+
+    # --- tracemalloc ---
+
+    def _memory_loop(self) -> None:
+        if not tracemalloc.is_tracing():
+            # One frame is all "lineno" grouping needs, and keeps tracing overhead low
+            tracemalloc.start(1)
+        previous = tracemalloc.take_snapshot()
+        while not self._stop.wait(self.memory_interval):
+            try:
+                snapshot = tracemalloc.take_snapshot()
+                self._write_memory_diff(snapshot, previous)
+                previous = snapshot
+            except Exception:
+                logger.exception("Failed to write memory snapshot")
+
+    def _top(self, stats) -> list:
+        # Filtering after grouping is far cheaper than Snapshot.filter_traces on every trace
+        own = (tracemalloc.__file__, "<frozen importlib._bootstrap>")
+        return [str(s) for s in stats if s.traceback[0].filename not in own][:self.memory_top]
+
+    def _write_memory_diff(self, snapshot, previous) -> None:
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"traced: {current / 1e6:.1f} MB (peak {peak / 1e6:.1f} MB)", "",
+                 f"Top {self.memory_top} allocation changes since previous snapshot:"]
+        lines += self._top(snapshot.compare_to(previous, "lineno"))
+        lines += ["", f"Top {self.memory_top} allocations:"]
+        lines += self._top(snapshot.statistics("lineno"))
+        with open(self._path(f"memory-{time.strftime('%Y%m%d-%H%M%S')}.txt"), "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+    # --- stack dump ---
+
+    def _register_stack_dump(self) -> None:
+        signum = getattr(signal, self.dump_signal, None)
+        if signum is None or not hasattr(faulthandler, "register"):
+            logger.warning(f"Stack dump signal {self.dump_signal} is not available on this platform")
+            return
+        # faulthandler writes from C, so it works even when every Python thread is stuck
+        self._stacks_file = open(self._path("stacks.log"), "a")
+        faulthandler.register(signum, file=self._stacks_file, all_threads=True, chain=False)
+        logger.info(f"Send {self.dump_signal} to pid {os.getpid()} to dump all thread stacks to "
+                    f"{self._path('stacks.log')}")
+
+
+# Disabled until start() is called, so stage code can always wrap calls in profiling.row(...)
+PROFILER = Profiler("")
+
+
+def start(profiles_dir: str, row_threshold: float, memory_interval: float, memory_top: int,
+          dump_signal: str) -> Profiler:
+    """Configure and start the shared profiler (everything off when all settings are 0/empty)."""
+    global PROFILER
+    PROFILER = Profiler(profiles_dir, row_threshold, memory_interval, memory_top, dump_signal or None)
+    PROFILER.start()
+    return PROFILER
+
+
+@contextmanager
+def row(stage: str, row_id):
+    with PROFILER.row(stage, row_id):
+        yield
@@ -0,0 +1,163 @@
+"""
+Prompt files (prompts/*.py), loaded once and reloaded in place when they change.
+
+Each load produces an immutable ``PromptSet`` identified by a short hash of the file's
+source, its ``version``. Every GPT call logs and counts the version it used, and it is stored
+with the scores in Note3 and the analytics store, so results from different prompt versions can
+be told apart. A ``PromptFile`` hands out the current set. At most every ``PROMPT_RELOAD_SECONDS``
+it checks whether the file changed, and if so loads and test-renders the new source before
+swapping it in. A file that fails to load is reported and the previous version stays in use, so
+editing a prompt never needs a restart and a typo never stops a run.
+"""
+import os
+import time
+import types
+import hashlib
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+import metrics
+from config import PROMPT_RELOAD_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RELOADS = "atlantis_prompt_reloads_total"
+GPT_CALLS = "atlantis_gpt_calls_total"
+
+# Prompt files given by name (campaigns.json, --prompt-file) are looked up here
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "prompts")
+
+REQUIRED = ("base_prompt", "ventures_prompt", "investors_prompt")
+# Rendered task prompts kept per set; there is one per Info table content, so few are ever needed
+MAX_TASKS = 32
+
+
+class PromptSet:
+    """One loaded version of a prompt file."""
+
+    def __init__(self, path: str, source: bytes, namespace: dict):
+        self.path = path
+        self.name = os.path.basename(path)
+        self.version = hashlib.sha256(source).hexdigest()[:12]
+        self.base_prompt: Callable[..., str] = namespace["base_prompt"]
+        self.ventures_prompt: Callable[[str], str] = namespace["ventures_prompt"]
+        self.investors_prompt: Callable[[str], str] = namespace["investors_prompt"]
+        self._tasks: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+
+    def intro(self, scraped_text: str, emails: list, row_email: str, location: str, funding: str) -> str:
+        return self.base_prompt(scraped_text, emails, row_email, location, funding)
+
+    def task(self, mode: str, formatted_info: str) -> str:
+        """
+        The task prompt for ``mode``. It only depends on the Info table, so it is the same for
+        every row of a campaign; it is rendered once and reused.
+        """
+        key = (mode, formatted_info)
+        task = self._tasks.get(key)
+        if task is None:
+            render = self.ventures_prompt if mode == "Ventures" else self.investors_prompt
+            task = render(formatted_info)
+            with self._lock:
+                if len(self._tasks) >= MAX_TASKS:
+                    self._tasks.clear()
+                self._tasks[key] = task
+        return task
+
+
+def load(path: str) -> PromptSet:
+    """
+    Execute a prompt file in a namespace of its own (never registered in ``sys.modules``) and
+    check that it defines and can render all three prompts.
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+    module = types.ModuleType(f"_prompts_{os.path.splitext(os.path.basename(path))[0]}")
+    module.__file__ = path
+    exec(compile(source, path, "exec"), module.__dict__)
+    for attr in REQUIRED:
+        if not callable(getattr(module, attr, None)):
+            raise AttributeError(f"{path} is missing required attribute: {attr}")
+    prompts = PromptSet(path, source, module.__dict__)
+    # Catch broken templates (bad placeholders, syntax inside f-strings) before any row uses them
+    prompts.intro("", [], "", "", "")
+    prompts.ventures_prompt("")
+    prompts.investors_prompt("")
+    return prompts
+
+
+class PromptFile:
+    """The current version of one prompt file, reloaded when the file changes."""
+
+    def __init__(self, path: str, reload_interval: float = PROMPT_RELOAD_SECONDS):
+        self.path = os.path.realpath(path)
+        self.reload_interval = reload_interval
+        self._stat = self._file_stat()
+        self._current = load(self.path)
+        self._checked_at = time.monotonic()
+        self._lock = threading.Lock()
+        logger.info(f"Loaded prompts {self._current.name} (version {self._current.version})")
+
+    def _file_stat(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def current(self) -> PromptSet:
+        """The set to use for one GPT call. Take it once per call so all parts share a version."""
+        if self.reload_interval and time.monotonic() - self._checked_at >= self.reload_interval:
+            self._maybe_reload()
+        return self._current
+
+    @property
+    def version(self) -> str:
+        return self.current().version
+
+    def _maybe_reload(self) -> None:
+        # Only one thread checks; the others keep using the current set meanwhile
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                return
+            self._stat = stat
+            previous = self._current
+            try:
+                loaded = load(self.path)
+            except Exception as e:
+                metrics.REGISTRY.inc(RELOADS, 1, "Prompt file reloads", file=previous.name, result="failed")
+                logger.error(f"Reloading prompts {previous.name} failed, keeping version {previous.version}: {e}")
+                print(f"Prompt file {previous.name} could not be loaded ({e}); still using the previous version.")
+                return
+            if loaded.version == previous.version:
+                return
+            self._current = loaded
+            metrics.REGISTRY.inc(RELOADS, 1, "Prompt file reloads", file=loaded.name, result="ok")
+            logger.info(f"Prompts {loaded.name} reloaded: version {previous.version} -> {loaded.version}")
+            print(f"Prompt file {loaded.name} changed, now using version {loaded.version}")
+        finally:
+            self._lock.release()
+
+
+_FILES: Dict[str, PromptFile] = {}
+_FILES_LOCK = threading.Lock()
+
+
+def get(path: str) -> PromptFile:
+    """The process-wide ``PromptFile`` for ``path``, loaded on first use (campaigns share it)."""
+    key = os.path.realpath(path)
+    with _FILES_LOCK:
+        prompt_file = _FILES.get(key)
+        if prompt_file is None:
+            prompt_file = _FILES[key] = PromptFile(key)
+        return prompt_file
+
+
+def named(name: str) -> PromptFile:
+    """``get`` for a file in ``PROMPTS_DIR`` (``name`` may also be an absolute path)."""
+    return get(name if os.path.isabs(name) else os.path.join(PROMPTS_DIR, name))
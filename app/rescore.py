@@ -0,0 +1,270 @@
+"""
+Re-scores already analyzed companies against new or changed Info-table rows.
+
+    python app/rescore.py --mode Ventures --info-table "Mandates" [--prompt-file prompts.py] [--dry-run]
+
+Compares the Info table with the snapshot saved by the previous run. Only the rows that
+are new or changed are scored. A company in the main table is selected when its archived
+content (see content_store) shares enough keywords with one of those rows. Each selected
+company gets one GPT call, limited to the changed rows it plausibly matches, without
+scraping and without sending anything. The new scores are merged into its Note3 JSON, and
+all updates are written back to the main table in batches.
+
+The first run for an Info table only records the snapshot; use ``--all`` to score against
+every Info row instead.
+"""
+import os
+import re
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from pydantic import ValidationError
+
+from config import (
+    MAIN_VENTURES_TABLE_ID, MAIN_INVESTORS_TABLE_ID, PIPELINE_ANALYZE_WORKERS,
+    RESCORE_STATE_PATH, RESCORE_MIN_OVERLAP
+)
+import db
+import log_setup
+import analytics
+import openai_api
+import prompt_registry
+from breaker import is_outage
+from content_store import CONTENT_STORE
+from models import Match
+from prompt_registry import PromptFile, PromptSet
+from stages import MIN_SEND_SCORE, MAX_WORDS
+
+logger = logging.getLogger(__name__)
+
+# Info-table fields that identify a row rather than describe it
+IDENTITY_FIELDS = {"id", "order"}
+ACRONYM_FIELD = "Name (Acronym)"
+
+STOPWORDS = {
+    "with", "from", "that", "this", "their", "they", "have", "into", "over", "more", "than", "also",
+    "about", "which", "will", "your", "ours", "such", "other", "across", "including", "based",
+    "company", "companies", "stage", "focus", "investing", "invests", "investment", "investments",
+}
+_WORD = re.compile(r"[a-z][a-z0-9+\-]{3,}")
+
+
+def _keywords(text: str) -> set:
+    return {w for w in _WORD.findall(text.lower()) if w not in STOPWORDS}
+
+
+def _fingerprint(row: dict) -> str:
+    content = {k: v for k, v in row.items() if k not in IDENTITY_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _acronym(row: dict) -> str:
+    return openai_api._safe_strip(row.get(ACRONYM_FIELD, "")) or f"row {row.get('id')}"
+
+
+# --- Info table snapshots ---
+
+def load_state(path: str = RESCORE_STATE_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_state(state: dict, path: str = RESCORE_STATE_PATH) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def changed_info_rows(info_rows: List[dict], previous: Dict[str, str]) -> List[dict]:
+    """Info rows whose fingerprint is new or differs from ``previous`` (row id -> fingerprint)."""
+    return [row for row in info_rows if previous.get(str(row.get("id"))) != _fingerprint(row)]
+
+
+def snapshot(info_rows: List[dict]) -> Dict[str, str]:
+    return {str(row.get("id")): _fingerprint(row) for row in info_rows}
+
+
+# --- selection ---
+
+def plausible_rows(text: str, info_rows: List[dict], min_overlap: float) -> List[dict]:
+    """The ``info_rows`` sharing at least ``min_overlap`` of their description keywords with ``text``."""
+    words = _keywords(text)
+    selected = []
+    for row in info_rows:
+        wanted = _keywords(" ".join(openai_api._safe_strip(v) for k, v in row.items()
+                                    if k not in IDENTITY_FIELDS and k != ACRONYM_FIELD))
+        if wanted and len(wanted & words) / len(wanted) >= min_overlap:
+            selected.append(row)
+    return selected
+
+
+def select_candidates(main_rows: List[dict], changed: List[dict], min_overlap: float) -> List[tuple]:
+    """(main row, archived content, plausible Info rows) for every main row worth re-scoring."""
+    candidates, not_archived = [], 0
+    for row in main_rows:
+        archived = CONTENT_STORE.get(row.get("Website")) if CONTENT_STORE is not None else None
+        if not archived:
+            not_archived += 1
+            continue
+        matching = plausible_rows(archived["text"], changed, min_overlap)
+        if matching:
+            candidates.append((row, archived, matching))
+    if not_archived:
+        logger.info(f"{not_archived} main-table row(s) have no archived content and are not re-scored")
+    return candidates
+
+
+# --- scoring ---
+
+def merge_matches(note3: Optional[str], matches: List[Match], prompt_version: Optional[str] = None) -> dict:
+    """The Note3 JSON with ``matches`` replacing earlier scores for the same acronyms."""
+    try:
+        existing = json.loads(note3) if note3 else {}
+    except (TypeError, ValueError):
+        existing = {}
+    if not isinstance(existing, dict):
+        existing = {}
+    by_acronym = {m.get("acronym"): m for m in existing.get("matches", []) if isinstance(m, dict)}
+    for match in matches:
+        by_acronym[match.acronym] = match.model_dump()
+    existing["matches"] = list(by_acronym.values())
+    existing["rescored_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    if prompt_version:
+        existing["rescore_prompt_version"] = prompt_version
+    return existing
+
+
+def rescore_row(row: dict, archived: dict, info_rows: List[dict], mode: str, prompts: PromptSet) -> Optional[List[Match]]:
+    text = " ".join(archived["text"].split()[:MAX_WORDS])
+    gpt_result = openai_api.ask_gpt_about_company(
+        text, archived.get("emails", []), row.get("Email", ""), mode, info_rows,
+        row.get("Location", ""), row.get("Total Funding Amount", ""),
+        prompts,
+        # The scores are all it needs, so the email is never generated
+        stop_when=lambda matches: True
+    )
+    try:
+        gpt_json = json.loads(gpt_result)
+        # Only the scores are used; email fields may legitimately be empty here
+        matches = [Match(**m) for m in gpt_json["matches"]]
+    except (ValueError, KeyError, TypeError, ValidationError) as e:
+        logger.error(f"Row {row.get('id')}: Re-scoring output unusable: {e}")
+        return None
+    # Scores for Info rows that were not asked about would overwrite good ones with guesses
+    asked = {_acronym(r) for r in info_rows}
+    return [m for m in matches if m.acronym in asked]
+
+
+def rescore(mode: str, info_table, prompt_file: PromptFile, rescore_all: bool = False, min_overlap: float = RESCORE_MIN_OVERLAP,
+            dry_run: bool = False, workers: int = PIPELINE_ANALYZE_WORKERS) -> dict:
+    main_table = MAIN_VENTURES_TABLE_ID if mode == "Ventures" else MAIN_INVESTORS_TABLE_ID
+    state = load_state()
+    state_key = f"info_table:{info_table}"
+    info_rows = list(db.iter_rows(info_table))
+
+    if state_key not in state and not rescore_all:
+        if not dry_run:
+            state[state_key] = snapshot(info_rows)
+            save_state(state)
+        print(f"No previous snapshot of Info table {info_table}; recorded {len(info_rows)} row(s) as the baseline.")
+        return {"changed": 0, "candidates": 0, "rescored": 0, "new_fits": 0}
+
+    changed = info_rows if rescore_all else changed_info_rows(info_rows, state.get(state_key, {}))
+    print(f"{len(changed)} new or changed Info row(s): {', '.join(_acronym(r) for r in changed) or '-'}")
+    summary = {"changed": len(changed), "candidates": 0, "rescored": 0, "new_fits": 0}
+    if not changed:
+        return summary
+
+    candidates = select_candidates(list(db.iter_rows(main_table)), changed, min_overlap)
+    summary["candidates"] = len(candidates)
+    print(f"{len(candidates)} analyzed compan(ies) plausibly match them")
+
+    # One version for the whole run, even if the file is edited meanwhile
+    prompts = prompt_file.current()
+
+    def score(candidate):
+        """(row, matches or None, whether it failed because OpenAI was unavailable)"""
+        row, archived, matching = candidate
+        try:
+            return row, rescore_row(row, archived, matching, mode, prompts), False
+        except Exception as e:
+            logger.exception(f"Row {row.get('id')}: Re-scoring failed")
+            return row, None, is_outage(e)
+
+    updates, records, unavailable = [], [], 0
+    # Results are counted here, on the calling thread, not by the workers
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for row, matches, outage in pool.map(score, candidates):
+            unavailable += outage
+            if matches is None:
+                continue
+            fits = [m.acronym for m in matches if m.score >= MIN_SEND_SCORE]
+            if fits:
+                summary["new_fits"] += 1
+                print(f"Row {row.get('id')} ({row.get('Name')}): now fits {', '.join(fits)}")
+            note3 = json.dumps(merge_matches(row.get("Note3"), matches, prompts.version), ensure_ascii=False)
+            updates.append({"id": row["id"], "Note3": note3})
+            records.extend(analytics.match_rows(
+                {"matches": [m.model_dump() for m in matches], "prompt_version": prompts.version}, row, mode,
+                source="rescore"))
+
+    summary["rescored"] = len(updates)
+    if dry_run:
+        print(f"Dry run: {len(updates)} row(s) would be updated")
+        return summary
+
+    if updates:
+        db.update_rows(main_table, updates)
+    analytics.record_safely(records)
+    print(f"Updated {len(updates)} row(s) in the main {mode} table")
+    if unavailable:
+        # Keep the old snapshot so the companies OpenAI could not score are selected again
+        print(f"{unavailable} compan(ies) were not scored because OpenAI was unavailable; run again to retry them.")
+        return summary
+    # Only remember the new snapshot once the scores are written, so a failed run is retried
+    state[state_key] = snapshot(info_rows)
+    save_state(state)
+    return summary
+
+
+def main(argv=None):
+    # Set up here rather than on import, so importing this module has no side effects
+    log_setup.setup()
+    parser = argparse.ArgumentParser(description="Re-score analyzed companies against new or changed Info rows.")
+    parser.add_argument("--mode", choices=["Ventures", "Investors"], required=True)
+    parser.add_argument("--info-table", required=True, help="Info table id or name")
+    parser.add_argument("--prompt-file", default="prompts.py")
+    parser.add_argument("--all", action="store_true", help="Score against every Info row, not only changed ones")
+    parser.add_argument("--min-overlap", type=float, default=RESCORE_MIN_OVERLAP,
+                        help="Share of an Info row's keywords the company content must contain")
+    parser.add_argument("--dry-run", action="store_true", help="Score but do not write anything")
+    args = parser.parse_args(argv)
+
+    if CONTENT_STORE is None:
+        print("The content store is disabled (CONTENT_STORE_ENABLED); there is nothing to re-score from.")
+        sys.exit(1)
+
+    try:
+        tables_by_name = {t["name"]: t["id"] for t in db.get_tables_in_outreach_database()}
+        info_table = db.resolve_table(args.info_table, tables_by_name)
+    except Exception as e:
+        logger.critical(f"Could not resolve Info table: {e}")
+        print(f"Could not resolve Info table: {e}")
+        sys.exit(1)
+
+    prompts = prompt_registry.named(args.prompt_file)
+    rescore(args.mode, info_table, prompts, rescore_all=args.all, min_overlap=args.min_overlap, dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
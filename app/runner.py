@@ -0,0 +1,229 @@
+"""
+Headless runner: processes several campaigns from a config file without any prompts.
+
+    python app/runner.py [campaigns.json] [--processes N]
+
+Each campaign runs its own Pipeline. By default all campaigns share one process, so
+they also share the Baserow connection pool, the Info table cache and the sender
+account quotas. With ``--processes`` campaigns are spread over a process pool instead
+(each process then has its own caches and quotas).
+"""
+import os
+import sys
+import json
+import signal
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import warmup  # first, so the startup report covers the imports below
+from config import SENDER_ACCOUNTS, TEST_MODE, PIPELINE_SCRAPE_WORKERS, PIPELINE_ANALYZE_WORKERS, \
+    PIPELINE_QUEUE_SIZE, PIPELINE_PERSIST_BATCH, METRICS_PORT, METRICS_SUMMARY_PATH, METRICS_SUMMARY_INTERVAL, \
+    PROFILES_DIR, PROFILE_ROW_THRESHOLD, PROFILE_MEMORY_INTERVAL, PROFILE_MEMORY_TOP, PROFILE_DUMP_SIGNAL, \
+    PARSE_PROCESSES
+import db
+import metrics
+import html_parse
+import log_setup
+import profiling
+import stages
+import prompt_registry
+from app import WEEK_DAYS, get_randomized_delay
+from pipeline import Pipeline
+from sender_scheduler import SenderScheduler, AccountRegistry
+from working_hours import WorkingHours, parse_windows
+
+logger = logging.getLogger(__name__)
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CAMPAIGNS_PATH = os.path.join(ROOT_DIR, "campaigns.json")
+
+REQUIRED_KEYS = ["mode", "websites_table", "info_table", "prompt_file"]
+DEFAULT_WORKING_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def load_campaigns(path: str) -> List[dict]:
+    """Read and validate the campaign list. Raises ValueError describing the first problem found."""
+    with open(path, "r") as f:
+        data = json.load(f)
+    campaigns = data.get("campaigns", []) if isinstance(data, dict) else data
+    if not campaigns:
+        raise ValueError(f"No campaigns defined in {path}")
+
+    for i, campaign in enumerate(campaigns, start=1):
+        campaign.setdefault("name", f"Campaign {i}")
+        missing = [key for key in REQUIRED_KEYS if key not in campaign]
+        if missing:
+            raise ValueError(f"{campaign['name']}: missing {', '.join(missing)}")
+        if campaign["mode"] not in ("Ventures", "Investors"):
+            raise ValueError(f"{campaign['name']}: mode must be 'Ventures' or 'Investors'")
+        unknown_days = set(campaign.get("working_days", [])) - set(WEEK_DAYS)
+        if unknown_days:
+            raise ValueError(f"{campaign['name']}: unknown working days {sorted(unknown_days)}")
+        parse_windows(campaign.get("working_windows", "9-21"))
+        _campaign_accounts(campaign)
+    return campaigns
+
+
+def _campaign_accounts(campaign: dict) -> List[dict]:
+    """Resolve ``sender_accounts`` ("all" or a list of emails) against SENDER_ACCOUNTS."""
+    wanted = campaign.get("sender_accounts", "all")
+    if wanted == "all":
+        accounts = list(SENDER_ACCOUNTS)
+    else:
+        by_email = {a.get("email"): a for a in SENDER_ACCOUNTS}
+        unknown = [email for email in wanted if email not in by_email]
+        if unknown:
+            raise ValueError(f"{campaign['name']}: unknown sender accounts {unknown}")
+        accounts = [by_email[email] for email in wanted]
+    if not accounts:
+        raise ValueError(f"{campaign['name']}: no sender accounts configured")
+    return accounts
+
+
+def build_pipeline(campaign: dict, registry: AccountRegistry, tables_by_name: dict) -> Pipeline:
+    prompts = prompt_registry.named(campaign["prompt_file"])
+
+    working_hours = WorkingHours(
+        parse_windows(campaign.get("working_windows", "9-21")),
+        campaign.get("working_days", DEFAULT_WORKING_DAYS),
+        campaign.get("timezone", "Europe/Paris")
+    )
+    delay_minutes = campaign.get("delay_minutes", 10)
+    sender_scheduler = SenderScheduler(
+        _campaign_accounts(campaign),
+        send_interval=lambda: get_randomized_delay(delay_minutes) * 60,
+        working_hours=working_hours,
+        registry=registry
+    )
+    ctx = stages.RunContext(
+        campaign["mode"],
+        db.resolve_table(campaign["websites_table"], tables_by_name),
+        db.resolve_table(campaign["info_table"], tables_by_name),
+        prompts,
+        name=campaign["name"]
+    )
+    return Pipeline(
+        ctx, sender_scheduler, working_hours,
+        idle_delay=lambda: get_randomized_delay(delay_minutes) * 60,
+        scrape_workers=campaign.get("scrape_workers", PIPELINE_SCRAPE_WORKERS),
+        analyze_workers=campaign.get("analyze_workers", PIPELINE_ANALYZE_WORKERS),
+        queue_size=campaign.get("queue_size", PIPELINE_QUEUE_SIZE),
+        persist_batch=campaign.get("persist_batch", PIPELINE_PERSIST_BATCH)
+    )
+
+
+def _tables_by_name(campaigns: List[dict]) -> dict:
+    named = [c[key] for c in campaigns for key in ("websites_table", "info_table")
+             if not (isinstance(c[key], int) or str(c[key]).isdigit())]
+    if not named:
+        return {}
+    return {t["name"]: t["id"] for t in db.get_tables_in_outreach_database()}
+
+
+def run_campaigns(campaigns: List[dict]) -> None:
+    """Run every campaign's pipeline concurrently in this process until interrupted."""
+    accounts = {a.get("email"): a for c in campaigns for a in _campaign_accounts(c)}
+    warm = warmup.start(list(accounts.values()))
+    registry = AccountRegistry()
+    tables_by_name = _tables_by_name(campaigns)
+    try:
+        pipelines = [(c["name"], build_pipeline(c, registry, tables_by_name)) for c in campaigns]
+    except ValueError as e:
+        logger.critical(f"Invalid campaigns file: {e}")
+        print(f"Invalid campaigns file: {e}")
+        sys.exit(1)
+    for _, pipeline in pipelines:
+        warm.add_context(pipeline.ctx)
+    warm.finish()
+
+    for name, pipeline in pipelines:
+        logger.info(f"Starting campaign: {name}")
+        print(f"Starting campaign: {name}")
+        pipeline.start()
+    try:
+        pipelines[0][1].wait()
+    except KeyboardInterrupt:
+        print("\nProcess interrupted. Finishing in-flight writes...")
+    finally:
+        for name, pipeline in pipelines:
+            pipeline.stop()
+            logger.info(f"Stopped campaign: {name} ({pipeline.in_flight()} row(s) left in progress)")
+
+
+def _run_campaign_in_process(campaign: dict, parse_processes: int) -> None:
+    html_parse.POOL.processes = parse_processes
+    # A single port cannot be shared by the pool, so worker processes only write summaries
+    if METRICS_SUMMARY_PATH:
+        base, ext = os.path.splitext(METRICS_SUMMARY_PATH)
+        metrics.start(0, f"{base}-{os.getpid()}{ext}", METRICS_SUMMARY_INTERVAL)
+    _start_profiling()
+    try:
+        run_campaigns([campaign])
+    except KeyboardInterrupt:
+        pass
+
+
+def run_campaigns_in_processes(campaigns: List[dict], processes: int) -> None:
+    """Spread campaigns over a process pool; sender quotas are only shared within a process."""
+    emails = [a.get("email") for c in campaigns for a in _campaign_accounts(c)]
+    if len(emails) != len(set(emails)):
+        logger.warning("Campaigns in different processes share sender accounts; their quotas are tracked separately.")
+    # Worker processes hand their records to this process, the only writer of the rotating log
+    log_queue = multiprocessing.Queue(log_setup.QUEUE_SIZE)
+    forwarder = log_setup.forward_from(log_queue)
+    # Each campaign process parses HTML on its own worker processes; by default they share the cores
+    parse_processes = PARSE_PROCESSES if PARSE_PROCESSES >= 0 else html_parse.default_processes() // processes
+    try:
+        with ProcessPoolExecutor(max_workers=processes, initializer=log_setup.setup_child,
+                                 initargs=(log_queue,)) as pool:
+            futures = [pool.submit(_run_campaign_in_process, c, parse_processes) for c in campaigns]
+            try:
+                for future in futures:
+                    future.result()
+            except KeyboardInterrupt:
+                print("\nProcess interrupted. Waiting for campaign processes to stop...")
+    finally:
+        forwarder.stop()
+
+
+def _start_profiling() -> None:
+    profiling.start(PROFILES_DIR, PROFILE_ROW_THRESHOLD, PROFILE_MEMORY_INTERVAL, PROFILE_MEMORY_TOP,
+                    PROFILE_DUMP_SIGNAL)
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run outreach campaigns without prompts.")
+    parser.add_argument("campaigns", nargs="?", default=DEFAULT_CAMPAIGNS_PATH, help="Path to campaigns JSON file")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Run campaigns in a pool of this many processes instead of threads")
+    args = parser.parse_args(argv)
+
+    try:
+        campaigns = load_campaigns(args.campaigns)
+    except (OSError, ValueError) as e:
+        logger.critical(f"Invalid campaigns file: {e}")
+        print(f"Invalid campaigns file: {e}")
+        sys.exit(1)
+
+    signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+    if TEST_MODE:
+        print("⚠️ TEST MODE IS ENABLED ⚠️")
+    print(f"Loaded {len(campaigns)} campaign(s) from {args.campaigns}")
+
+    if args.processes > 1:
+        run_campaigns_in_processes(campaigns, args.processes)
+    else:
+        metrics.start(METRICS_PORT, METRICS_SUMMARY_PATH, METRICS_SUMMARY_INTERVAL)
+        _start_profiling()
+        run_campaigns(campaigns)
+
+
+if __name__ == "__main__":
+    main()
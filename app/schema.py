@@ -0,0 +1,163 @@
+"""
+Baserow table schemas: every field's name, id and type, cached for the whole process.
+
+``db`` addresses fields by id (``field_1234``) rather than asking Baserow to map names on every
+request (``user_field_names=true``), and reads only the fields a caller needs (``include``).
+Rows are translated back to field names before they leave ``db``, so callers are unchanged.
+A schema is fetched when its table is first used (or by the startup warm-up), and refetched
+on demand: when a name is not found, in case the field was just added, and after Baserow
+rejects a write.
+
+Write payloads are checked against the schema before they are sent. A field the table does
+not have, or that cannot be written (formulas, lookups...), is left out with a warning, as
+``ingest`` does for unknown columns, instead of failing the whole request.
+"""
+import time
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Field types whose values Baserow computes; writing them is rejected
+READ_ONLY_TYPES = frozenset({
+    "formula", "lookup", "count", "rollup", "created_on", "last_modified",
+    "created_by", "last_modified_by", "autonumber", "uuid",
+})
+# A table is refetched for an unknown name at most this often
+REFRESH_INTERVAL = 60
+
+
+class TableSchema:
+    """The fields of one table, by name and by ``field_<id>`` key."""
+
+    def __init__(self, table_id, fields: List[dict]):
+        self.table_id = table_id
+        self.fields = fields
+        self.by_name: Dict[str, dict] = {f["name"]: f for f in fields}
+        self._names: Dict[str, str] = {f"field_{f['id']}": f["name"] for f in fields}
+        self.fetched_at = time.monotonic()
+
+    def key(self, name: str) -> Optional[str]:
+        field = self.by_name.get(name)
+        return f"field_{field['id']}" if field else None
+
+    def writable(self, name: str) -> bool:
+        field = self.by_name.get(name)
+        return field is not None and field.get("type") not in READ_ONLY_TYPES and not field.get("read_only")
+
+    def missing_options(self, name: str, values: Iterable[str]) -> List[str]:
+        """``values`` that select field ``name`` has no option for (none when it is not a select field)."""
+        field = self.by_name.get(name)
+        if field is None or field.get("type") not in ("single_select", "multiple_select"):
+            return []
+        options = {option.get("value") for option in field.get("select_options") or []}
+        return [value for value in values if value not in options]
+
+    def to_names(self, row: dict) -> dict:
+        """A row as returned by Baserow (``field_<id>`` keys) with field names as keys."""
+        names = self._names
+        return {names.get(k, k): v for k, v in row.items()}
+
+    def to_ids(self, values: dict) -> Tuple[dict, List[str]]:
+        """``values`` keyed by ``field_<id>`` (``id`` kept as is), and the names that cannot be written."""
+        payload, rejected = {}, []
+        for name, value in values.items():
+            if name == "id":
+                payload[name] = value
+            elif self.writable(name):
+                payload[self.key(name)] = value
+            else:
+                rejected.append(name)
+        return payload, rejected
+
+
+class SchemaCache:
+    """
+    ``TableSchema`` per table id and the list of tables, fetched with ``fetch_fields(table_id)``
+    and ``fetch_tables()`` on first use and kept until refreshed.
+    """
+
+    def __init__(self, fetch_fields: Callable[[object], List[dict]], fetch_tables: Callable[[], List[dict]]):
+        self.fetch_fields = fetch_fields
+        self.fetch_tables = fetch_tables
+        self._schemas: Dict[object, TableSchema] = {}
+        self._tables: Optional[List[dict]] = None
+        self._warned = set()
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+
+    def table(self, table_id) -> TableSchema:
+        schema = self._schemas.get(table_id)
+        metrics.cache_lookup("schema", schema is not None)
+        if schema is None:
+            # One fetch when several threads need the same table at startup
+            with self._fetch_lock:
+                schema = self._schemas.get(table_id) or self.refresh(table_id)
+        return schema
+
+    def refresh(self, table_id) -> TableSchema:
+        schema = TableSchema(table_id, self.fetch_fields(table_id))
+        with self._lock:
+            self._schemas[table_id] = schema
+        logger.debug(f"Loaded schema of table {table_id}: {len(schema.fields)} fields")
+        return schema
+
+    def invalidate(self, table_id=None) -> None:
+        """Forget one table's schema (or all of them, and the table list); refetched on next use."""
+        with self._lock:
+            if table_id is None:
+                self._schemas.clear()
+                self._tables = None
+            else:
+                self._schemas.pop(table_id, None)
+
+    def load(self, table_ids: Iterable) -> None:
+        """Fetch the schemas of ``table_ids`` that are not cached yet (startup warm-up)."""
+        for table_id in table_ids:
+            if table_id:
+                self.table(table_id)
+
+    def tables(self, refresh: bool = False) -> List[dict]:
+        """Every table the token can see (``id``, ``name``, ``database_id``...)."""
+        tables = self._tables
+        metrics.cache_lookup("tables", tables is not None and not refresh)
+        if tables is None or refresh:
+            tables = self._tables = self.fetch_tables()
+        return tables
+
+    def keys(self, table_id, names: Iterable[str]) -> List[str]:
+        """``field_<id>`` keys for ``names``; names the table does not have are skipped."""
+        schema = self._current(table_id, names)
+        return [key for key in (schema.key(name) for name in names) if key]
+
+    def key(self, table_id, name: str) -> Optional[str]:
+        keys = self.keys(table_id, [name])
+        return keys[0] if keys else None
+
+    def payload(self, table_id, values: dict) -> dict:
+        """``values`` keyed by field id, leaving out (with a warning) fields that cannot be written."""
+        schema = self._current(table_id, [name for name in values if name != "id"])
+        payload, rejected = schema.to_ids(values)
+        for name in rejected:
+            self._warn(table_id, name, schema)
+        return payload
+
+    def _current(self, table_id, names: Iterable[str]) -> TableSchema:
+        """The cached schema, refetched (at most every ``REFRESH_INTERVAL``) if it lacks any of ``names``."""
+        schema = self.table(table_id)
+        if any(name not in schema.by_name for name in names) and \
+                time.monotonic() - schema.fetched_at >= REFRESH_INTERVAL:
+            schema = self.refresh(table_id)
+        return schema
+
+    def _warn(self, table_id, name: str, schema: TableSchema) -> None:
+        with self._lock:
+            if (table_id, name) in self._warned:
+                return
+            self._warned.add((table_id, name))
+        reason = "does not exist" if name not in schema.by_name else "is read-only"
+        logger.warning(f"Field {name!r} {reason} in table {table_id}; it is left out of writes")
+        print(f"Warning: field {name!r} {reason} in table {table_id}; not writing it.")
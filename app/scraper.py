@@ -1,74 +1,99 @@
 import requests
-from bs4 import BeautifulSoup
 import re
+import functools
 from urllib.parse import urljoin
 import logging
-from typing import Tuple, List
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Tuple, List, Optional
+
+import metrics
+from crawler import SCHEDULER, ROBOTS, HEADERS
+from html_parse import POOL
+from limiter import LIMITERS
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
-EMAIL_REGEX = re.compile(r"[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+")
+PRIORITY_PATHS = [
+    "contact", "contact-us", "about", "about-us",
+    "get-in-touch", "support", "help", "connect",
+    "reach-us", "contacts"
+]
 
-def scrape_website(url: str) -> Tuple[str, List[str]]:
-    """Scrape a website's main page and priority paths for content and emails."""
-    emails = set()
-    text_content = []
-    priority_paths = [
-        "contact", "contact-us", "about", "about-us",
-        "get-in-touch", "support", "help", "connect",
-        "reach-us", "contacts"
-    ]
+CHARSET_REGEX = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
 
-    def crawl_page(page_url: str) -> None:
-        """Crawl a single page and collect content/emails."""
-        headers = {
-            "User-Agent": (
-                "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-                "AppleWebKit/537.36 (KHTML, like Gecko) "
-                "Chrome/120.0.0.0 Safari/537.36"
-            ),
-            "Accept-Language": "en-US,en;q=0.9",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Connection": "keep-alive",
-        }
+def crawl_page(page_url: str, deadline: Deadline = NO_DEADLINE) -> Optional[Tuple[str, List[str]]]:
+    """Fetch a single page and return its text and emails, or None when it could not be fetched."""
+    try:
+        logger.debug(f"Attempting to crawl: {page_url}")
+        with LIMITERS["scrape"].slot() as slot, deadline.bound(20) as timeout:
+            response = requests.get(page_url, headers=HEADERS, timeout=timeout)
+            slot.status(response.status_code)
+        response.raise_for_status()
 
-        try:
-            logger.info(f"Attempting to crawl: {page_url}")
-            response = requests.get(page_url, headers=headers, timeout=20)
-            response.raise_for_status()
+        # Only a charset the server declared is passed on; otherwise the parser detects it from
+        # the page itself (requests would assume ISO-8859-1 for any text/html without one)
+        declared = CHARSET_REGEX.search(response.headers.get("Content-Type", ""))
+        result = POOL.parse(response.content, declared.group(1) if declared else None)
+        metrics.count_outcome("scrape_page", "ok")
+        return result
 
-            soup = BeautifulSoup(response.text, "html.parser")
-            page_text = soup.get_text(separator="\n", strip=True)
-            text_content.append(page_text)
+    except DeadlineExceeded:
+        logger.debug(f"Out of time before {page_url} could be crawled")
+        metrics.count_outcome("scrape_page", "deadline")
+        return None
 
-            found_emails = EMAIL_REGEX.findall(page_text)
-            emails.update(found_emails)
-            logger.info(f"Found {len(found_emails)} emails on {page_url}")
+    except Exception as e:
+        logger.warning(f"Failed to crawl {page_url}: {str(e)}")
+        metrics.count_outcome("scrape_page", "error")
+        return None
 
-        except Exception as e:
-            logger.warning(f"Failed to crawl {page_url}: {str(e)}")
+@metrics.instrumented("scrape")
+def scrape_website(url: str, deadline: Deadline = NO_DEADLINE) -> Tuple[str, List[str]]:
+    """
+    Scrape a website's main page and priority paths for content and emails. Raises
+    ``DeadlineExceeded`` when ``deadline`` runs out before every page is in.
+    """
+    emails = set()
+    text_content = []
 
     try:
-        # Always crawl main page first
         logger.info(f"Starting scrape of main page: {url}")
-        crawl_page(url)
+        page_urls = [url] + [urljoin(url, path) for path in PRIORITY_PATHS]
+        if ROBOTS is not None:
+            allowed = [page_url for page_url in page_urls if ROBOTS.allowed(page_url)]
+            if len(allowed) < len(page_urls):
+                logger.info(f"robots.txt disallows {len(page_urls) - len(allowed)} of {len(page_urls)} pages of {url}")
+            page_urls = allowed
 
-        # Crawl priority paths
-        for path in priority_paths:
-            priority_url = urljoin(url, path)
-            logger.info(f"Checking priority path: {priority_url}")
-            crawl_page(priority_url)
+        # All pages are queued at once; the scheduler paces them per host and interleaves them
+        # with other sites' pages. Results are read back in order, main page first.
+        fetch = functools.partial(crawl_page, deadline=deadline)
+        futures = [SCHEDULER.submit(page_url, fetch) for page_url in page_urls]
+        for page_url, future in zip(page_urls, futures):
+            try:
+                result = future.result(timeout=deadline.remaining())
+            except FutureTimeout:
+                # Pages still waiting for their host's turn are never fetched
+                for pending in futures:
+                    pending.cancel()
+                raise DeadlineExceeded(f"row deadline of {deadline.seconds:g}s exceeded while scraping {url}")
+            if result is None:
+                continue
+            page_text, found_emails = result
+            if page_text:
+                text_content.append(page_text)
+            emails.update(found_emails)
+            logger.debug(f"Found {len(found_emails)} emails on {page_url}")
 
         full_text = "\n".join(text_content)
         logger.info(f"Scraping complete. Total emails found: {len(emails)}")
         return full_text.strip(), sorted(emails)
 
+    except DeadlineExceeded:
+        raise
+
     except Exception as e:
         error_msg = f"ERROR: {str(e)}"
         logger.error(error_msg)
-        return error_msg, []
\ No newline at end of file
+        return error_msg, []
@@ -0,0 +1,227 @@
+import time
+import logging
+import threading
+from collections import deque
+from typing import Callable, List, NamedTuple, Optional
+
+from config import SENDER_DEFAULT_HOURLY_LIMIT, SENDER_DEFAULT_DAILY_LIMIT
+from working_hours import WorkingHours
+
+logger = logging.getLogger(__name__)
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# Consecutive send failures before an account is parked, and for how long
+MAX_CONSECUTIVE_FAILURES = 3
+FAILURE_COOLDOWN_SECONDS = 30 * 60
+
+
+class SendSlot(NamedTuple):
+    """
+    A send reserved by ``SenderScheduler.acquire``: the account to send from, the quota entry
+    it took and until when the account is held back for it.
+    """
+    account: dict
+    reserved_at: float
+    paced_until: float
+
+
+def _account_label(account: dict) -> str:
+    return f"{account.get('name')} <{account.get('email')}>"
+
+
+class _AccountState:
+    """Send history and health of a single sender account."""
+
+    def __init__(self, account: dict, default_hours: WorkingHours = None):
+        self.account = account
+        self.hourly_limit = int(account.get("hourly_limit", SENDER_DEFAULT_HOURLY_LIMIT))
+        self.daily_limit = int(account.get("daily_limit", SENDER_DEFAULT_DAILY_LIMIT))
+        self.hours = WorkingHours.from_account(account, default_hours)
+        self.sent_at = deque()  # timestamps of sends within the last 24h
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.next_send_at = 0.0
+
+    def prune(self, now: float) -> None:
+        while self.sent_at and self.sent_at[0] <= now - DAY:
+            self.sent_at.popleft()
+
+    def sent_last_hour(self, now: float) -> int:
+        return sum(1 for ts in self.sent_at if ts > now - HOUR)
+
+    def is_active(self, now: float) -> bool:
+        return self.hours is None or self.hours.is_active(now)
+
+    def load(self, now: float) -> float:
+        """Fraction of the tighter of the two quotas already used."""
+        hourly = self.sent_last_hour(now) / self.hourly_limit if self.hourly_limit else 1.0
+        daily = len(self.sent_at) / self.daily_limit if self.daily_limit else 1.0
+        return max(hourly, daily)
+
+    def is_available(self, now: float) -> bool:
+        return (
+            now >= self.cooldown_until
+            and now >= self.next_send_at
+            and self.is_active(now)
+            and self.sent_last_hour(now) < self.hourly_limit
+            and len(self.sent_at) < self.daily_limit
+        )
+
+    def seconds_until_available(self, now: float) -> float:
+        """Rough wait until the quotas, cooldown and the account's own calendar allow another send."""
+        waits = [max(0.0, self.cooldown_until - now), max(0.0, self.next_send_at - now)]
+        if self.hours is not None:
+            waits.append(self.hours.seconds_until_active(now))
+        if len(self.sent_at) >= self.daily_limit and self.sent_at:
+            waits.append(self.sent_at[len(self.sent_at) - self.daily_limit] + DAY - now)
+        recent = [ts for ts in self.sent_at if ts > now - HOUR]
+        if len(recent) >= self.hourly_limit and recent:
+            waits.append(recent[len(recent) - self.hourly_limit] + HOUR - now)
+        return max(waits)
+
+
+class AccountRegistry:
+    """
+    Send history shared by several SenderSchedulers (one per campaign), so an account
+    used by many campaigns still respects a single set of quotas. The campaigns must
+    then agree on the account's calendar: ``state_for`` raises ValueError otherwise.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.states = {}
+
+    def state_for(self, account: dict, default_hours: WorkingHours = None) -> _AccountState:
+        key = account.get("email")
+        if key not in self.states:
+            self.states[key] = _AccountState(account, default_hours)
+        elif WorkingHours.from_account(account, default_hours) != self.states[key].hours:
+            raise ValueError(f"Sender account {key} is shared by campaigns with different working hours; "
+                             f"give it its own calendar in SENDER_ACCOUNTS or use the same hours")
+        return self.states[key]
+
+
+class SenderScheduler:
+    """
+    Spreads outgoing emails across several sender accounts.
+
+    Each account has its own hourly/daily quota (``hourly_limit`` / ``daily_limit``
+    in the SENDER_ACCOUNTS entry, falling back to the global defaults) and optional
+    calendar (``active_windows`` or ``active_start_hour``/``active_end_hour``,
+    ``working_days``, ``timezone``; see WorkingHours.from_account), falling back to
+    the run's ``working_hours`` for any part the account does not set.
+    After a successful send an account rests for ``send_interval()`` seconds, which
+    keeps the human-like spacing between emails per mailbox. The rest is reserved by
+    ``acquire`` itself, so concurrent send workers (or campaigns sharing an
+    ``AccountRegistry``) never get the same account back to back.
+    ``acquire`` hands out the least-loaded healthy account and reserves a send slot
+    on it; ``report`` must be called with that slot and the outcome of the send (or
+    ``release`` when no send was attempted).
+    """
+
+    def __init__(self, accounts: List[dict], send_interval: Callable[[], float] = lambda: 0.0,
+                 working_hours: WorkingHours = None, registry: AccountRegistry = None, clock=time.time):
+        if not accounts:
+            raise ValueError("SenderScheduler needs at least one sender account.")
+        if registry is not None:
+            self._states = [registry.state_for(a, working_hours) for a in accounts]
+            self._lock = registry.lock
+        else:
+            self._states = [_AccountState(a, working_hours) for a in accounts]
+            self._lock = threading.Lock()
+        self._send_interval = send_interval
+        self._clock = clock
+
+    @property
+    def accounts(self) -> List[dict]:
+        return [s.account for s in self._states]
+
+    def _state_for(self, account: dict) -> _AccountState:
+        for state in self._states:
+            if state.account is account or state.account.get("email") == account.get("email"):
+                return state
+        raise KeyError(f"Unknown sender account: {_account_label(account)}")
+
+    def acquire(self) -> Optional[SendSlot]:
+        """Reserve a send slot on the least-loaded available account, or return None."""
+        with self._lock:
+            now = self._clock()
+            candidates = []
+            for state in self._states:
+                state.prune(now)
+                if state.is_available(now):
+                    candidates.append(state)
+            if not candidates:
+                return None
+            state = min(candidates, key=lambda s: (s.load(now), s.consecutive_failures))
+            state.sent_at.append(now)
+            state.next_send_at = now + self._send_interval()
+            return SendSlot(state.account, now, state.next_send_at)
+
+    def report(self, slot: SendSlot, success: bool) -> None:
+        """Record the outcome of a send made with a slot from ``acquire``."""
+        with self._lock:
+            state = self._state_for(slot.account)
+            if success:
+                state.consecutive_failures = 0
+                if state.next_send_at == slot.paced_until:
+                    # The rest counts from the end of the send, not from the reservation
+                    state.next_send_at = self._clock() + (slot.paced_until - slot.reserved_at)
+                return
+            # A failed send did not reach the provider; give the slot back
+            self._give_back(state, slot)
+            state.consecutive_failures += 1
+            if state.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+                state.cooldown_until = self._clock() + FAILURE_COOLDOWN_SECONDS
+                logger.warning(
+                    f"Sender {_account_label(slot.account)} failed {state.consecutive_failures} times in a row, "
+                    f"pausing it for {FAILURE_COOLDOWN_SECONDS // 60} minutes"
+                )
+
+    def release(self, slot: SendSlot) -> None:
+        """Give back a slot from ``acquire`` that was not used for a send (not counted as a failure)."""
+        with self._lock:
+            self._give_back(self._state_for(slot.account), slot)
+
+    @staticmethod
+    def _give_back(state: _AccountState, slot: SendSlot) -> None:
+        # The slot's own entry: other sends from the account may have been reserved since
+        try:
+            state.sent_at.remove(slot.reserved_at)
+        except ValueError:
+            pass  # already older than a day and pruned
+        # No email went out, so the account need not rest (unless a later slot set its own pace)
+        if state.next_send_at == slot.paced_until:
+            state.next_send_at = slot.reserved_at
+
+    def has_capacity(self) -> bool:
+        with self._lock:
+            now = self._clock()
+            for state in self._states:
+                state.prune(now)
+                if state.is_available(now):
+                    return True
+            return False
+
+    def seconds_until_capacity(self) -> float:
+        """Shortest quota/cooldown wait over all accounts (0 if one is free now)."""
+        with self._lock:
+            now = self._clock()
+            for state in self._states:
+                state.prune(now)
+            return min(state.seconds_until_available(now) for state in self._states)
+
+    def summary(self) -> List[str]:
+        with self._lock:
+            now = self._clock()
+            lines = []
+            for state in self._states:
+                state.prune(now)
+                lines.append(
+                    f"{_account_label(state.account)}: "
+                    f"{state.sent_last_hour(now)}/{state.hourly_limit} this hour, "
+                    f"{len(state.sent_at)}/{state.daily_limit} today"
+                )
+            return lines
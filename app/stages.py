@@ -0,0 +1,615 @@
+import json
+import time
+import logging
+import threading
+from typing import TYPE_CHECKING, List, Optional
+
+from config import (
+    MAIN_VENTURES_TABLE_ID, MAIN_INVESTORS_TABLE_ID, CONTENT_STORE_REUSE_HOURS, ROW_DEADLINE_RETRY_MINUTES
+)
+import db
+import scraper
+import openai_api
+import metrics
+import analytics
+from breaker import is_outage
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+from content_store import CONTENT_STORE, ContentStore
+from domain_index import DOMAIN_INDEX, DomainIndex, normalize_domain
+from deliverability import DELIVERABILITY, DeliverabilityChecker
+
+if TYPE_CHECKING:
+    from models import GPTOutput
+    from prompt_registry import PromptFile
+
+logger = logging.getLogger(__name__)
+
+MAIN_TABLE_KEYS = ['Name', 'Note3', 'Description', 'Website', 'Email', 'Location',
+                   'Total Funding Amount', 'LinkedIn', 'Phone', 'CB Rank', 'STATUS', 'Note1']
+# Websites rows are fetched with only the fields the stages read, which are the ones copied over
+ROW_FIELDS = MAIN_TABLE_KEYS
+
+MIN_WORDS = 10     # below this the row is skipped
+MAX_WORDS = 3000   # scraped text is trimmed to this before analysis
+MIN_SEND_SCORE = 7  # models.MIN_SEND_SCORE: the selected_email check uses the same threshold
+
+# Websites rows whose company is already in a main table get this STATUS and stay where they are
+DUPLICATE_STATUS = "Duplicate"
+# Rows whose selected address cannot receive mail (see deliverability) get this STATUS: they
+# keep their scores but are not emailed
+UNDELIVERABLE_STATUS = "Undeliverable"
+# Every STATUS the stages write; a STATUS select field needs an option for each
+STATUS_VALUES = ("Contacted", "not contacted yet", "Skipped", DUPLICATE_STATUS, UNDELIVERABLE_STATUS)
+
+# Routing values returned by the stage functions. ``None`` means the row is dropped
+# for this run and left untouched in the Websites table.
+ANALYZE = "analyze"
+SEND = "send"
+PERSIST = "persist"
+# The row hit a service outage: release it untouched so it is picked up again once the
+# service is back (unlike a dropped row, which waits for the next run)
+RETRY = "retry"
+# The row ran out of its time budget (``deadline``): released untouched like RETRY, but held
+# back for ROW_DEADLINE_RETRY_MINUTES so the same slow site does not come straight back
+DEADLINE = "deadline"
+# A row that runs out of time this many times is left for the next run
+MAX_DEADLINE_MISSES = 2
+
+
+class InfoTableCache:
+    """Info table rows by table id, re-read at most every ``ttl`` seconds. Shared by all campaigns."""
+
+    def __init__(self, ttl: float = 5 * 60):
+        self.ttl = ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, table_id) -> list:
+        with self._lock:
+            entry = self._entries.get(table_id)
+            hit = entry is not None and time.monotonic() - entry[0] <= self.ttl
+            metrics.cache_lookup("info_table", hit)
+            if not hit:
+                entry = (time.monotonic(), db._get_table_data(table_id))
+                self._entries[table_id] = entry
+            return entry[1]
+
+
+INFO_CACHE = InfoTableCache()
+
+
+class RunContext:
+    """The campaign settings shared by every row of one run."""
+
+    def __init__(self, mode, websites_table, info_table, prompts: "PromptFile",
+                 info_cache: InfoTableCache = INFO_CACHE, name: str = None,
+                 domain_index: Optional[DomainIndex] = DOMAIN_INDEX,
+                 content_store: Optional[ContentStore] = CONTENT_STORE,
+                 deliverability: Optional[DeliverabilityChecker] = DELIVERABILITY):
+        self.name = name or f"{mode} / table {websites_table}"
+        self.mode = mode
+        self.websites_table = websites_table
+        self.info_table = info_table
+        self.prompts = prompts
+        self.info_cache = info_cache
+        self.domain_index = domain_index
+        self.content_store = content_store
+        self.deliverability = deliverability
+        self._lock = threading.Lock()
+        self._dropped_ids = set()
+        self._held_until = {}
+        self._deadline_misses = {}
+
+    @property
+    def main_table(self):
+        return MAIN_VENTURES_TABLE_ID if self.mode == "Ventures" else MAIN_INVESTORS_TABLE_ID
+
+    def info_rows(self) -> list:
+        return self.info_cache.get(self.info_table)
+
+    def drop(self, row_id) -> None:
+        """Leave a row untouched for the rest of this run (it is retried on the next run)."""
+        metrics.count_row("dropped")
+        with self._lock:
+            self._dropped_ids.add(row_id)
+        self.release_claim(row_id)
+
+    def release_claim(self, row_id) -> None:
+        """Give back the domain-index claim of a row that is not written, so it is not taken for a duplicate."""
+        if self.domain_index is None:
+            return
+        try:
+            self.domain_index.release(row_id)
+        except Exception:
+            logger.exception(f"Row {row_id}: Failed to release domain index claim")
+
+    def dropped_ids(self) -> set:
+        with self._lock:
+            return set(self._dropped_ids)
+
+    def hold(self, row_id, seconds: float) -> None:
+        """Keep a row from being picked up again for ``seconds``."""
+        with self._lock:
+            self._held_until[row_id] = time.monotonic() + seconds
+
+    def held_ids(self) -> set:
+        """Rows not to pick up now: dropped ones and those still held back."""
+        now = time.monotonic()
+        with self._lock:
+            self._held_until = {row_id: until for row_id, until in self._held_until.items() if until > now}
+            return self._dropped_ids | set(self._held_until)
+
+    def deadline_missed(self, row_id) -> int:
+        """Count one more time ``row_id`` ran out of time; returns the count for this run."""
+        with self._lock:
+            self._deadline_misses[row_id] = self._deadline_misses.get(row_id, 0) + 1
+            return self._deadline_misses[row_id]
+
+
+class RowWork:
+    """A Websites-table row moving through the stages, with everything learned about it so far."""
+
+    def __init__(self, row: dict, deadline: Optional[Deadline] = None):
+        self.row = row
+        self.row_id = row.get("id")
+        # Every call made for the row takes its timeout from this budget
+        self.deadline = deadline if deadline is not None else Deadline()
+        self.scraped_text = ""
+        self.emails: List[str] = []
+        self.row_email = row.get("Email", "")
+        self.gpt_json = None
+        self.validated_output: Optional["GPTOutput"] = None
+        self.prompt_version: Optional[str] = None
+        self.email_data: Optional[dict] = None
+        self.status: Optional[str] = None
+        self.note3: Optional[str] = None
+        self.selected_email: Optional[str] = None
+        self.mark_skipped = False
+
+
+def _archived_content(ctx: RunContext, url: str) -> Optional[dict]:
+    if ctx.content_store is None or not CONTENT_STORE_REUSE_HOURS:
+        return None
+    try:
+        return ctx.content_store.get(url, max_age=CONTENT_STORE_REUSE_HOURS * 60 * 60)
+    except Exception:
+        logger.exception(f"Content store lookup failed for {url}")
+        return None
+
+
+def _archive_content(ctx: RunContext, url: str, scraped_text: str, emails) -> None:
+    if ctx.content_store is None or not scraped_text or scraped_text.startswith("ERROR"):
+        return
+    try:
+        ctx.content_store.put(url, scraped_text, emails)
+    except Exception:
+        logger.exception(f"Failed to archive content for {url}")
+
+
+def check_status_options(ctx: RunContext) -> List[str]:
+    """
+    Warn about STATUS values the Websites or main table cannot store: when STATUS is a select
+    field, Baserow rejects a value it has no option for. Returns the missing ``table: value``s.
+    """
+    missing = []
+    for table_id in (ctx.websites_table, ctx.main_table):
+        for value in db.SCHEMAS.table(table_id).missing_options("STATUS", STATUS_VALUES):
+            logger.warning(f"STATUS field of table {table_id} has no {value!r} option; writes of it will fail")
+            print(f"Warning: add a {value!r} option to the STATUS field of table {table_id}.")
+            missing.append(f"{table_id}: {value}")
+    return missing
+
+
+def retry_later(work: RowWork, ctx: RunContext) -> str:
+    """Route ``work`` to RETRY, giving back its domain-index claim so it is not taken for a duplicate."""
+    ctx.release_claim(work.row_id)
+    return RETRY
+
+
+def out_of_time(work: RowWork, ctx: RunContext, stage: str) -> Optional[str]:
+    """
+    Route ``work`` to DEADLINE: released untouched and held back for a while, or dropped for
+    the rest of the run (``None``) once it has run out of time ``MAX_DEADLINE_MISSES`` times.
+    """
+    misses = ctx.deadline_missed(work.row_id)
+    metrics.count_outcome("row_deadline", stage)
+    retry_later(work, ctx)
+    if misses >= MAX_DEADLINE_MISSES:
+        logger.warning(f"Row {work.row_id}: Out of time in {stage} stage again ({work.deadline.seconds:g}s), "
+                       f"leaving it for the next run.")
+        print(f"Row {work.row_id}: Out of time again, leaving it for the next run.")
+        return None
+    logger.warning(f"Row {work.row_id}: Out of time in {stage} stage ({work.deadline.seconds:g}s), "
+                   f"will retry in {ROW_DEADLINE_RETRY_MINUTES:.0f} minutes.")
+    print(f"Row {work.row_id}: Out of time in {stage} stage, will retry later.")
+    metrics.count_row("deadline")
+    ctx.hold(work.row_id, ROW_DEADLINE_RETRY_MINUTES * 60)
+    return DEADLINE
+
+
+def scrape_row(work: RowWork, ctx: RunContext) -> Optional[str]:
+    row, row_id = work.row, work.row_id
+    url = row.get("Website")
+
+    if not url:
+        logger.warning(f"Row {row_id}: No website provided.")
+        print(f"Row {row_id}: No website provided.")
+        return None
+
+    if ctx.domain_index is not None:
+        try:
+            known_as = ctx.domain_index.claim(row)
+        except Exception:
+            logger.exception(f"Row {row_id}: Domain index lookup failed, processing anyway")
+            known_as = None
+        if known_as:
+            logger.info(f"Row {row_id}: {known_as} is already in a main table or being processed, skipping.")
+            print(f"Row {row_id}: {known_as} already processed, skipping.")
+            work.status = DUPLICATE_STATUS
+            work.mark_skipped = True
+            return PERSIST
+
+    archived = _archived_content(ctx, url)
+    if archived:
+        logger.info(f"Row {row_id}: Using archived content for {url}")
+        print(f"Row {row_id}: Using archived content for {url}")
+        scraped_text, emails = archived["text"], archived["emails"]
+    else:
+        logger.info(f"Row {row_id}: Scraping {url}")
+        print(f"Row {row_id}: Scraping {url}")
+        try:
+            scraped_text, emails = scraper.scrape_website(url, work.deadline)
+        except DeadlineExceeded:
+            return out_of_time(work, ctx, "scrape")
+        except Exception as e:
+            logger.exception(f"Row {row_id}: Scraping failed for {url}")
+            print(f"Scraping failed: {e}")
+            return None
+        _archive_content(ctx, url, scraped_text, emails)
+
+    if not scraped_text or (isinstance(scraped_text, str) and scraped_text.startswith("ERROR")):
+        logger.warning(f"Row {row_id}: Scraping failed. Using Description field.")
+        scraped_text = row.get("Description", "")
+
+    word_count = len(scraped_text.split())
+
+    if word_count < MIN_WORDS:
+        logger.warning(f"Row {row_id}: Scraped content too short ({word_count} words), using Description.")
+        scraped_text = row.get("Description", "") or ""
+        word_count = len(scraped_text.split())
+        if word_count < MIN_WORDS:
+            logger.warning(f"Row {row_id}: Description also too short ({word_count} words).")
+            print("No sufficient text available for analysis.")
+            work.status = "Skipped"
+            work.mark_skipped = True
+            return PERSIST
+    elif word_count > MAX_WORDS:
+        logger.info(f"Row {row_id}: Trimming scraped content from {word_count} to {MAX_WORDS} words.")
+        scraped_text = " ".join(scraped_text.split()[:MAX_WORDS])
+
+    work.scraped_text = scraped_text
+    work.emails = emails
+    if ctx.deliverability is not None and (emails or work.row_email):
+        # GPT only gets to choose between addresses that can receive mail. A row left with none
+        # is still analyzed, like a row that had none to begin with, so its scores are recorded
+        try:
+            work.emails = ctx.deliverability.deliverable(emails, work.deadline)
+            if work.row_email and ctx.deliverability.check(work.row_email, work.deadline):
+                work.row_email = ""
+        except DeadlineExceeded:
+            return out_of_time(work, ctx, "scrape")
+        if not work.emails and not work.row_email:
+            logger.info(f"Row {row_id}: No deliverable email address; analyzing for scores only.")
+    return ANALYZE
+
+
+def cannot_fit(matches: List[dict]) -> bool:
+    """True when no score in GPT's raw ``matches`` reaches MIN_SEND_SCORE, so no email will be sent."""
+    try:
+        return all(int(match["score"]) < MIN_SEND_SCORE for match in matches)
+    except (TypeError, KeyError, ValueError):
+        # Malformed matches: let GPT finish, the full answer is validated as usual
+        return False
+
+
+def analyze_row(work: RowWork, ctx: RunContext) -> Optional[str]:
+    # pydantic/email-validator are imported on first use to keep startup fast
+    from pydantic import ValidationError
+    from models import parse_gpt_output
+
+    row, row_id = work.row, work.row_id
+
+    try:
+        relevant_data = ctx.info_rows()
+    except Exception as e:
+        logger.exception("Failed to load info table data")
+        print(f"Error loading info table: {e}")
+        return retry_later(work, ctx) if is_outage(e) else None
+
+    logger.info(f"Row {row_id}: Analyzing with GPT...")
+    print(f"Row {row_id}: Analyzing with GPT...")
+    prompts = ctx.prompts.current()
+    work.prompt_version = prompts.version
+    try:
+        gpt_result = openai_api.ask_gpt_about_company(
+            work.scraped_text,
+            work.emails,
+            work.row_email,
+            ctx.mode,
+            relevant_data,
+            row.get("Location", ""),
+            row.get("Total Funding Amount", ""),
+            prompts,
+            work.deadline,
+            stop_when=cannot_fit
+        )
+    except DeadlineExceeded:
+        return out_of_time(work, ctx, ANALYZE)
+    except Exception as e:
+        if is_outage(e):
+            # Never recorded as a result; the row is analyzed again once OpenAI is back
+            logger.warning(f"Row {row_id}: OpenAI unavailable ({e}), will retry.")
+            print(f"Row {row_id}: OpenAI unavailable, will retry.")
+            return retry_later(work, ctx)
+        logger.exception(f"Row {row_id}: GPT analysis failed.")
+        print(f"GPT analysis failed: {e}")
+        return None
+
+    # Parse and validate GPT output in one pass (JSON string or dict)
+    try:
+        validated_output = parse_gpt_output(gpt_result)
+    except (ValidationError, TypeError) as e:
+        logger.error(f"Row {row_id}: GPT output validation failed: {e}")
+        print(f"GPT output validation failed: {e}")
+        # Keep whatever GPT returned for later inspection
+        fallback_json = gpt_result if isinstance(gpt_result, dict) else {"raw_output": gpt_result}
+        fallback_json = {**fallback_json, "prompt_version": prompts.version}
+        work.status = "Skipped"
+        work.note3 = json.dumps(fallback_json, ensure_ascii=False)
+        return PERSIST
+
+    # Stored with the scores (Note3, analytics) so results of different prompt versions can be told apart
+    validated_output.prompt_version = prompts.version
+    work.gpt_json = validated_output.model_dump()
+    work.validated_output = validated_output
+    work.selected_email = validated_output.selected_email
+    # Serialized once from the validated model; the Websites row and the main-table row share it
+    work.note3 = validated_output.model_dump_json()
+
+    score = max((match.score for match in validated_output.matches), default=0)
+    logger.info(f"Row {row_id}: Highest score from matches: {score}")
+    print(f"Row {row_id}: Highest score from matches: {score}")
+
+    should_send_email = (
+        score >= MIN_SEND_SCORE and
+        validated_output.selected_email.strip() and
+        validated_output.subject.strip() and
+        validated_output.email_body.strip()
+    )
+
+    if should_send_email and ctx.deliverability is not None:
+        try:
+            reason = ctx.deliverability.check(validated_output.selected_email, work.deadline)
+        except DeadlineExceeded:
+            return out_of_time(work, ctx, ANALYZE)
+        if reason:
+            # Scores are kept; only the send is not spent on an address that would bounce
+            logger.warning(f"Row {row_id}: Selected email {validated_output.selected_email} rejected ({reason}), "
+                           f"marking as {UNDELIVERABLE_STATUS}.")
+            print(f"Row {row_id}: Selected email rejected ({reason}), not sending.")
+            work.status = UNDELIVERABLE_STATUS
+            return PERSIST
+
+    if should_send_email:
+        logger.info(f"Row {row_id}: Score >=7 and valid email fields present, queueing email...")
+        print(f"Row {row_id}: Score >=7 and valid email fields present, queueing email...")
+        work.email_data = {
+            "selected_email": validated_output.selected_email,
+            "subject": validated_output.subject,
+            "email_body": validated_output.email_body
+        }
+        return SEND
+
+    work.status = "not contacted yet"
+    logger.info(f"Row {row_id}: Score below 7 or missing email fields, marking as {work.status}.")
+    print(f"Row {row_id}: Score below 7 or missing email fields, marking as {work.status}.")
+    return PERSIST
+
+
+def record_send_result(work: RowWork, success: bool, msg: str) -> None:
+    if success:
+        work.status = "Contacted"
+        logger.info(f"Row {work.row_id}: Email sent, marking as {work.status}.")
+        print(f"Row {work.row_id}: Email sent, marking as {work.status}.")
+    else:
+        work.status = "not contacted yet"
+        logger.error(f"Row {work.row_id}: Email failed to send: {msg}")
+        print(f"Email sending failed: {msg}")
+
+
+def _websites_update(work: RowWork) -> dict:
+    item = {"id": work.row_id, "STATUS": work.status}
+    if work.mark_skipped:
+        item["Skipped"] = True
+    if work.note3:
+        item["Note3"] = work.note3
+    return item
+
+
+def build_main_row(work: RowWork, mode: str) -> dict:
+    """The main Ventures/Investors table row for a finished Websites row."""
+    complete_row = {key: work.row.get(key) for key in MAIN_TABLE_KEYS}
+
+    # Overwrite Email with the GPT-selected address if available
+    if work.selected_email:
+        complete_row['Email'] = work.selected_email
+
+    if mode == "Investors":
+        complete_row.pop("Total Funding Amount", None)
+
+    if isinstance(work.status, str):
+        complete_row["STATUS"] = [work.status]
+    return complete_row
+
+
+def _count_row(work: RowWork) -> None:
+    metrics.count_row(work.status)
+
+
+def _record_scores(works: List[RowWork], ctx: RunContext) -> None:
+    analytics.record_safely(
+        record for work in works if work.gpt_json
+        for record in analytics.match_rows(work.gpt_json, work.row, ctx.mode, work.status)
+    )
+
+
+def _index_row(ctx: RunContext, work: RowWork, main_row: dict) -> None:
+    # The Websites row too: its Email may differ from the GPT-selected one in the main row
+    if ctx.domain_index is not None:
+        ctx.domain_index.add(main_row)
+        ctx.domain_index.add(work.row)
+
+
+def persist_row(work: RowWork, ctx: RunContext) -> bool:
+    """Write one row's outcome: status/Note3 on the Websites row, copy to the main table, delete."""
+    row_id = work.row_id
+    # An emailed row is always recorded (released, it would be emailed again). Otherwise the
+    # row's budget covers the first write; once STATUS is set the rest are finished regardless,
+    # as a row with a STATUS is never picked up again
+    deadline = NO_DEADLINE if work.status == "Contacted" else work.deadline
+    try:
+        db.update_cell(ctx.websites_table, row_id, "STATUS", work.status, deadline=deadline)
+        if work.mark_skipped:
+            db.update_cell(ctx.websites_table, row_id, "Skipped", True)
+        if work.note3:
+            work.row['Note3'] = work.note3
+            db.update_cell(ctx.websites_table, row_id, "Note3", work.note3)
+
+        if work.status == DUPLICATE_STATUS:
+            # Already in a main table: only the status is recorded, the row is kept
+            _count_row(work)
+            return True
+
+        main_row = build_main_row(work, ctx.mode)
+        new_row = db.create_main_table_row(table_id=ctx.main_table, row_data=main_row)
+        _index_row(ctx, work, main_row)
+        logger.info(f"Row {row_id}: Successfully created in main {ctx.mode} table with ID {new_row.get('id')}")
+
+        db.delete_row(ctx.websites_table, row_id)
+        logger.info(f"Row {row_id}: Deleted from outreach table")
+        print(f"Row {row_id} processed successfully.")
+        _count_row(work)
+        _record_scores([work], ctx)
+        return True
+    except DeadlineExceeded:
+        if out_of_time(work, ctx, PERSIST) is None:
+            ctx.drop(row_id)
+        return False
+    except Exception as e:
+        logger.exception(f"Row {row_id}: Failed during final processing steps")
+        print(f"Failed during final processing: {e}")
+        ctx.release_claim(row_id)
+        return False
+
+
+def _not_in_main_table(works: List[RowWork], ctx: RunContext) -> List[RowWork]:
+    """``works`` whose domain is not in the main table yet (their domain-index claim kept others out)."""
+    present = {normalize_domain(r.get("Website")) for r in db.iter_rows(ctx.main_table, include=("Website",))}
+    return [work for work in works if normalize_domain(work.row.get("Website")) not in present]
+
+
+def persist_rows(works: List[RowWork], ctx: RunContext) -> None:
+    """
+    Batched ``persist_row`` for many rows: one batch update, one batch create and one
+    batch delete. If a batch call fails, that step falls back to per-row calls so a single
+    bad row cannot block the others, and a row only moves on once its previous step succeeded.
+    Rows a failed batch create wrote after all are found in the main table and not posted again.
+    """
+    if len(works) == 1:
+        persist_row(works[0], ctx)
+        return
+
+    # 1. Status/Note3 on the Websites rows
+    try:
+        db.update_rows(ctx.websites_table, [_websites_update(w) for w in works])
+        updated = list(works)
+    except Exception as e:
+        logger.warning(f"Batch update of {len(works)} rows failed ({e}), retrying row by row")
+        updated = []
+        for work in works:
+            try:
+                item = _websites_update(work)
+                for field, value in item.items():
+                    if field != "id":
+                        db.update_cell(ctx.websites_table, work.row_id, field, value)
+                updated.append(work)
+            except Exception:
+                logger.exception(f"Row {work.row_id}: Failed during final processing steps")
+                ctx.release_claim(work.row_id)
+    for work in updated:
+        if work.note3:
+            work.row['Note3'] = work.note3
+        if work.status == DUPLICATE_STATUS:
+            _count_row(work)
+    updated = [w for w in updated if w.status != DUPLICATE_STATUS]
+    if not updated:
+        return
+
+    # 2. Copy into the main table
+    try:
+        main_rows = [build_main_row(w, ctx.mode) for w in updated]
+        new_rows = db.create_main_table_rows(ctx.main_table, main_rows)
+        created = list(updated)
+        for work, main_row in zip(updated, main_rows):
+            _index_row(ctx, work, main_row)
+        for work, new_row in zip(updated, new_rows):
+            logger.info(f"Row {work.row_id}: Successfully created in main {ctx.mode} table with ID {new_row.get('id')}")
+    except Exception as e:
+        logger.warning(f"Batch create of {len(updated)} rows failed ({e}), retrying row by row")
+        created = []
+        try:
+            # Batch creates are not idempotent: earlier chunks, or the failed one before the
+            # client gave up, may have been written. Only post what is not in the table yet
+            missing = _not_in_main_table(updated, ctx)
+        except Exception:
+            logger.exception(f"Could not check which of {len(updated)} rows were created; not retrying them")
+            missing = []
+            for work in updated:
+                ctx.release_claim(work.row_id)
+        else:
+            for work in updated:
+                if work in missing:
+                    continue
+                logger.info(f"Row {work.row_id}: Created in main {ctx.mode} table by the failed batch")
+                _index_row(ctx, work, build_main_row(work, ctx.mode))
+                created.append(work)
+        for work in missing:
+            try:
+                main_row = build_main_row(work, ctx.mode)
+                new_row = db.create_main_table_row(table_id=ctx.main_table, row_data=main_row)
+                _index_row(ctx, work, main_row)
+                logger.info(f"Row {work.row_id}: Successfully created in main {ctx.mode} table with ID {new_row.get('id')}")
+                created.append(work)
+            except Exception:
+                logger.exception(f"Row {work.row_id}: Failed during final processing steps")
+                ctx.release_claim(work.row_id)
+
+    # 3. Remove from the Websites table
+    try:
+        db.delete_rows(ctx.websites_table, [w.row_id for w in created])
+        deleted = list(created)
+    except Exception as e:
+        logger.warning(f"Batch delete of {len(created)} rows failed ({e}), retrying row by row")
+        deleted = []
+        for work in created:
+            try:
+                db.delete_row(ctx.websites_table, work.row_id)
+                deleted.append(work)
+            except Exception:
+                logger.exception(f"Row {work.row_id}: Failed during final processing steps")
+
+    for work in deleted:
+        logger.info(f"Row {work.row_id}: Deleted from outreach table")
+        print(f"Row {work.row_id} processed successfully.")
+        _count_row(work)
+    _record_scores(deleted, ctx)
@@ -0,0 +1,133 @@
+"""
+Startup timing and warm-up.
+
+Heavy libraries (openai, bs4, pydantic) are imported on first use rather than at startup.
+``start`` loads them and opens authenticated connections to Baserow, OpenAI and every SMTP
+account on background threads, all at once, while the operator is still answering the
+setup prompts; ``WarmUp.finish`` waits for whatever is left and prints where startup time
+went. The first row then runs against warm connection pools instead of paying for them.
+"""
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Never hold up the start of processing longer than this for a slow warm-up
+FINISH_TIMEOUT = 30
+MAX_THREADS = 8
+
+
+class StartupReport:
+    """Named durations, from process start (roughly: the first import of this module) to the first row."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._entries: List[tuple] = []
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self._entries.append((name, seconds))
+
+    def mark(self, name: str) -> float:
+        """Record the time elapsed since start under ``name``."""
+        elapsed = time.perf_counter() - self.started
+        self.record(name, elapsed)
+        return elapsed
+
+    def summary(self) -> str:
+        with self._lock:
+            entries = list(self._entries)
+        return ", ".join(f"{name} {seconds:.2f}s" for name, seconds in entries)
+
+    def log(self) -> None:
+        logger.info(f"Startup: {self.summary()}")
+        print(f"Startup: {self.summary()}")
+
+
+REPORT = StartupReport()
+
+
+def _import_parsers() -> None:
+    import models  # pydantic + email-validator
+    import html_parse
+    html_parse.POOL.warm_up()  # bs4, and the parsing processes
+
+
+class WarmUp:
+    def __init__(self, tasks: Dict[str, Callable[[], None]], report: StartupReport = REPORT):
+        self.report = report
+        self._pool = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="warm-up")
+        self._futures = {}
+        for name, fn in tasks.items():
+            self.add(name, fn)
+
+    def add(self, name: str, fn: Callable[[], None]) -> None:
+        if name not in self._futures:
+            self._futures[name] = self._pool.submit(self._run, name, fn)
+
+    def add_context(self, ctx) -> None:
+        """
+        Once a campaign is chosen: its tables' schemas, its Info table, the domain index, the
+        content archive and the DNS resolver.
+        """
+        import db
+        import stages
+        tables = [ctx.websites_table, ctx.info_table, ctx.main_table]
+
+        def schemas():
+            db.SCHEMAS.load(tables)
+            stages.check_status_options(ctx)
+
+        self.add(f"table schemas ({ctx.name})", schemas)
+        self.add(f"info table ({ctx.name})", ctx.info_rows)
+        if ctx.domain_index is not None:
+            self.add("domain index", ctx.domain_index.load)
+        if ctx.content_store is not None:
+            self.add("content store", ctx.content_store.stats)
+        if ctx.deliverability is not None:
+            self.add("deliverability", ctx.deliverability.warm_up)
+
+    def _run(self, name: str, fn: Callable[[], None]) -> bool:
+        started = time.perf_counter()
+        try:
+            fn()
+            ok = True
+        except Exception as e:
+            # Not fatal: the row that needs the service retries (and the breakers handle outages)
+            logger.warning(f"Warm-up of {name} failed: {e}")
+            print(f"Warm-up of {name} failed: {e}")
+            ok = False
+        self.report.record(f"{name} {'warm' if ok else 'FAILED'} in", time.perf_counter() - started)
+        return ok
+
+    def finish(self, timeout: float = FINISH_TIMEOUT) -> None:
+        """Wait for the remaining warm-up tasks (at most ``timeout`` seconds), then log the report."""
+        started = time.perf_counter()
+        _, pending = wait(self._futures.values(), timeout=timeout)
+        for name, future in self._futures.items():
+            if future in pending:
+                logger.warning(f"Warm-up of {name} still running after {timeout:.0f}s, starting anyway")
+        self._pool.shutdown(wait=False)
+        self.report.record("waited for warm-up", time.perf_counter() - started)
+        self.report.mark("first row after")
+        self.report.log()
+
+
+def start(sender_accounts: List[dict] = (), baserow: bool = True) -> WarmUp:
+    """Warm everything the first row will touch, concurrently."""
+    # Imported here so REPORT starts counting before these (and their dependencies) load
+    import db
+    import openai_api
+    import email_sender
+
+    tasks = {"parsers": _import_parsers, "openai": openai_api.warm_up}
+    if baserow:
+        tasks["baserow"] = db.warm_up
+    for account in sender_accounts:
+        tasks[f"smtp {account.get('email')}"] = lambda account=account: email_sender.warm_up(account)
+    REPORT.mark("imports")
+    return WarmUp(tasks)
@@ -0,0 +1,151 @@
+import time
+from datetime import datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
+
+import pytz
+
+DEFAULT_TIMEZONE = "Europe/Paris"  # CET with DST awareness
+
+# How far ahead to look for the next active hour (a little over a week)
+_LOOKAHEAD_DAYS = 8
+
+
+def parse_windows(text: str) -> List[Tuple[int, int]]:
+    """
+    Parse ``"9-12,14-18"`` into ``[(9, 12), (14, 18)]``. A window whose start and end are the
+    same hour (``"0-0"``) covers the whole day, as in ``WorkingHours``. Raises ValueError on bad input.
+    """
+    windows = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        start, end = int(start), int(end)
+        if not (0 <= start <= 23 and 0 <= end <= 23):
+            raise ValueError(f"Invalid window: {part}")
+        windows.append((start, end))
+    if not windows:
+        raise ValueError("No working windows given")
+    return windows
+
+
+def format_windows(windows: Sequence[Tuple[int, int]]) -> str:
+    return ", ".join(f"{start}:00 to {end}:00" for start, end in windows)
+
+
+class WorkingHours:
+    """
+    A weekly calendar of active hours in one timezone.
+
+    ``windows`` is a list of ``(start_hour, end_hour)`` pairs; a window with
+    ``end_hour < start_hour`` spans midnight (e.g. 22-6). A moment is active when its
+    local weekday is a working day and its local hour falls in any window. Instead of
+    polling, callers ask for ``seconds_until_active()`` and sleep exactly that long.
+    """
+
+    def __init__(self, windows: Sequence[Tuple[int, int]], working_days: Sequence[str],
+                 timezone: str = DEFAULT_TIMEZONE):
+        self.windows = [(int(start), int(end)) for start, end in windows]
+        self.working_days = list(working_days)
+        self.timezone = timezone
+        self._tz = pytz.timezone(timezone)
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, WorkingHours):
+            return NotImplemented
+        return (self.windows, self.working_days, self.timezone) == (other.windows, other.working_days, other.timezone)
+
+    __hash__ = None
+
+    @classmethod
+    def from_account(cls, account: dict, default: "WorkingHours" = None) -> Optional["WorkingHours"]:
+        """
+        Build a sender account's own calendar from its SENDER_ACCOUNTS entry.
+
+        Supports ``active_windows`` (``[[9, 12], [14, 18]]`` or ``"9-12,14-18"``) or the
+        ``active_start_hour``/``active_end_hour`` pair, plus ``working_days`` and
+        ``timezone``. Returns ``default`` when the account defines none of these.
+        """
+        windows = account.get("active_windows")
+        if isinstance(windows, str):
+            windows = parse_windows(windows)
+        elif windows is None and account.get("active_start_hour") is not None and account.get("active_end_hour") is not None:
+            windows = [(account["active_start_hour"], account["active_end_hour"])]
+
+        days = account.get("working_days")
+        timezone = account.get("timezone")
+        if windows is None and days is None and timezone is None:
+            return default
+
+        if windows is None:
+            windows = default.windows if default else [(0, 0)]
+        if days is None:
+            days = default.working_days if default else ["Monday", "Tuesday", "Wednesday", "Thursday",
+                                                           "Friday", "Saturday", "Sunday"]
+        if timezone is None:
+            timezone = default.timezone if default else DEFAULT_TIMEZONE
+        return cls(windows, days, timezone)
+
+    def _in_window(self, hour: int) -> bool:
+        for start, end in self.windows:
+            if start == end:
+                return True  # whole day
+            if end > start:
+                if start <= hour < end:
+                    return True
+            elif hour >= start or hour < end:
+                # Overnight span (e.g. start=22, end=6)
+                return True
+        return False
+
+    def _localize(self, at) -> datetime:
+        if at is None:
+            return datetime.now(self._tz)
+        if isinstance(at, (int, float)):
+            return datetime.fromtimestamp(at, self._tz)
+        return at.astimezone(self._tz)
+
+    def is_active(self, at=None) -> bool:
+        now = self._localize(at)
+        return now.strftime("%A") in self.working_days and self._in_window(now.hour)
+
+    def next_active_start(self, at=None) -> Optional[datetime]:
+        """The next local hour boundary at which the calendar becomes active (DST aware)."""
+        now = self._localize(at)
+        start_date = now.date()
+        for day_offset in range(_LOOKAHEAD_DAYS):
+            day = start_date + timedelta(days=day_offset)
+            for hour in range(24):
+                naive = datetime(day.year, day.month, day.day, hour)
+                try:
+                    candidate = self._tz.localize(naive, is_dst=None)
+                except pytz.NonExistentTimeError:
+                    # Skipped by the spring-forward jump; the hour begins at the new offset
+                    candidate = self._tz.normalize(self._tz.localize(naive, is_dst=False))
+                except pytz.AmbiguousTimeError:
+                    candidate = self._tz.localize(naive, is_dst=True)
+                if candidate > now and self.is_active(candidate):
+                    return candidate
+        return None
+
+    def seconds_until_active(self, at=None) -> float:
+        """0 if active now, otherwise the exact wait until the next window opens (inf if never)."""
+        now = self._localize(at)
+        if self.is_active(now):
+            return 0.0
+        nxt = self.next_active_start(now)
+        if nxt is None:
+            return float("inf")
+        return max(0.0, (nxt - now).total_seconds())
+
+    def sleep_until_active(self, sleep=time.sleep, max_chunk: float = 60 * 60) -> None:
+        """Block until the calendar is active, re-checking the clock at most every ``max_chunk`` seconds."""
+        while True:
+            wait = self.seconds_until_active()
+            if wait <= 0:
+                return
+            sleep(min(wait, max_chunk))
+
+    def describe(self) -> str:
+        return f"{format_windows(self.windows)} ({self.timezone}), {', '.join(self.working_days)}"
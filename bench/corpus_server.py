@@ -0,0 +1,92 @@
+import os
+import re
+import time
+import random
+import zlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# Priority path -> corpus page; anything else under a site is a 404, like most real sites
+PAGE_FOR_PATH = {
+    "": "home.html",
+    "about": "about.html",
+    "about-us": "about.html",
+    "contact": "contact.html",
+    "contact-us": "contact.html",
+}
+
+SECTORS = ["fintech", "climate", "healthcare", "logistics", "energy storage", "agritech", "cybersecurity"]
+STAGES = ["seed-stage", "Series A", "Series B", "growth-stage"]
+
+
+def load_corpus(corpus_dir: str = CORPUS_DIR) -> dict:
+    pages = {}
+    for name in os.listdir(corpus_dir):
+        if name.endswith(".html"):
+            with open(os.path.join(corpus_dir, name), encoding="utf-8") as f:
+                pages[name] = f.read()
+    return pages
+
+
+def site_values(site: int) -> dict:
+    rnd = random.Random(site)
+    return {
+        "company": f"Company {site}",
+        "domain": f"company{site}.example",
+        "sector": rnd.choice(SECTORS),
+        "stage": rnd.choice(STAGES),
+        "year": str(rnd.randint(2008, 2023)),
+        "employees": str(rnd.randint(5, 400)),
+    }
+
+
+class _Server(ThreadingHTTPServer):
+    # socketserver's default backlog of 5 drops concurrent connects (a 1s SYN retry each),
+    # which no real web server does
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    pages: dict = {}
+    latency: float = 0.0
+    hits = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        type(self).hits += 1
+        m = re.fullmatch(r"/site(\d+)/?([\w-]*)/?", self.path.split("?")[0])
+        page = PAGE_FOR_PATH.get(m.group(2)) if m else None
+        if self.latency:
+            # Jitter keyed on the path so repeated runs see the same delays
+            time.sleep(self.latency * (0.5 + (zlib.crc32(self.path.encode()) % 100) / 100))
+        if page is None or page not in self.pages:
+            body = b"<html><body><h1>404 Not Found</h1></body></html>"
+            self.send_response(404)
+        else:
+            html = self.pages[page]
+            for key, value in site_values(int(m.group(1))).items():
+                html = html.replace("{" + key + "}", value)
+            body = html.encode("utf-8")
+            self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def site_url(server: ThreadingHTTPServer, site: int) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/site{site}/"
+
+
+def start(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, corpus_dir: str = CORPUS_DIR) -> ThreadingHTTPServer:
+    """Serve the recorded corpus as many synthetic sites: /site<N>/, /site<N>/about, /site<N>/contact, ..."""
+    handler = type("CorpusHandler", (_Handler,), {"pages": load_corpus(corpus_dir), "latency": latency})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="corpus-server", daemon=True).start()
+    return server
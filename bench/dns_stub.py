@@ -0,0 +1,56 @@
+import zlib
+import threading
+import socketserver
+
+import dns.flags
+import dns.rcode
+import dns.message
+import dns.rdatatype
+import dns.rrset
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Answers MX with ``mail.<name>`` and A with 127.0.0.1 for every name, except the dead ones (NXDOMAIN)."""
+
+    dead_share: float = 0.0
+    queries = 0
+
+    def _dead(self, name: str) -> bool:
+        # Keyed on the name so repeated runs see the same dead domains
+        return zlib.crc32(name.encode()) % 1000 < self.dead_share * 1000
+
+    def handle(self):
+        data, sock = self.request
+        type(self).queries += 1
+        try:
+            query = dns.message.from_wire(data)
+        except Exception:
+            return
+        response = dns.message.make_response(query)
+        response.flags |= dns.flags.RA
+        for question in query.question:
+            name = question.name.to_text().rstrip(".").lower()
+            if self._dead(name):
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            elif question.rdtype == dns.rdatatype.MX:
+                response.answer.append(dns.rrset.from_text(question.name, 300, "IN", "MX", f"10 mail.{name}."))
+            elif question.rdtype == dns.rdatatype.A:
+                response.answer.append(dns.rrset.from_text(question.name, 300, "IN", "A", "127.0.0.1"))
+        sock.sendto(response.to_wire(), self.client_address)
+
+
+class _Server(socketserver.ThreadingUDPServer):
+    daemon_threads = True
+
+
+def start(host: str = "127.0.0.1", port: int = 0, dead_share: float = 0.0) -> _Server:
+    """Local DNS server for the deliverability check; ``dead_share`` of domains do not exist."""
+    handler = type("DnsHandler", (_Handler,), {"dead_share": dead_share})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="dns-stub", daemon=True).start()
+    return server
+
+
+def nameserver(server: _Server) -> str:
+    host, port = server.server_address[:2]
+    return f"{host}:{port}"
@@ -0,0 +1,102 @@
+"""
+Micro-benchmark for handling one GPT response: fence stripping, parsing, validation and
+serializing Note3.
+
+    python bench/micro_parse.py [--iterations 20000] [--threads 1 16]
+
+Runs the recorded replay responses through the previous path (regex fence strip, json.loads,
+``GPTOutput(**data)`` with pydantic's ``EmailStr``, json.dumps) and the current one
+(``clean_json_output`` + ``models.parse_gpt_output`` + ``model_dump_json``), and reports CPU
+microseconds per row. With several threads the per-row CPU is what the analyze workers
+contend for under the GIL, so it bounds rows/second no matter how many workers there are.
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import threading
+from typing import List
+
+from pydantic import BaseModel, EmailStr
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "app"))
+
+import replay_llm
+import models
+from openai_api import clean_json_output
+
+
+class _LegacyGPTOutput(BaseModel):
+    matches: List[models.Match]
+    selected_email: EmailStr
+    subject: str
+    email_body: str
+
+
+def _legacy_clean(json_str: str) -> str:
+    json_str = re.sub(r'^\s*```json\s*', '', json_str, flags=re.IGNORECASE)
+    json_str = re.sub(r'^\s*```\s*', '', json_str, flags=re.IGNORECASE)
+    json_str = re.sub(r'\s*```\s*$', '', json_str, flags=re.IGNORECASE)
+    return json_str.strip()
+
+
+def legacy(raw: str):
+    data = json.loads(_legacy_clean(raw))
+    try:
+        _LegacyGPTOutput(**data)
+    except ValueError:
+        return None
+    return json.dumps(data, ensure_ascii=False)
+
+
+def current(raw: str):
+    try:
+        output = models.parse_gpt_output(clean_json_output(raw))
+    except ValueError:
+        return None
+    output.model_dump()  # what analytics gets
+    return output.model_dump_json()
+
+
+def cpu_per_row(fn, responses: List[str], iterations: int, threads: int) -> float:
+    """CPU microseconds per row with ``threads`` threads each handling ``iterations`` rows."""
+    def worker():
+        for i in range(iterations):
+            fn(responses[i % len(responses)])
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.process_time()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return (time.process_time() - started) / (iterations * threads) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="GPT output parsing micro-benchmark.")
+    parser.add_argument("--iterations", type=int, default=20000, help="Rows per thread")
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 16])
+    args = parser.parse_args()
+
+    responses = [r["content"] for r in replay_llm.load_responses()]
+    # Same accept/reject decision on every recorded response
+    for raw in responses:
+        assert (legacy(raw) is None) == (current(raw) is None), raw
+
+    for fn in (legacy, current):
+        cpu_per_row(fn, responses, 1000, 1)  # warm caches and imports
+
+    print(f"{'threads':>7}  {'legacy µs/row':>13}  {'current µs/row':>14}  {'saved':>6}")
+    for threads in args.threads:
+        before = cpu_per_row(legacy, responses, args.iterations, threads)
+        after = cpu_per_row(current, responses, args.iterations, threads)
+        print(f"{threads:>7}  {before:>13.1f}  {after:>14.1f}  {1 - after / before:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
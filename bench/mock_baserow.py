@@ -0,0 +1,205 @@
+import re
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+DEFAULT_PAGE_SIZE = 100
+
+
+class BaserowState:
+    """In-memory tables for the subset of the Baserow REST API that app/db.py uses."""
+
+    def __init__(self, database_id: int = 1):
+        self.database_id = database_id
+        self.lock = threading.Lock()
+        self.tables = {}       # table_id -> {"name": str, "rows": {row_id: row}}
+        self.fields = {}       # table_id -> [field dicts]
+        self.next_row_id = 1
+        self.next_field_id = 1
+        self.requests = 0
+
+    def add_table(self, table_id: int, name: str, field_names=()) -> None:
+        with self.lock:
+            self.tables[table_id] = {"name": name, "rows": {}}
+            self.fields[table_id] = []
+            for field_name in field_names:
+                self.fields[table_id].append({"id": self.next_field_id, "name": field_name, "type": "text",
+                                              "table_id": table_id, "primary": not self.fields[table_id]})
+                self.next_field_id += 1
+
+    def _ensure_fields(self, table_id, row: dict) -> None:
+        known = {f["name"] for f in self.fields[table_id]}
+        for name in row:
+            if name != "id" and name not in known and not name.startswith("field_"):
+                self.fields[table_id].append({"id": self.next_field_id, "name": name, "type": "text",
+                                              "table_id": table_id, "primary": False})
+                self.next_field_id += 1
+                known.add(name)
+
+    def _by_field_id(self, table_id, row: dict) -> dict:
+        """Translate ``field_<id>`` keys to field names; unknown ids are rejected like Baserow does."""
+        names = {f"field_{f['id']}": f["name"] for f in self.fields[table_id]}
+        unknown = [k for k in row if k.startswith("field_") and k not in names]
+        if unknown:
+            raise ValueError(f"Fields do not exist: {unknown}")
+        return {names.get(k, k): v for k, v in row.items()}
+
+    def as_response(self, table_id, row: dict, user_field_names: bool) -> dict:
+        """A stored row keyed the way the request asked: field names, or ``field_<id>`` (the default)."""
+        if user_field_names:
+            return dict(row)
+        keys = {f["name"]: f"field_{f['id']}" for f in self.fields[table_id]}
+        return {keys.get(k, k): v for k, v in row.items()}
+
+    def create(self, table_id, row: dict) -> dict:
+        with self.lock:
+            row = self._by_field_id(table_id, row)
+            self._ensure_fields(table_id, row)
+            row_id = self.next_row_id
+            self.next_row_id += 1
+            stored = {"id": row_id, "order": str(row_id), **{k: v for k, v in row.items() if k != "id"}}
+            self.tables[table_id]["rows"][row_id] = stored
+            return dict(stored)
+
+    def update(self, table_id, row_id, values: dict) -> dict:
+        with self.lock:
+            values = self._by_field_id(table_id, values)
+            self._ensure_fields(table_id, values)
+            row = self.tables[table_id]["rows"][row_id]
+            row.update({k: v for k, v in values.items() if k != "id"})
+            return dict(row)
+
+    def delete(self, table_id, row_id) -> None:
+        with self.lock:
+            del self.tables[table_id]["rows"][row_id]
+
+    def page(self, table_id, page: int, size: int, include=None, user_field_names: bool = False,
+             empty=()) -> dict:
+        """``include`` and ``empty`` (fields that must be empty) use the same keys as the response."""
+        with self.lock:
+            rows = [self.as_response(table_id, r, user_field_names) for r in self.tables[table_id]["rows"].values()]
+        for key in empty:
+            rows = [r for r in rows if r.get(key) in (None, "", [])]
+        start = (page - 1) * size
+        results = rows[start:start + size]
+        if include:
+            results = [{k: v for k, v in r.items() if k in include or k in ("id", "order")} for r in results]
+        return {
+            "count": len(rows),
+            "next": f"?page={page + 1}" if start + size < len(rows) else None,
+            "previous": None,
+            "results": results,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state: BaserowState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload=None) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}") if length else {}
+
+    def _route(self, method: str) -> None:
+        self.state.requests += 1
+        parsed = urlparse(self.path)
+        path = re.sub(r"/+", "/", parsed.path)
+        query = parse_qs(parsed.query, keep_blank_values=True)
+        user_field_names = query.get("user_field_names", ["false"])[0].lower() in ("true", "1")
+        state = self.state
+
+        try:
+            if method == "GET" and path == "/api/database/tables/all-tables/":
+                return self._send(200, [{"id": tid, "name": t["name"], "database_id": state.database_id}
+                                        for tid, t in state.tables.items()])
+
+            m = re.fullmatch(r"/api/database/fields/table/(\d+)/", path)
+            if m and method == "GET":
+                return self._send(200, state.fields[int(m.group(1))])
+
+            m = re.fullmatch(r"/api/database/rows/table/(\d+)/batch/", path)
+            if m:
+                table_id = int(m.group(1))
+                items = self._body().get("items", [])
+                if method == "POST":
+                    created = [state.create(table_id, item) for item in items]
+                    return self._send(200, {"items": [state.as_response(table_id, r, user_field_names)
+                                                      for r in created]})
+                if method == "PATCH":
+                    updated = [state.update(table_id, item["id"], item) for item in items]
+                    return self._send(200, {"items": [state.as_response(table_id, r, user_field_names)
+                                                      for r in updated]})
+
+            m = re.fullmatch(r"/api/database/rows/table/(\d+)/batch-delete/", path)
+            if m and method == "POST":
+                table_id = int(m.group(1))
+                for row_id in self._body().get("items", []):
+                    state.delete(table_id, row_id)
+                return self._send(204)
+
+            m = re.fullmatch(r"/api/database/rows/table/(\d+)/", path)
+            if m:
+                table_id = int(m.group(1))
+                if method == "GET":
+                    page = int(query.get("page", ["1"])[0])
+                    size = int(query.get("size", [str(DEFAULT_PAGE_SIZE)])[0])
+                    include = query.get("include", [None])[0]
+                    include = set(include.split(",")) if include else None
+                    empty = [m.group(1) for m in (re.fullmatch(r"filter__(.+)__empty", k) for k in query) if m]
+                    return self._send(200, state.page(table_id, page, size, include, user_field_names, empty))
+                if method == "POST":
+                    created = state.create(table_id, self._body())
+                    return self._send(200, state.as_response(table_id, created, user_field_names))
+
+            m = re.fullmatch(r"/api/database/rows/table/(\d+)/(\d+)/", path)
+            if m:
+                table_id, row_id = int(m.group(1)), int(m.group(2))
+                if method == "GET":
+                    with state.lock:
+                        row = state.tables[table_id]["rows"].get(row_id)
+                    if not row:
+                        return self._send(404, {"error": "ERROR_ROW_DOES_NOT_EXIST"})
+                    return self._send(200, state.as_response(table_id, row, user_field_names))
+                if method == "PATCH":
+                    updated = state.update(table_id, row_id, self._body())
+                    return self._send(200, state.as_response(table_id, updated, user_field_names))
+                if method == "DELETE":
+                    state.delete(table_id, row_id)
+                    return self._send(204)
+        except KeyError:
+            return self._send(404, {"error": "ERROR_ROW_DOES_NOT_EXIST"})
+        except ValueError as e:
+            return self._send(400, {"error": "ERROR_REQUEST_BODY_VALIDATION", "detail": str(e)})
+
+        self._send(404, {"error": f"Unhandled {method} {path}"})
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+def start(state: BaserowState, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    handler = type("BaserowHandler", (_Handler,), {"state": state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-baserow", daemon=True).start()
+    return server
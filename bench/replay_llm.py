@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import time
+import zlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RESPONSES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "replay", "responses.jsonl")
+# Streamed responses are sent in word/whitespace/punctuation pieces, roughly one token each
+_PIECES = re.compile(r"\w+|\s+|[^\w\s]")
+
+
+def load_responses(path: str = RESPONSES_PATH) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    responses: list = []
+    latency: float = 0.0
+    calls = 0
+    chunks = 0
+    cancelled = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Lets clients "warm up" against /models like they would against OpenAI
+        if self.path.rstrip("/").endswith("/models"):
+            return self._send_json(200, {"object": "list", "data": [{"id": "gpt-4.1", "object": "model"}]})
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            return self._send_json(404, {"error": {"message": "not found"}})
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        type(self).calls += 1
+
+        # Same prompt -> same recorded response, so runs are comparable
+        prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        recorded = self.responses[zlib.crc32(prompt.encode("utf-8")) % len(self.responses)]
+        if request.get("stream"):
+            return self._stream(request, recorded)
+        if self.latency:
+            time.sleep(self.latency)
+
+        self._send_json(200, {
+            "id": f"chatcmpl-replay-{self.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4.1"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": recorded["content"]},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(recorded),
+        })
+
+    def _stream(self, request: dict, recorded: dict) -> None:
+        """
+        Server-sent chunks like OpenAI's ``stream=True``, with ``latency`` spread over the pieces
+        so a client that stops reading early also finishes early. A client that closes the
+        connection is counted in ``cancelled``.
+        """
+        pieces = _PIECES.findall(recorded["content"])
+        base = {"id": f"chatcmpl-replay-{self.calls}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": request.get("model", "gpt-4.1")}
+        events = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece},
+                                        "finish_reason": None}]} for piece in pieces]
+        events.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append({**base, "choices": [], "usage": _usage(recorded)})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        # Each piece is due at a fixed time, so late wake-ups (the GIL, a busy CPU) do not add up
+        delay = self.latency / max(1, len(pieces))
+        started = time.monotonic()
+        try:
+            for i, event in enumerate(events):
+                wait = started + delay * min(i + 1, len(pieces)) - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self.wfile.write(b"data: " + json.dumps(event).encode("utf-8") + b"\n\n")
+                self.wfile.flush()
+                type(self).chunks += 1
+            self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            type(self).cancelled += 1
+
+
+def _usage(recorded: dict) -> dict:
+    return {
+        "prompt_tokens": recorded.get("prompt_tokens", 0),
+        "completion_tokens": recorded.get("completion_tokens", 0),
+        "total_tokens": recorded.get("prompt_tokens", 0) + recorded.get("completion_tokens", 0),
+    }
+
+
+def start(host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, responses_path: str = RESPONSES_PATH) -> ThreadingHTTPServer:
+    """OpenAI-compatible /v1/chat/completions that replays recorded responses."""
+    handler = type("ReplayHandler", (_Handler,), {"responses": load_responses(responses_path), "latency": latency})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="replay-llm", daemon=True).start()
+    return server
+
+
+def base_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/v1/"
@@ -0,0 +1,285 @@
+"""
+Offline end-to-end benchmark: no Baserow, OpenAI, SMTP or real websites needed.
+
+    python bench/run_bench.py --rows 2000 [--mode serial|pipeline] [--compare bench/results/<old>.json]
+
+Starts a mock Baserow server, an HTML corpus server, a replay LLM, an SMTP sink and a DNS
+server on localhost, points the app at them through a temporary config file, fills a Websites
+table with synthetic rows and processes all of them. Reports rows/hour and p50/p95
+per stage, and saves the results under bench/results/ keyed by git commit.
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+sys.path.insert(0, BENCH_DIR)
+
+import mock_baserow
+import corpus_server
+import replay_llm
+import smtp_sink
+import dns_stub
+
+WEBSITES_TABLE = 101
+INFO_TABLE = 102
+MAIN_VENTURES_TABLE = 201
+MAIN_INVESTORS_TABLE = 202
+DATABASE_ID = 1
+
+WEBSITE_FIELDS = ["Name", "Website", "Email", "Description", "Location", "Total Funding Amount",
+                  "LinkedIn", "Phone", "CB Rank", "STATUS", "Note1", "Note3", "Skipped", "x"]
+MAIN_FIELDS = ["Name", "Note3", "Description", "Website", "Email", "Location", "Total Funding Amount",
+               "LinkedIn", "Phone", "CB Rank", "STATUS", "Note1"]
+MANDATES = [
+    {"Name (Acronym)": "GTF", "Notes": "Growth-stage climate and energy transition fund, EUR 5-30m tickets, Europe"},
+    {"Name (Acronym)": "EIF", "Notes": "Early-stage fintech and cybersecurity investor, seed to Series A, EU and UK"},
+]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def start_stand_ins(args):
+    state = mock_baserow.BaserowState(DATABASE_ID)
+    state.add_table(WEBSITES_TABLE, "Websites", WEBSITE_FIELDS)
+    state.add_table(INFO_TABLE, "Mandates", ["Name (Acronym)", "Notes"])
+    state.add_table(MAIN_VENTURES_TABLE, "Ventures", MAIN_FIELDS)
+    state.add_table(MAIN_INVESTORS_TABLE, "Investors", MAIN_FIELDS)
+    for mandate in MANDATES:
+        state.create(INFO_TABLE, mandate)
+
+    sink = smtp_sink.SinkState()
+    servers = {
+        "baserow": mock_baserow.start(state),
+        "corpus": corpus_server.start(latency=args.site_latency),
+        "llm": replay_llm.start(latency=args.llm_latency),
+        "smtp": smtp_sink.start(sink),
+        "dns": dns_stub.start(dead_share=args.dead_domains),
+    }
+    return state, sink, servers
+
+
+def seed_rows(state, corpus, count: int, seed: int = 42) -> None:
+    rnd = random.Random(seed)
+    for i in range(1, count + 1):
+        values = corpus_server.site_values(i)
+        state.create(WEBSITES_TABLE, {
+            "Name": values["company"],
+            # A few rows without a website exercise the drop path
+            "Website": corpus_server.site_url(corpus, i) if rnd.random() > 0.02 else "",
+            "Email": f"info@{values['domain']}",
+            "Description": f"{values['company']} is a {values['stage']} {values['sector']} company.",
+            "Location": rnd.choice(["Paris, France", "Berlin, Germany", "London, UK", "Madrid, Spain"]),
+            "Total Funding Amount": str(rnd.randint(1, 50) * 1_000_000),
+        })
+
+
+def write_config(servers, sink_port: int, row_deadline: float = None, streaming: bool = True) -> str:
+    host, port = servers["baserow"].server_address[:2]
+    config = {
+        "OPENAI_API_KEY": "sk-replay",
+        "OPENAI_BASE_URL": replay_llm.base_url(servers["llm"]),
+        "OUTREACH_DATABASE_ID": str(DATABASE_ID),
+        "MAIN_VENTURES_TABLE_ID": MAIN_VENTURES_TABLE,
+        "MAIN_INVESTORS_TABLE_ID": MAIN_INVESTORS_TABLE,
+        "BASEROW_API_URL": f"http://{host}:{port}/",
+        "BASEROW_API_TOKEN": "bench",
+        "SENDER_ACCOUNTS": [{
+            "name": "Bench Sender",
+            "email": "bench@example.com",
+            "smtp_server": "127.0.0.1",
+            "smtp_port": sink_port,
+            "smtp_starttls": False,
+            "smtp_username": "bench@example.com",
+            "smtp_password": "bench",
+            "hourly_limit": 10 ** 9,
+            "daily_limit": 10 ** 9,
+        }],
+        "TEST_EMAIL_ADDRESS": "sink@example.com",
+        "TEST_MODE": True,
+        "METRICS_PORT": 0,
+        "METRICS_SUMMARY_PATH": "",
+        # Every corpus site is served from the same host, so domain de-duplication would skip
+        # them all and the content store would hand every row the first site's text
+        "DOMAIN_INDEX_ENABLED": False,
+        "CONTENT_STORE_ENABLED": False,
+        # ...and per-host politeness would serialize the whole corpus behind one host
+        "CRAWL_HOST_CONNECTIONS": 0,
+        "CRAWL_HOST_DELAY": 0,
+        "DELIVERABILITY_NAMESERVERS": [dns_stub.nameserver(servers["dns"])],
+        "GPT_STREAMING": streaming,
+    }
+    if row_deadline is not None:
+        config["ROW_DEADLINE_SECONDS"] = row_deadline
+    work_dir = tempfile.mkdtemp(prefix="atlantis-bench-")
+    config["ANALYTICS_DB_PATH"] = os.path.join(work_dir, "analytics.sqlite3")
+    config["ROBOTS_CACHE_PATH"] = os.path.join(work_dir, "robots_cache.json")
+    fd, path = tempfile.mkstemp(prefix="atlantis-bench-", suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        json.dump(config, f)
+    return path
+
+
+def run(args) -> dict:
+    state, sink, servers = start_stand_ins(args)
+    seed_rows(state, servers["corpus"], args.rows)
+    os.environ["ATLANTIS_CONFIG"] = write_config(servers, servers["smtp"].server_address[1], args.row_deadline,
+                                               not args.no_streaming)
+
+    # Import the app only now so it picks up the benchmark config
+    sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
+    import app
+    import stages
+    import metrics
+    import warmup
+    import crawler
+    from limiter import LIMITERS
+    from dispatcher import EmailDispatcher
+    from pipeline import Pipeline
+    from sender_scheduler import SenderScheduler
+    from working_hours import WorkingHours
+
+    logging.disable(logging.WARNING)
+    metrics.REGISTRY.reset()
+    prompts = app.load_prompts_from_file(os.path.join(ROOT_DIR, "prompts", "prompts.py"))
+    ctx = stages.RunContext("Ventures", WEBSITES_TABLE, INFO_TABLE, prompts)
+    scheduler = SenderScheduler(app.SENDER_ACCOUNTS)
+    always = WorkingHours([(0, 0)], app.WEEK_DAYS)
+
+    def remaining() -> int:
+        with state.lock:
+            rows = state.tables[WEBSITES_TABLE]["rows"]
+            return len(set(rows) - ctx.held_ids())
+
+    # Same warm-up as the app, outside the measured window
+    with contextlib.redirect_stdout(io.StringIO() if not args.verbose else sys.stdout):
+        warm = warmup.start(app.SENDER_ACCOUNTS)
+        warm.add_context(ctx)
+        warm.finish()
+
+    started = time.perf_counter()
+    fetches_before = crawler.SCHEDULER.fetches
+    with contextlib.redirect_stdout(io.StringIO() if not args.verbose else sys.stdout):
+        if args.mode == "serial":
+            dispatcher = EmailDispatcher(scheduler)
+            dispatcher.start()
+            while app.process_next_row(ctx, dispatcher):
+                pass
+            while dispatcher.pending() or dispatcher.in_flight_ids():
+                time.sleep(0.05)
+            dispatcher.stop(timeout=5)
+        else:
+            pipeline = Pipeline(ctx, scheduler, always, idle_delay=lambda: 0.2,
+                                scrape_workers=args.scrape_workers, analyze_workers=args.analyze_workers,
+                                persist_interval=0.5)
+            pipeline.start()
+            while remaining() or pipeline.in_flight():
+                time.sleep(0.1)
+            pipeline.stop()
+    elapsed = time.perf_counter() - started
+
+    summary = metrics.REGISTRY.summary()
+    processed = args.rows - remaining()
+    return {
+        "commit": git_commit(),
+        "mode": args.mode,
+        "rows": args.rows,
+        "processed": processed,
+        "dropped": len(ctx.dropped_ids()),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_hour": round(processed / elapsed * 3600, 1) if elapsed else 0.0,
+        "emails_sent": len(sink.messages),
+        "baserow_requests": state.requests,
+        "llm_calls": servers["llm"].RequestHandlerClass.calls,
+        "llm_chunks": servers["llm"].RequestHandlerClass.chunks,
+        "llm_cancelled": servers["llm"].RequestHandlerClass.cancelled,
+        "site_requests": servers["corpus"].RequestHandlerClass.hits,
+        "dns_queries": servers["dns"].RequestHandlerClass.queries,
+        "fetches_per_second": round((crawler.SCHEDULER.fetches - fetches_before) / elapsed, 1) if elapsed else 0.0,
+        "row_outcomes": summary["counters"].get(metrics.ROWS_TOTAL, {}),
+        "limits": {name: limiter.limit for name, limiter in LIMITERS.items()},
+        "startup": warmup.REPORT.summary(),
+        "stages": {
+            _stage_name(key): {"p50": round(v["p50"], 4), "p95": round(v["p95"], 4), "count": v["count"]}
+            for key, v in summary["latency"].get(metrics.STAGE_SECONDS, {}).items()
+        },
+        "settings": {k: getattr(args, k) for k in ("site_latency", "llm_latency", "row_deadline",
+                                                      "dead_domains", "no_streaming", "scrape_workers",
+                                                      "analyze_workers")},
+    }
+
+
+def _stage_name(label_str: str) -> str:
+    """``op=get_row,stage=baserow`` -> ``baserow:get_row``."""
+    labels = dict(part.split("=", 1) for part in label_str.split(",") if "=" in part)
+    stage = labels.pop("stage", "")
+    return ":".join([stage] + [labels[k] for k in sorted(labels)])
+
+
+def print_report(result: dict, baseline: dict = None) -> None:
+    print(f"commit {result['commit']}  mode={result['mode']}  rows={result['rows']}  processed={result['processed']}")
+    line = f"throughput: {result['rows_per_hour']:.0f} rows/hour in {result['elapsed_seconds']:.1f}s"
+    if baseline:
+        change = (result["rows_per_hour"] / baseline["rows_per_hour"] - 1) * 100 if baseline["rows_per_hour"] else 0
+        line += f"  ({change:+.1f}% vs {baseline['commit']})"
+    print(line)
+    print(f"emails sent: {result['emails_sent']}  baserow requests: {result['baserow_requests']}  "
+          f"llm calls: {result['llm_calls']} ({result.get('llm_cancelled', 0)} cancelled)  site requests: {result['site_requests']} "
+          f"({result.get('fetches_per_second', 0):.0f}/s)  dns queries: {result.get('dns_queries', 0)}")
+    print(f"{'stage':<40} {'count':>7} {'p50 ms':>9} {'p95 ms':>9}")
+    for stage, v in sorted(result["stages"].items()):
+        row = f"{stage:<40} {v['count']:>7} {v['p50'] * 1000:>9.1f} {v['p95'] * 1000:>9.1f}"
+        old = (baseline or {}).get("stages", {}).get(stage)
+        if old and old["p95"]:
+            row += f"  p95 {(v['p95'] / old['p95'] - 1) * 100:+.0f}%"
+        print(row)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark.")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--mode", choices=["serial", "pipeline"], default="serial")
+    parser.add_argument("--site-latency", type=float, default=0.0, help="Seconds added per page fetch")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added per LLM call")
+    parser.add_argument("--row-deadline", type=float, help="ROW_DEADLINE_SECONDS for the run (default: the app's)")
+    parser.add_argument("--dead-domains", type=float, default=0.0,
+                        help="Share of email domains the DNS stand-in reports as non-existent")
+    parser.add_argument("--no-streaming", action="store_true", help="Wait for whole GPT responses (GPT_STREAMING off)")
+    parser.add_argument("--scrape-workers", type=int, default=8)
+    parser.add_argument("--analyze-workers", type=int, default=4)
+    parser.add_argument("--output", help="Where to save results (default bench/results/<commit>-<mode>.json)")
+    parser.add_argument("--compare", help="A previous results file to compare against")
+    parser.add_argument("--verbose", action="store_true", help="Show the app's console output")
+    args = parser.parse_args(argv)
+
+    result = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{result['commit']}-{result['mode']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
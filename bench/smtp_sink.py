@@ -0,0 +1,85 @@
+import threading
+import socketserver
+
+
+class SinkState:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.messages = []  # (mail_from, rcpt_tos, data)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Just enough SMTP (EHLO/HELO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT) to accept smtplib sends."""
+
+    state: SinkState = None
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode("ascii"))
+
+    def handle(self):
+        self._reply("220 smtp-sink ready")
+        mail_from, rcpt_tos = None, []
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            line = raw.decode("utf-8", "replace").rstrip("\r\n")
+            command = line.split(" ", 1)[0].upper()
+
+            if command == "EHLO":
+                self._reply("250-smtp-sink")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 8BITMIME")
+            elif command == "HELO":
+                self._reply("250 smtp-sink")
+            elif command == "AUTH":
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].upper() == "LOGIN" and len(parts) == 2:
+                    self._reply("334 VXNlcm5hbWU6")
+                    self.rfile.readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif len(parts) >= 2 and parts[1].upper() == "LOGIN":
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif len(parts) == 2:
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif command == "MAIL":
+                mail_from, rcpt_tos = line[10:].strip(), []
+                self._reply("250 OK")
+            elif command == "RCPT":
+                rcpt_tos.append(line[8:].strip())
+                self._reply("250 OK")
+            elif command == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    data.append(chunk)
+                with self.state.lock:
+                    self.state.messages.append((mail_from, rcpt_tos, b"".join(data)))
+                self._reply("250 OK queued")
+            elif command in ("RSET", "NOOP"):
+                self._reply("250 OK")
+            elif command == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def start(state: SinkState, host: str = "127.0.0.1", port: int = 0) -> _Server:
+    """Local SMTP sink that accepts every message (use with ``"smtp_starttls": false``)."""
+    handler = type("SinkHandler", (_Handler,), {"state": state})
+    server = _Server((host, port), handler)
+    threading.Thread(target=server.serve_forever, name="smtp-sink", daemon=True).start()
+    return server
@@ -0,0 +1,38 @@
+"""
+The app's modules read config.json when they are imported, so the tests point ATLANTIS_CONFIG
+at a throwaway config (local files under a temp directory, no metrics endpoint, no DNS) before
+anything from app/ is imported, and put app/ on the path the way ``python app/app.py`` does.
+"""
+import os
+import sys
+import json
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORK_DIR = tempfile.mkdtemp(prefix="atlantis-tests-")
+
+_CONFIG = {
+    "OPENAI_API_KEY": "sk-test",
+    "BASEROW_API_URL": "http://127.0.0.1:9/",
+    "MAIN_VENTURES_TABLE_ID": 201,
+    "MAIN_INVESTORS_TABLE_ID": 202,
+    "METRICS_PORT": 0,
+    "METRICS_SUMMARY_PATH": "",
+    "LOG_PATH": os.path.join(WORK_DIR, "app.log"),
+    "DOMAIN_INDEX_PATH": os.path.join(WORK_DIR, "domain_index.json"),
+    "CONTENT_STORE_DIR": os.path.join(WORK_DIR, "content_store"),
+    "ROBOTS_CACHE_PATH": os.path.join(WORK_DIR, "robots_cache.json"),
+    "RESCORE_STATE_PATH": os.path.join(WORK_DIR, "rescore_state.json"),
+    "ANALYTICS_DB_PATH": os.path.join(WORK_DIR, "analytics.sqlite3"),
+    "PROFILES_DIR": os.path.join(WORK_DIR, "profiles"),
+    "PARSE_PROCESSES": 0,
+    "DELIVERABILITY_ENABLED": False,
+}
+
+if "ATLANTIS_CONFIG" not in os.environ:
+    _path = os.path.join(WORK_DIR, "config.json")
+    with open(_path, "w") as f:
+        json.dump(_CONFIG, f)
+    os.environ["ATLANTIS_CONFIG"] = _path
+
+sys.path.insert(0, os.path.join(ROOT_DIR, "app"))
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from breaker import CircuitBreaker, ServiceUnavailable, CLOSED, OPEN, HALF_OPEN, is_outage
+
+
+def _expire(b: CircuitBreaker) -> None:
+    """Pretend the open period has passed."""
+    b._opened_at -= b._open_for
+
+
+def _fail(b: CircuitBreaker) -> None:
+    with pytest.raises(ConnectionError):
+        with b.guard():
+            raise ConnectionError("refused")
+
+
+def _succeed(b: CircuitBreaker) -> None:
+    with b.guard():
+        pass
+
+
+def test_opens_after_consecutive_outages():
+    b = CircuitBreaker("test-open", failure_threshold=3, reset_timeout=30)
+    _fail(b)
+    _fail(b)
+    _succeed(b)  # resets the count
+    _fail(b)
+    _fail(b)
+    assert b.state == CLOSED
+    _fail(b)
+    assert b.state == OPEN
+    with pytest.raises(ServiceUnavailable) as info:
+        _succeed(b)
+    assert 0 < info.value.retry_in <= 30
+
+
+def test_errors_that_are_not_outages_do_not_count():
+    b = CircuitBreaker("test-not-outage", failure_threshold=1)
+    with pytest.raises(ValueError):
+        with b.guard():
+            raise ValueError("bad row")
+    with b.guard() as slot:
+        slot.status(404)
+    assert b.state == CLOSED
+    with b.guard() as slot:
+        slot.status(503)
+    assert b.state == OPEN
+
+
+def test_half_open_trial_closes_on_success():
+    b = CircuitBreaker("test-trial-ok", failure_threshold=1, reset_timeout=30)
+    _fail(b)
+    _expire(b)
+    with b.guard():
+        assert b.state == HALF_OPEN
+        # Only one trial call at a time
+        with pytest.raises(ServiceUnavailable):
+            _succeed(b)
+    assert b.state == CLOSED
+    assert b.retry_in() == 0
+
+
+def test_failed_trial_doubles_the_open_period():
+    b = CircuitBreaker("test-trial-fail", failure_threshold=1, reset_timeout=30, max_reset_timeout=100)
+    _fail(b)
+    for expected in (60, 100, 100):
+        _expire(b)
+        _fail(b)
+        assert b.state == OPEN and b._open_for == expected
+    _expire(b)
+    _succeed(b)
+    assert b.state == CLOSED and b._open_for == 30
+
+
+def test_wait_until_available_runs_the_probe():
+    probes = []
+
+    def probe():
+        probes.append(1)
+        return 503 if len(probes) == 1 else 200
+
+    b = CircuitBreaker("test-probe", failure_threshold=1, reset_timeout=0.05, probe=probe)
+    _fail(b)
+    assert b.wait_until_available(threading.Event(), poll=0.01)
+    assert b.state == CLOSED and len(probes) == 2
+
+
+def test_wait_until_available_without_probe_lets_the_next_call_try():
+    b = CircuitBreaker("test-no-probe", failure_threshold=1, reset_timeout=30)
+    _fail(b)
+    _expire(b)
+    assert b.wait_until_available(threading.Event())
+    _succeed(b)
+    assert b.state == CLOSED
+
+
+def test_wait_until_available_stops():
+    b = CircuitBreaker("test-stop", failure_threshold=1, reset_timeout=30)
+    _fail(b)
+    stop = threading.Event()
+    stop.set()
+    assert not b.wait_until_available(stop)
+
+
+def test_is_outage():
+    class SmtpReply(Exception):
+        def __init__(self, smtp_code):
+            self.smtp_code = smtp_code
+
+    class APIConnectionError(Exception):
+        pass
+
+    assert is_outage(ServiceUnavailable("x"))
+    assert is_outage(ConnectionRefusedError())
+    assert is_outage(APIConnectionError())
+    assert is_outage(SmtpReply(421)) and not is_outage(SmtpReply(550))
+    assert not is_outage(KeyError("x"))
@@ -0,0 +1,73 @@
+from content_store import ContentStore
+
+
+def _store(tmp_path, **kwargs):
+    return ContentStore(str(tmp_path), **kwargs)
+
+
+def test_put_get_round_trip(tmp_path):
+    store = _store(tmp_path)
+    store.put("https://www.acme.example/about", "Acme builds rockets", ["ceo@acme.example"])
+    record = store.get("http://acme.example")
+    assert record["text"] == "Acme builds rockets"
+    assert record["emails"] == ["ceo@acme.example"]
+    assert record["domain"] == "acme.example"
+    assert store.get("https://other.example") is None
+
+
+def test_max_age(tmp_path):
+    store = _store(tmp_path)
+    store.put("https://acme.example", "old text", [])
+    assert store.get("https://acme.example", max_age=60) is not None
+    assert store.get("https://acme.example", max_age=-1) is None
+
+
+def test_compact_keeps_latest_record_per_domain(tmp_path):
+    store = _store(tmp_path)
+    for i in range(3):
+        store.put("https://acme.example", f"version {i}", [])
+    store.put("https://beta.example", "beta", [])
+    before = store.stats()["bytes"]
+    store.compact()
+    assert store.stats()["bytes"] < before
+    assert store.get("https://acme.example")["text"] == "version 2"
+    assert store.get("https://beta.example")["text"] == "beta"
+
+    reopened = _store(tmp_path)
+    assert sorted(reopened.domains()) == ["acme.example", "beta.example"]
+    assert reopened.get("https://acme.example")["text"] == "version 2"
+
+
+def test_sees_records_appended_by_another_process(tmp_path):
+    first, second = _store(tmp_path), _store(tmp_path)
+    first.put("https://acme.example", "acme", [])
+    assert second.get("https://acme.example")["text"] == "acme"
+    second.put("https://beta.example", "beta", [])
+    assert first.get("https://beta.example")["text"] == "beta"
+
+
+def test_reloads_after_another_process_compacts(tmp_path):
+    first, second = _store(tmp_path), _store(tmp_path)
+    for i in range(20):
+        first.put(f"https://company{i}.example", f"company {i} " * 50, [])
+    first.put("https://company0.example", "company 0 again", [])
+    assert second.get("https://company5.example")["text"].startswith("company 5")
+
+    # Rewrites the data file: every offset the second store holds is now wrong
+    first.compact()
+    for i in range(20):
+        record = second.get(f"https://company{i}.example")
+        assert record["domain"] == f"company{i}.example"
+    assert second.get("https://company0.example")["text"] == "company 0 again"
+
+
+def test_record_for_another_domain_is_a_miss(tmp_path):
+    store = _store(tmp_path)
+    store.put("https://acme.example", "acme", [])
+    store.put("https://beta.example", "beta", [])
+    # A stale offset pointing at another company's record
+    store._index["acme.example"] = dict(store._index["beta.example"])
+    assert store.get("https://acme.example") is None
+    # ...and one pointing into the middle of a record
+    store._index["beta.example"] = {**store._index["beta.example"], "offset": 3}
+    assert store.get("https://beta.example") is None
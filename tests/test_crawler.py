@@ -0,0 +1,37 @@
+import time
+
+from crawler import CrawlScheduler
+
+
+def _wait_for(condition, timeout=2.0):
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_idle_hosts_are_forgotten_once_their_spacing_has_passed():
+    scheduler = CrawlScheduler(workers=4, connections=2, delay=0.3)
+    futures = [scheduler.submit(f"https://site{i}.example/", lambda url: url) for i in range(50)]
+    assert [f.result(2) for f in futures] == [f"https://site{i}.example/" for i in range(50)]
+    # Fetches took far less than the delay, so the hosts are still within their spacing
+    assert scheduler.stats()["hosts"] > 0
+    assert _wait_for(lambda: scheduler.stats()["hosts"] == 0)
+
+
+def test_requests_to_one_host_stay_spaced():
+    scheduler = CrawlScheduler(workers=4, connections=2, delay=0.2)
+    started = []
+    futures = [scheduler.submit("https://one.example/" + str(i), lambda url: started.append(time.monotonic()))
+               for i in range(3)]
+    for f in futures:
+        f.result(2)
+    gaps = [b - a for a, b in zip(started, started[1:])]
+    assert all(gap >= 0.19 for gap in gaps)
+    # Forgotten after its spacing, the host is fetched from right away
+    assert _wait_for(lambda: scheduler.stats()["hosts"] == 0)
+    submitted = time.monotonic()
+    scheduler.submit("https://one.example/again", lambda url: started.append(time.monotonic())).result(2)
+    assert started[-1] - submitted < 0.1
@@ -0,0 +1,67 @@
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import db
+from schema import SchemaCache
+
+TABLE = 101
+FIELDS = [{"id": 1, "name": "STATUS", "type": "text"}, {"id": 2, "name": "Website", "type": "url"}]
+
+
+class _Response:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._payload
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """A Websites table of 450 unprocessed rows, served 200 per page like Baserow."""
+    rows = [{"id": i, "field_1": "", "field_2": f"https://company{i}.example"} for i in range(1, 451)]
+    requests = []
+
+    def fake_request(method, url, deadline=None, **kwargs):
+        query = parse_qs(urlsplit(url).query, keep_blank_values=True)
+        requests.append(query)
+        page, size = int(query["page"][0]), int(query["size"][0])
+        results = rows[(page - 1) * size:page * size]
+        return _Response({"results": results, "next": "more" if page * size < len(rows) else None})
+
+    monkeypatch.setattr(db, "_request", fake_request)
+    monkeypatch.setattr(db, "SCHEMAS", SchemaCache(lambda table_id: FIELDS, lambda: []))
+    return requests
+
+
+def test_get_next_row_pages_past_excluded_rows(table):
+    row = db.get_next_row(TABLE, exclude_ids=set(range(1, 301)))
+    assert row["id"] == 301
+    assert row["Website"] == "https://company301.example"
+    assert len(table) == 2
+    assert table[0]["filter__field_1__empty"] == [""]
+
+
+def test_get_next_row_returns_none_when_everything_is_excluded(table):
+    assert db.get_next_row(TABLE, exclude_ids=set(range(1, 451))) is None
+    assert len(table) == 3
+
+
+def test_get_unprocessed_rows_limit(table):
+    rows = db.get_unprocessed_rows(TABLE, exclude_ids={1, 2}, limit=5)
+    assert [r["id"] for r in rows] == [3, 4, 5, 6, 7]
+
+
+def test_resolve_table():
+    tables = {"Mandates": 7}
+    assert db.resolve_table(12, tables) == 12
+    assert db.resolve_table("12", tables) == 12
+    assert db.resolve_table("Mandates", tables) == 7
+    with pytest.raises(ValueError):
+        db.resolve_table("Unknown", tables)
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, NO_DEADLINE
+
+
+def _expire(deadline: Deadline) -> None:
+    deadline._expires_at = time.monotonic() - 1
+
+
+def test_unlimited():
+    assert not NO_DEADLINE.limited and NO_DEADLINE.remaining() is None
+    assert Deadline(0).remaining() is None
+    with NO_DEADLINE.bound(5) as timeout:
+        assert timeout == 5
+    with NO_DEADLINE.bound(None) as timeout:
+        assert timeout is None
+
+
+def test_bound_takes_the_shorter_timeout():
+    with Deadline(30).bound(5) as timeout:
+        assert timeout == 5
+    with Deadline(2).bound(5) as timeout:
+        assert 1.9 < timeout <= 2
+    with Deadline(2).bound(None) as timeout:
+        assert 1.9 < timeout <= 2
+
+
+def test_bound_refuses_a_call_once_expired():
+    deadline = Deadline(30)
+    _expire(deadline)
+    with pytest.raises(DeadlineExceeded):
+        with deadline.bound(5):
+            pytest.fail("the call must not run")
+
+
+def test_error_after_the_budget_ran_out_becomes_deadline_exceeded():
+    deadline = Deadline(30)
+    with pytest.raises(DeadlineExceeded) as info:
+        with deadline.bound(5):
+            _expire(deadline)
+            raise TimeoutError("read timed out")
+    assert isinstance(info.value.__cause__, TimeoutError)
+    # Not a TimeoutError, so breakers and limiters do not blame the service
+    assert not isinstance(info.value, TimeoutError)
+
+
+def test_error_within_the_budget_is_kept():
+    with pytest.raises(ConnectionError):
+        with Deadline(30).bound(5):
+            raise ConnectionError("refused")
+
+
+def test_paused_time_is_not_spent():
+    deadline = Deadline(1)
+    with deadline.paused():
+        time.sleep(0.2)
+        # The clock is stopped while paused
+        assert deadline.remaining() == deadline.remaining()
+    assert deadline.remaining() > 0.95
+    deadline.pause()
+    deadline.pause()  # pausing twice keeps the first pause
+    time.sleep(0.1)
+    deadline.resume()
+    assert deadline.remaining() > 0.9
@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+import db
+import stages
+from schema import SchemaCache
+from deadline import Deadline, DeadlineExceeded
+from deliverability import DeliverabilityChecker
+
+
+class FakeResolver:
+    def __init__(self, domains, fail=()):
+        self.domains = domains
+        self.fail = set(fail)
+        self.lookups = []
+
+    def mail_hosts(self, domain, timeout=None):
+        self.lookups.append((domain, timeout))
+        if domain in self.fail:
+            raise OSError("SERVFAIL")
+        return self.domains.get(domain, [])
+
+
+@pytest.fixture
+def resolver():
+    return FakeResolver({"acme.example": ["mx.acme.example"], "beta.example": ["beta.example"]},
+                        fail={"flaky.example"})
+
+
+def test_rejections(resolver):
+    checker = DeliverabilityChecker(resolver)
+    assert checker.check("jane@acme.example") is None
+    assert checker.check("info@acme.example") is None
+    assert checker.check("noreply@acme.example") == "no-reply mailbox"
+    assert checker.check("someone@mailinator.com") == "disposable domain"
+    assert checker.check("someone@eu.yopmail.com") == "disposable domain"
+    assert checker.check("someone@gone.example") == "no mail server"
+    assert checker.check("not an address") == "invalid address"
+    assert checker.check("") == "invalid address"
+
+
+def test_role_accounts_only_rejected_when_configured(resolver):
+    assert DeliverabilityChecker(resolver, reject_roles=True).check("info@acme.example") == "role account"
+
+
+def test_lookups_are_cached_per_domain(resolver):
+    checker = DeliverabilityChecker(resolver)
+    assert checker.deliverable(["a@acme.example", "b@acme.example", "c@gone.example", "d@gone.example"]) == \
+        ["a@acme.example", "b@acme.example"]
+    assert [domain for domain, _ in resolver.lookups] == ["acme.example", "gone.example"]
+
+
+def test_negative_answers_expire_sooner(resolver):
+    checker = DeliverabilityChecker(resolver, ttl=60, negative_ttl=0)
+    checker.check("a@acme.example")
+    checker.check("a@gone.example")
+    time.sleep(0.01)
+    checker.check("b@acme.example")
+    checker.check("b@gone.example")
+    assert [domain for domain, _ in resolver.lookups] == ["acme.example", "gone.example", "gone.example"]
+
+
+def test_failed_lookup_lets_the_address_through(resolver):
+    checker = DeliverabilityChecker(resolver)
+    assert checker.check("a@flaky.example") is None
+    assert checker.check("b@flaky.example") is None
+    assert len(resolver.lookups) == 1
+
+
+def test_lookup_is_bounded_by_the_row_deadline(resolver):
+    checker = DeliverabilityChecker(resolver)
+    checker.check("a@acme.example", Deadline(30))
+    assert 0 < resolver.lookups[0][1] <= 30
+
+    expired = Deadline(30)
+    expired._expires_at = time.monotonic() - 1
+    with pytest.raises(DeadlineExceeded):
+        checker.check("a@beta.example", expired)
+    # Nothing was cached for the domain whose lookup never ran
+    assert checker.check("a@beta.example") is None
+    assert [domain for domain, _ in resolver.lookups] == ["acme.example", "beta.example"]
+
+
+def test_check_status_options(monkeypatch):
+    status = {"id": 1, "name": "STATUS", "type": "single_select",
+              "select_options": [{"id": 1, "value": v} for v in ("Contacted", "not contacted yet", "Skipped")]}
+    text_status = {"id": 1, "name": "STATUS", "type": "text"}
+    fields = {101: [status], 201: [text_status]}
+    monkeypatch.setattr(db, "SCHEMAS", SchemaCache(lambda table_id: fields[table_id], lambda: []))
+
+    class Ctx:
+        websites_table, main_table = 101, 201
+
+    assert stages.check_status_options(Ctx()) == ["101: Duplicate", "101: Undeliverable"]
@@ -0,0 +1,76 @@
+import json
+import time
+
+import pytest
+
+import db
+import domain_index
+from domain_index import DomainIndex, normalize_domain
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("https://www.Example.com:443/about", "example.com"),
+    ("example.com", "example.com"),
+    ("http://example.com.", "example.com"),
+    ("https://example.com:8080/", "example.com:8080"),
+    ("https://sub.example.com/a/b", "sub.example.com"),
+    ("https://sites.google.com/view/acme/home", "sites.google.com/view/acme"),
+    ("sites.google.com/site/beta", "sites.google.com/site/beta"),
+    ("https://www.linkedin.com/company/Acme/about/", "linkedin.com/company/acme"),
+    ("https://uk.linkedin.com/company/acme", "uk.linkedin.com/company/acme"),
+    ("https://jane.wixsite.com/acme?lang=en", "jane.wixsite.com/acme"),
+    ("https://www.facebook.com/acme/", "facebook.com/acme"),
+    ("https://facebook.com", "facebook.com"),
+    ("https://notlinkedin.com/company/acme", "notlinkedin.com"),
+    ("", None),
+    (None, None),
+    ("https://", None),
+])
+def test_normalize_domain(url, expected):
+    assert normalize_domain(url) == expected
+
+
+def test_companies_on_a_shared_host_are_told_apart():
+    assert len({normalize_domain(u) for u in (
+        "https://sites.google.com/view/acme", "https://sites.google.com/view/beta",
+        "https://www.linkedin.com/company/acme", "https://www.linkedin.com/company/beta",
+    )}) == 4
+    assert normalize_domain("https://sites.google.com/view/acme") == \
+        normalize_domain("sites.google.com/view/acme/contact#team")
+
+
+@pytest.fixture
+def main_rows(monkeypatch):
+    rows = [{"Website": "https://sites.google.com/view/acme", "Email": "a@acme.example"},
+            {"Website": "https://linkedin.com/company/beta", "Email": None}]
+    calls = []
+
+    def iter_rows(table_id, include=None):
+        calls.append(table_id)
+        return iter(rows if table_id == "1" else [])
+
+    monkeypatch.setattr(db, "iter_rows", iter_rows)
+    return calls
+
+
+def test_claim_on_shared_hosts(tmp_path, main_rows):
+    index = DomainIndex(str(tmp_path / "index.json"), [1, 2])
+    assert index.claim({"id": 1, "Website": "sites.google.com/view/acme/about"}) == "sites.google.com/view/acme"
+    assert index.claim({"id": 2, "Website": "https://sites.google.com/view/gamma"}) is None
+    assert index.claim({"id": 3, "Website": "https://www.linkedin.com/company/delta"}) is None
+    assert index.claim({"id": 4, "Website": "https://linkedin.com/company/delta/jobs"}) == "linkedin.com/company/delta"
+
+
+def test_index_saved_with_older_keys_is_rebuilt(tmp_path, main_rows):
+    path = tmp_path / "index.json"
+    path.write_text(json.dumps({"tables": ["1", "2"], "built_at": time.time(),
+                                "domains": ["sites.google.com"], "emails": []}))
+    index = DomainIndex(str(path), [1, 2])
+    assert index.known_as({"Website": "https://sites.google.com/view/other"}) is None
+    assert main_rows == ["1", "2"]
+    assert json.loads(path.read_text())["version"] == domain_index.KEY_VERSION
+
+    # The saved copy is used as is from now on
+    main_rows.clear()
+    assert DomainIndex(str(path), [1, 2]).known_as({"Website": "sites.google.com/view/acme"})
+    assert main_rows == []
@@ -0,0 +1,56 @@
+import pytest
+
+import db
+import ingest
+
+
+@pytest.fixture
+def table(monkeypatch):
+    """A Websites table whose first batch create is written but times out on the client."""
+    rows, calls = [], []
+
+    def create(table_id, batch):
+        calls.append(len(batch))
+        rows.extend(batch)
+        if len(calls) == 1:
+            raise TimeoutError("read timed out")
+        return batch
+
+    monkeypatch.setattr(db, "create_main_table_rows", create)
+    monkeypatch.setattr(db, "iter_rows", lambda table_id, include=None: iter(list(rows)))
+    monkeypatch.setattr(ingest.time, "sleep", lambda seconds: None)
+    return rows, calls
+
+
+def test_retry_after_a_timed_out_create_writes_no_duplicates(table):
+    rows, calls = table
+    batch = [{"Website": f"https://company{i}.example"} for i in range(5)]
+    ingest._create_chunk(101, batch)
+    assert calls == [5]
+    assert len(rows) == 5
+
+
+def test_retry_posts_only_missing_rows(table, monkeypatch):
+    rows, calls = table
+    batch = [{"Website": f"https://company{i}.example"} for i in range(5)]
+    real_create = db.create_main_table_rows
+
+    def partly_written(table_id, chunk):
+        # The first attempt only got the first two rows in before failing
+        if not calls:
+            calls.append(len(chunk))
+            rows.extend(chunk[:2])
+            raise TimeoutError("read timed out")
+        return real_create(table_id, chunk)
+
+    monkeypatch.setattr(db, "create_main_table_rows", partly_written)
+    ingest._create_chunk(101, batch)
+    assert calls == [5, 3]
+    assert sorted(r["Website"] for r in rows) == sorted(r["Website"] for r in batch)
+
+
+def test_normalize_url():
+    assert ingest.normalize_url("acme.example") == "https://acme.example"
+    assert ingest.normalize_url(" http://acme.example/x ") == "http://acme.example/x"
+    assert ingest.normalize_url("not a domain") is None
+    assert ingest.normalize_url(None) is None
@@ -0,0 +1,98 @@
+import threading
+
+import pytest
+
+from limiter import AdaptiveLimiter, SUCCESS, OVERLOAD, NEUTRAL, is_overload
+
+
+def _run(lim, outcome):
+    lim.acquire()
+    lim.release(outcome)
+
+
+def test_additive_increase_one_per_window():
+    lim = AdaptiveLimiter("test-increase", 4, max_limit=8)
+    for _ in range(4):
+        _run(lim, SUCCESS)
+    assert lim.limit == 4  # 4 + 1/4 + ... stays just under 5
+    _run(lim, SUCCESS)
+    assert lim.limit == 5
+    for _ in range(100):
+        _run(lim, SUCCESS)
+    assert lim.limit == 8
+
+
+def test_multiplicative_decrease_once_per_congestion_event():
+    lim = AdaptiveLimiter("test-decrease", 16, min_limit=2, cooldown=60)
+    _run(lim, OVERLOAD)
+    assert lim.limit == 8
+    _run(lim, OVERLOAD)  # same event
+    assert lim.limit == 8
+    for expected in (4, 2, 2):
+        lim._last_decrease -= 60  # the cooldown has passed
+        _run(lim, OVERLOAD)
+        assert lim.limit == expected
+
+
+def test_neutral_outcome_leaves_the_limit():
+    lim = AdaptiveLimiter("test-neutral", 4)
+    _run(lim, NEUTRAL)
+    assert lim._limit == 4
+
+
+def test_initial_is_clamped():
+    assert AdaptiveLimiter("test-clamp-high", 100, max_limit=10).limit == 10
+    assert AdaptiveLimiter("test-clamp-low", 0, min_limit=2).limit == 2
+
+
+def test_acquire_blocks_at_the_limit():
+    lim = AdaptiveLimiter("test-block", 1)
+    lim.acquire()
+    got = threading.Event()
+    waiter = threading.Thread(target=lambda: (lim.acquire(), got.set()))
+    waiter.start()
+    assert not got.wait(0.1)
+    lim.release(NEUTRAL)
+    assert got.wait(1)
+    waiter.join()
+
+
+def test_disabled_limiter_never_blocks():
+    lim = AdaptiveLimiter("test-disabled", 1, enabled=False)
+    for _ in range(5):
+        lim.acquire()
+    assert lim._in_flight == 5
+
+
+def test_slot_classifies_outcomes():
+    lim = AdaptiveLimiter("test-slot", 8, cooldown=0)
+    with lim.slot() as slot:
+        slot.status(503)
+    assert lim.limit == 4
+    with pytest.raises(TimeoutError):
+        with lim.slot():
+            raise TimeoutError()
+    assert lim.limit == 2
+    with pytest.raises(ValueError):
+        with lim.slot():
+            raise ValueError()
+    assert lim.limit == 2 and lim._in_flight == 0
+
+
+def test_is_overload():
+    class HttpError(Exception):
+        def __init__(self, status_code):
+            self.status_code = status_code
+
+    class SmtpError(Exception):
+        def __init__(self, smtp_code):
+            self.smtp_code = smtp_code
+
+    class ReadTimeout(Exception):
+        pass
+
+    assert is_overload(TimeoutError())
+    assert is_overload(ReadTimeout())
+    assert is_overload(HttpError(429)) and not is_overload(HttpError(404))
+    assert is_overload(SmtpError(421)) and not is_overload(SmtpError(550))
+    assert not is_overload(ValueError())
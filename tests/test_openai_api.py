@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+import stages
+import models
+from models import parse_gpt_output
+from openai_api import MatchesScanner, clean_json_output
+
+ANSWER = json.dumps({
+    "matches": [{"acronym": "AB [x]", "score": 3, "fit": False},
+                {"acronym": "C\\\"D{", "score": 9, "fit": True}],
+    "selected_email": "jane@acme.example",
+    "subject": "Hello",
+    "email_body": "Hi Jane",
+})
+
+
+def _feed_in_pieces(text, size):
+    scanner = MatchesScanner()
+    results = [scanner.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return scanner, [r for r in results if r is not None]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 50, len(ANSWER)])
+def test_matches_are_found_whatever_the_chunking(size):
+    scanner, results = _feed_in_pieces(ANSWER, size)
+    assert scanner.done
+    assert results == [json.loads(ANSWER)["matches"]]
+
+
+def test_matches_returned_as_soon_as_the_array_closes():
+    scanner = MatchesScanner()
+    end = ANSWER.index("]", ANSWER.index('"C')) + 1
+    assert scanner.feed(ANSWER[:end - 1]) is None
+    assert scanner.feed(ANSWER[end - 1:end]) == json.loads(ANSWER)["matches"]
+    # Nothing more once done
+    assert scanner.feed(ANSWER[end:]) is None
+
+
+def test_fenced_answer():
+    scanner, results = _feed_in_pieces("```json\n" + ANSWER + "\n```", 4)
+    assert results and results[0][1]["score"] == 9
+
+
+def test_no_matches_key():
+    scanner, results = _feed_in_pieces('{"selected_email": "", "subject": ""}', 3)
+    assert not scanner.done and results == []
+
+
+def test_stopped_answer_is_valid():
+    # The stand-in for an answer cancelled after matches that cannot fit
+    raw = json.dumps({"matches": [{"acronym": "AB", "score": 4, "fit": False}], "selected_email": "",
+                      "subject": "", "email_body": "", "stopped_after_matches": True})
+    output = parse_gpt_output(raw)
+    assert output.selected_email == ""
+    assert output.model_dump()["stopped_after_matches"] is True
+
+
+def test_empty_email_rejected_when_a_match_fits():
+    raw = json.loads(ANSWER)
+    raw["selected_email"] = "  "
+    with pytest.raises(ValidationError):
+        parse_gpt_output(raw)
+
+
+def test_email_is_normalized():
+    raw = json.loads(ANSWER)
+    raw["selected_email"] = " Info@ACME.example "
+    assert parse_gpt_output(raw).selected_email == "info@acme.example"
+    raw["selected_email"] = "not an address"
+    with pytest.raises(ValidationError):
+        parse_gpt_output(raw)
+
+
+def test_thresholds_agree():
+    assert stages.MIN_SEND_SCORE == models.MIN_SEND_SCORE
+
+
+def test_clean_json_output():
+    assert clean_json_output("```json\n{}\n```") == "{}"
+    assert clean_json_output("  {} ") == "{}"
@@ -0,0 +1,82 @@
+import time
+import threading
+
+import stages
+from pipeline import Pipeline
+from stages import RowWork, PERSIST
+
+
+class _Ctx:
+    name = "test"
+
+    def __init__(self):
+        self.dropped = []
+
+    def drop(self, row_id):
+        self.dropped.append(row_id)
+
+    def held_ids(self):
+        return set()
+
+
+class _Scheduler:
+    accounts = [object()]
+
+
+def _pipeline(ctx, persisted):
+    pipeline = Pipeline(ctx, _Scheduler(), working_hours=None, idle_delay=lambda: 0,
+                        persist_interval=0.05)
+    pipeline._flush = lambda batch: persisted.extend(w.row_id for w in batch)
+    return pipeline
+
+
+def test_rows_sent_while_stopping_are_still_persisted():
+    ctx, persisted = _Ctx(), []
+    pipeline = _pipeline(ctx, persisted)
+    sending = threading.Event()
+
+    def slow_send(work):
+        sending.set()
+        time.sleep(0.3)
+        work.status = "Contacted"
+        return PERSIST
+
+    # Only a send worker and persist: the row is mid-send when stop() is called
+    pipeline._spawn("send-1", pipeline._work, stages.SEND, slow_send)
+    pipeline._spawn("persist", pipeline._persist)
+    pipeline.queues[stages.SEND].put(RowWork({"id": 1}))
+    assert sending.wait(2)
+    pipeline.stop(timeout=5, persist_timeout=5)
+
+    assert persisted == [1]
+    assert ctx.dropped == []
+
+
+def test_persist_put_does_not_give_up_when_stopping():
+    ctx, persisted = _Ctx(), []
+    pipeline = _pipeline(ctx, persisted)
+    pipeline._stop.set()
+    assert pipeline._pass_on(PERSIST, RowWork({"id": 2}))
+    assert not pipeline._pass_on(stages.SEND, RowWork({"id": 3}))
+    assert pipeline.queues[PERSIST].qsize() == 1
+
+
+def test_send_outlasting_the_join_timeout_is_still_persisted():
+    ctx, persisted = _Ctx(), []
+    pipeline = _pipeline(ctx, persisted)
+    sending = threading.Event()
+
+    def slow_send(work):
+        sending.set()
+        time.sleep(0.6)
+        work.status = "Contacted"
+        return PERSIST
+
+    pipeline._spawn("send-1", pipeline._work, stages.SEND, slow_send)
+    pipeline._spawn("persist", pipeline._persist)
+    pipeline.queues[stages.SEND].put(RowWork({"id": 4}))
+    assert sending.wait(2)
+    # The send takes longer than the send workers are waited for
+    pipeline.stop(timeout=0.1, persist_timeout=5)
+
+    assert persisted == [4]
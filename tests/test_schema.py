@@ -0,0 +1,76 @@
+import schema
+from schema import SchemaCache, TableSchema
+
+FIELDS = [
+    {"id": 11, "name": "Name", "type": "text", "primary": True},
+    {"id": 12, "name": "STATUS", "type": "single_select",
+     "select_options": [{"id": 1, "value": "Contacted"}, {"id": 2, "value": "Skipped"}]},
+    {"id": 13, "name": "Score", "type": "formula"},
+    {"id": 14, "name": "Locked", "type": "text", "read_only": True},
+]
+
+
+class Fetcher:
+    def __init__(self, fields):
+        self.fields = fields
+        self.calls = 0
+
+    def __call__(self, table_id):
+        self.calls += 1
+        return list(self.fields)
+
+
+def test_names_and_ids_round_trip():
+    table = TableSchema(7, FIELDS)
+    assert table.key("STATUS") == "field_12" and table.key("Nope") is None
+    row = table.to_names({"id": 3, "order": "1.0", "field_11": "Acme", "field_12": {"value": "Skipped"}})
+    assert row == {"id": 3, "order": "1.0", "Name": "Acme", "STATUS": {"value": "Skipped"}}
+    payload, rejected = table.to_ids({"id": 3, "Name": "Acme", "Score": 9, "Locked": "x", "Nope": 1})
+    assert payload == {"id": 3, "field_11": "Acme"}
+    assert rejected == ["Score", "Locked", "Nope"]
+
+
+def test_missing_options():
+    table = TableSchema(7, FIELDS)
+    assert table.missing_options("STATUS", ["Contacted", "Duplicate"]) == ["Duplicate"]
+    assert table.missing_options("Name", ["anything"]) == []
+    assert table.missing_options("Nope", ["anything"]) == []
+
+
+def test_schema_fetched_once():
+    fetch = Fetcher(FIELDS)
+    cache = SchemaCache(fetch, lambda: [])
+    cache.load([7, None, 7])
+    assert cache.keys(7, ["Name", "STATUS"]) == ["field_11", "field_12"]
+    assert fetch.calls == 1
+    cache.invalidate(7)
+    cache.table(7)
+    assert fetch.calls == 2
+
+
+def test_unknown_name_refetches_at_most_every_interval(monkeypatch):
+    fetch = Fetcher(FIELDS)
+    cache = SchemaCache(fetch, lambda: [])
+    cache.table(7)
+    # A field added in Baserow after the schema was cached
+    fetch.fields = FIELDS + [{"id": 15, "name": "Phone", "type": "text"}]
+    assert cache.key(7, "Phone") is None  # cached too recently
+    assert fetch.calls == 1
+    monkeypatch.setattr(schema, "REFRESH_INTERVAL", 0)
+    assert cache.key(7, "Phone") == "field_15"
+    assert fetch.calls == 2
+
+
+def test_payload_leaves_out_unwritable_fields_with_one_warning(capsys):
+    cache = SchemaCache(Fetcher(FIELDS), lambda: [])
+    for _ in range(2):
+        assert cache.payload(7, {"Name": "Acme", "Score": 3}) == {"field_11": "Acme"}
+    assert capsys.readouterr().out.count("'Score' is read-only") == 1
+
+
+def test_tables_cached_until_refreshed():
+    calls = []
+    cache = SchemaCache(Fetcher(FIELDS), lambda: calls.append(1) or [{"id": 7}])
+    assert cache.tables() == cache.tables() == [{"id": 7}]
+    cache.tables(refresh=True)
+    assert len(calls) == 2
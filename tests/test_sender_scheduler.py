@@ -0,0 +1,184 @@
+import pytest
+
+from sender_scheduler import (
+    SenderScheduler, AccountRegistry, HOUR, DAY, MAX_CONSECUTIVE_FAILURES, FAILURE_COOLDOWN_SECONDS
+)
+from working_hours import WorkingHours
+
+DAYTIME = WorkingHours([(9, 17)], ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"], "Europe/Paris")
+NIGHTTIME = WorkingHours([(22, 6)], ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"], "Europe/Paris")
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def _account(email, hourly=100, daily=1000):
+    return {"name": email.split("@")[0], "email": email, "hourly_limit": hourly, "daily_limit": daily}
+
+
+def test_needs_an_account():
+    with pytest.raises(ValueError):
+        SenderScheduler([])
+
+
+def test_hourly_quota():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example", hourly=2)], clock=clock)
+    for _ in range(2):
+        scheduler.report(scheduler.acquire(), True)
+        clock.now += 60
+    assert scheduler.acquire() is None
+    assert scheduler.seconds_until_capacity() == pytest.approx(HOUR - 120)
+    clock.now += HOUR - 120
+    assert scheduler.acquire() is not None
+
+
+def test_daily_quota():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example", hourly=10, daily=3)], clock=clock)
+    for _ in range(3):
+        scheduler.report(scheduler.acquire(), True)
+        clock.now += HOUR
+    assert not scheduler.has_capacity()
+    assert scheduler.seconds_until_capacity() == pytest.approx(DAY - 3 * HOUR)
+    clock.now += DAY - 3 * HOUR
+    assert scheduler.has_capacity()
+
+
+def test_least_loaded_account_first():
+    clock = Clock()
+    a, b = _account("a@x.example", hourly=4), _account("b@x.example", hourly=2)
+    scheduler = SenderScheduler([a, b], clock=clock)
+    picked = []
+    for _ in range(6):
+        slot = scheduler.acquire()
+        picked.append(slot.account["email"])
+        scheduler.report(slot, True)
+    assert sorted(picked) == ["a@x.example"] * 4 + ["b@x.example"] * 2
+    assert scheduler.acquire() is None
+
+
+def test_pause_between_sends():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example")], send_interval=lambda: 90, clock=clock)
+    scheduler.report(scheduler.acquire(), True)
+    assert scheduler.acquire() is None
+    assert scheduler.seconds_until_capacity() == pytest.approx(90)
+    clock.now += 90
+    assert scheduler.acquire() is not None
+
+
+def test_pause_is_reserved_by_acquire():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example")], send_interval=lambda: 600, clock=clock)
+    first = scheduler.acquire()
+    # A second send worker asking while the first send is still going gets nothing
+    assert scheduler.acquire() is None
+    clock.now += 30
+    scheduler.report(first, True)
+    # The rest counts from the end of the send
+    assert scheduler.seconds_until_capacity() == pytest.approx(600)
+    clock.now += 600
+    assert scheduler.acquire() is not None
+
+
+def test_pause_is_undone_when_nothing_was_sent():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example")], send_interval=lambda: 600, clock=clock)
+    scheduler.release(scheduler.acquire())
+    slot = scheduler.acquire()
+    assert slot is not None
+    scheduler.report(slot, False)
+    assert scheduler.acquire() is not None
+
+
+def test_pause_is_shared_through_the_registry():
+    clock, registry = Clock(), AccountRegistry()
+    first = SenderScheduler([_account("a@x.example")], send_interval=lambda: 600, registry=registry, clock=clock)
+    second = SenderScheduler([_account("a@x.example")], send_interval=lambda: 600, registry=registry, clock=clock)
+    assert first.acquire() is not None
+    assert second.acquire() is None
+
+
+def test_failed_send_gives_back_its_own_slot():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example", hourly=3)], clock=clock)
+    first = scheduler.acquire()
+    clock.now += 10
+    second = scheduler.acquire()
+    # The older send fails after the newer one was reserved
+    scheduler.report(first, False)
+    scheduler.report(second, True)
+    clock.now += HOUR - 5
+    # Only the successful send (reserved 10s later) still counts
+    assert "1/3 this hour" in scheduler.summary()[0]
+    clock.now += 10
+    assert "0/3 this hour" in scheduler.summary()[0]
+
+
+def test_release_is_not_a_failure():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example", hourly=1)], clock=clock)
+    for _ in range(MAX_CONSECUTIVE_FAILURES + 1):
+        slot = scheduler.acquire()
+        assert slot is not None
+        scheduler.release(slot)
+
+
+def test_cooldown_after_consecutive_failures():
+    clock = Clock()
+    scheduler = SenderScheduler([_account("a@x.example")], clock=clock)
+    for _ in range(MAX_CONSECUTIVE_FAILURES):
+        scheduler.report(scheduler.acquire(), False)
+    assert scheduler.acquire() is None
+    assert scheduler.seconds_until_capacity() == pytest.approx(FAILURE_COOLDOWN_SECONDS)
+    clock.now += FAILURE_COOLDOWN_SECONDS
+    slot = scheduler.acquire()
+    scheduler.report(slot, True)
+    # A success resets the count: the next failure does not park the account again
+    scheduler.report(scheduler.acquire(), False)
+    assert scheduler.acquire() is not None
+
+
+def test_failing_account_is_avoided_while_parked():
+    clock = Clock()
+    a, b = _account("a@x.example"), _account("b@x.example")
+    scheduler = SenderScheduler([a, b], clock=clock)
+    failures = 0
+    while failures < MAX_CONSECUTIVE_FAILURES:
+        slot = scheduler.acquire()
+        # Every send from a fails; a stays the least loaded as its failed slots are given back
+        failures += slot.account is a
+        scheduler.report(slot, slot.account is b)
+    assert {scheduler.acquire().account["email"] for _ in range(3)} == {"b@x.example"}
+
+
+def test_registry_shares_quotas_between_campaigns():
+    clock, registry = Clock(), AccountRegistry()
+    first = SenderScheduler([_account("a@x.example", hourly=2)], registry=registry, clock=clock)
+    second = SenderScheduler([_account("a@x.example", hourly=2)], registry=registry, clock=clock)
+    first.report(first.acquire(), True)
+    second.report(second.acquire(), True)
+    assert first.acquire() is None and second.acquire() is None
+
+
+def test_registry_needs_one_calendar_per_account():
+    registry = AccountRegistry()
+    SenderScheduler([_account("a@x.example")], working_hours=DAYTIME, registry=registry)
+    SenderScheduler([_account("a@x.example")], working_hours=WorkingHours(DAYTIME.windows, DAYTIME.working_days),
+                    registry=registry)
+    with pytest.raises(ValueError, match="a@x.example"):
+        SenderScheduler([_account("a@x.example")], working_hours=NIGHTTIME, registry=registry)
+
+
+def test_account_calendar_overrides_campaign_hours_in_registry():
+    registry = AccountRegistry()
+    account = dict(_account("a@x.example"), active_windows="8-20")
+    first = SenderScheduler([account], working_hours=DAYTIME, registry=registry)
+    second = SenderScheduler([account], working_hours=NIGHTTIME, registry=registry)
+    assert first._states[0] is second._states[0]
@@ -0,0 +1,105 @@
+import pytest
+
+import db
+import stages
+from domain_index import DomainIndex
+from stages import RunContext, RowWork, DUPLICATE_STATUS
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "iter_rows", lambda table_id, include=None: iter([]))
+    return DomainIndex(str(tmp_path / "index.json"), [1, 2])
+
+
+@pytest.fixture
+def ctx(index):
+    return RunContext("Ventures", 101, 102, prompts=None, domain_index=index, content_store=None,
+                      deliverability=None)
+
+
+def _row(row_id, website="https://acme.example"):
+    return {"id": row_id, "Website": website, "Email": None, "Description": ""}
+
+
+def _failing(*args, **kwargs):
+    raise ConnectionError("Baserow is down")
+
+
+def test_row_picked_again_finds_its_own_claim_free(index):
+    assert index.claim(_row(1)) is None
+    # Never persisted, picked up again
+    assert index.claim(_row(1)) is None
+    assert index.claim(_row(2)) == "acme.example"
+
+
+def test_dropped_row_gives_back_its_claim(ctx, index):
+    assert index.claim(_row(1)) is None
+    ctx.drop(1)
+    assert index.claim(_row(2)) is None
+
+
+def test_row_retried_later_gives_back_its_claim(ctx, index):
+    assert index.claim(_row(1)) is None
+    stages.retry_later(RowWork(_row(1)), ctx)
+    assert index.claim(_row(2)) is None
+
+
+def test_failed_persist_gives_back_the_claim(ctx, index, monkeypatch):
+    monkeypatch.setattr(db, "update_cell", _failing)
+    work = RowWork(_row(1))
+    work.status = "not contacted yet"
+    assert index.claim(work.row) is None
+    assert not stages.persist_row(work, ctx)
+    assert index.claim(_row(2)) is None
+
+
+def test_failed_batch_persist_gives_back_the_claims(ctx, index, monkeypatch):
+    monkeypatch.setattr(db, "update_rows", _failing)
+    monkeypatch.setattr(db, "update_cell", lambda table_id, row_id, *args, **kwargs: _failing() if row_id == 1 else None)
+    monkeypatch.setattr(db, "create_main_table_rows", _failing)
+    monkeypatch.setattr(db, "create_main_table_row", _failing)
+    works = [RowWork(_row(1)), RowWork(_row(2, "https://beta.example"))]
+    for work in works:
+        work.status = "not contacted yet"
+        assert index.claim(work.row) is None
+    stages.persist_rows(works, ctx)
+    # Row 1 failed its status update, row 2 its copy to the main table
+    assert index.claim(_row(3)) is None
+    assert index.claim(_row(4, "https://beta.example")) is None
+
+
+def test_duplicate_keeps_the_first_rows_claim(ctx, index):
+    assert index.claim(_row(1)) is None
+    work = RowWork(_row(2))
+    assert stages.scrape_row(work, ctx) == stages.PERSIST
+    assert work.status == DUPLICATE_STATUS
+
+
+def test_failed_batch_create_does_not_post_written_rows_again(ctx, index, monkeypatch):
+    main_table, posted, deleted = [], [], []
+
+    def create_rows(table_id, rows):
+        # Baserow wrote the first row, then the client gave up
+        main_table.append(rows[0])
+        raise TimeoutError("read timed out")
+
+    def create_row(table_id, row_data):
+        posted.append(row_data["Website"])
+        main_table.append(row_data)
+        return {"id": len(main_table)}
+
+    monkeypatch.setattr(db, "update_rows", lambda table_id, items: None)
+    monkeypatch.setattr(db, "create_main_table_rows", create_rows)
+    monkeypatch.setattr(db, "create_main_table_row", create_row)
+    monkeypatch.setattr(db, "iter_rows", lambda table_id, include=None: iter(list(main_table)))
+    monkeypatch.setattr(db, "delete_rows", lambda table_id, row_ids: deleted.extend(row_ids))
+    monkeypatch.setattr(stages, "_record_scores", lambda works, ctx: None)
+    works = [RowWork(_row(1)), RowWork(_row(2, "https://beta.example"))]
+    for work in works:
+        work.status = "not contacted yet"
+    stages.persist_rows(works, ctx)
+    assert posted == ["https://beta.example"]
+    assert [row["Website"] for row in main_table] == ["https://acme.example", "https://beta.example"]
+    assert deleted == [1, 2]
+    assert index.claim(_row(3)) == "acme.example"
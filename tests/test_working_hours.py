@@ -0,0 +1,77 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from working_hours import WorkingHours, parse_windows
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+EVERY_DAY = WEEKDAYS + ["Saturday", "Sunday"]
+
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_parse_windows():
+    assert parse_windows("9-12, 14-18") == [(9, 12), (14, 18)]
+    for bad in ("", "9-24", "nine-five"):
+        with pytest.raises(ValueError):
+            parse_windows(bad)
+
+
+def test_window_with_equal_start_and_end_is_the_whole_day():
+    hours = WorkingHours(parse_windows("9-9"), EVERY_DAY, "Europe/Paris")
+    assert all(hours.is_active(utc(2026, 3, 27, hour)) for hour in range(24))
+
+
+def test_weekend_before_spring_forward():
+    hours = WorkingHours([(9, 17)], WEEKDAYS, "Europe/Paris")
+    friday_evening = utc(2026, 3, 27, 17)  # 18:00 CET
+    monday_morning = hours.next_active_start(friday_evening)
+    assert monday_morning == utc(2026, 3, 30, 7)  # 09:00 CEST
+    # One hour less than the 63 wall-clock hours
+    assert hours.seconds_until_active(friday_evening) == 62 * 60 * 60
+
+
+def test_weekend_before_fall_back():
+    hours = WorkingHours([(9, 17)], WEEKDAYS, "Europe/Paris")
+    friday_evening = utc(2026, 10, 23, 16)  # 18:00 CEST
+    assert hours.next_active_start(friday_evening) == utc(2026, 10, 26, 8)  # 09:00 CET
+    assert hours.seconds_until_active(friday_evening) == 64 * 60 * 60
+
+
+def test_window_starting_in_the_skipped_hour():
+    # 02:00-03:00 does not exist on 29 March in Paris: the window opens at 03:00 CEST
+    hours = WorkingHours([(2, 4)], ["Sunday"], "Europe/Paris")
+    at = utc(2026, 3, 29, 0, 30)  # 01:30 CET
+    assert hours.next_active_start(at) == utc(2026, 3, 29, 1)
+    assert hours.seconds_until_active(at) == 30 * 60
+
+
+def test_window_starting_in_the_repeated_hour():
+    # 02:00-03:00 happens twice on 25 October in Paris: the window opens at the first one
+    hours = WorkingHours([(2, 3)], ["Sunday"], "Europe/Paris")
+    at = utc(2026, 10, 24, 23, 30)  # 01:30 CEST
+    assert hours.next_active_start(at) == utc(2026, 10, 25, 0)
+    assert hours.is_active(utc(2026, 10, 25, 0, 30))  # 02:30 CEST
+    assert hours.is_active(utc(2026, 10, 25, 1, 30))  # 02:30 CET
+
+
+def test_active_now_and_overnight_window():
+    hours = WorkingHours([(22, 6)], EVERY_DAY, "America/New_York")
+    assert hours.seconds_until_active(utc(2026, 3, 8, 5)) == 0  # 00:00 EST
+    assert not hours.is_active(utc(2026, 3, 8, 16))            # 12:00 EDT
+    assert hours.next_active_start(utc(2026, 3, 8, 16)) == utc(2026, 3, 9, 2)  # 22:00 EDT
+
+
+def test_never_active():
+    hours = WorkingHours([(9, 17)], [], "Europe/Paris")
+    assert hours.next_active_start(utc(2026, 3, 27, 17)) is None
+    assert hours.seconds_until_active(utc(2026, 3, 27, 17)) == float("inf")
+
+
+def test_from_account_falls_back_to_the_default():
+    default = WorkingHours([(9, 17)], WEEKDAYS, "Europe/Paris")
+    assert WorkingHours.from_account({"email": "a@x.example"}, default) is default
+    own = WorkingHours.from_account({"active_windows": "8-12", "timezone": "Asia/Tokyo"}, default)
+    assert (own.windows, own.working_days, own.timezone) == ([(8, 12)], WEEKDAYS, "Asia/Tokyo")